@@ -1,26 +1,9 @@
 import sys
 from netCDF4 import Dataset
-import numpy as np
 
-def decode_chararray(arr):
-    """
-    Decode netCDF char arrays or variable-length strings robustly to python strings.
-    """
-    if arr.dtype.kind in ('S','V','O'):
-        names = []
-        for row in arr:
-            try:
-                joined = b''.join([(bytes([c]) if isinstance(c, int) else c) for c in row])
-                s = joined.decode('utf-8', errors='ignore').strip()
-            except Exception:
-                try:
-                    s = ''.join([c.decode('utf-8', errors='ignore') if isinstance(c, (bytes, bytearray)) else str(c) for c in row]).strip()
-                except Exception:
-                    s = str(row).strip()
-            names.append(s)
-        return names
-    else:
-        return [str(x).strip() for x in arr[:]]
+from array_store import unique_ids
+from ingest import open_or_ingest
+from mineral_index import open_index
 
 def analyze_groups(fname):
     nc = Dataset(fname, 'r')
@@ -28,24 +11,12 @@ def analyze_groups(fname):
     if 'mineral_metadata' not in nc.groups:
         raise SystemExit("No 'mineral_metadata' group found in this file.")
 
-    mm = nc.groups['mineral_metadata']
-    
-    # Get names and groups
-    mnames_raw = mm.variables['name'][:]
-    mnames = decode_chararray(mnames_raw)
-    
-    idx = mm.variables['index'][:]
-    grp = mm.variables['group'][:]
+    # Names and groups come from the persistent mineral index
+    index = open_index(nc)
     
     # Analyze groups
-    group1_minerals = []
-    group2_minerals = []
-    
-    for i, g, nm in zip(idx, grp, mnames):
-        if int(g) == 1:
-            group1_minerals.append((int(i), nm))
-        elif int(g) == 2:
-            group2_minerals.append((int(i), nm))
+    group1_minerals = [(row["index"], row["name"]) for row in index.by_group(1)]
+    group2_minerals = [(row["index"], row["name"]) for row in index.by_group(2)]
     
     print("=" * 80)
     print("EMIT MINERAL GROUP ANALYSIS")
@@ -94,26 +65,19 @@ def analyze_groups(fname):
     # Check what minerals are actually detected in the scene
     print(f"\n🌍 MINERALS DETECTED IN THIS SCENE:")
     
-    # Get the actual mineral IDs detected in the scene
-    g1_detected = set()
-    g2_detected = set()
-    
-    if 'group_1_mineral_id' in nc.variables:
-        g1_ids = nc.variables['group_1_mineral_id'][:]
-        g1_detected = set(np.unique(g1_ids[g1_ids > 0]).astype(int))
-        
-    if 'group_2_mineral_id' in nc.variables:
-        g2_ids = nc.variables['group_2_mineral_id'][:]
-        g2_detected = set(np.unique(g2_ids[g2_ids > 0]).astype(int))
+    # Get the actual mineral IDs detected in the scene from the memory-mapped array store
+    store = open_or_ingest(fname)
+    g1_detected = set(int(i) for i in unique_ids(store['group1_mineral_id']) if i > 0)
+    g2_detected = set(int(i) for i in unique_ids(store['group2_mineral_id']) if i > 0)
     
     print(f"   Group 1 minerals detected: {len(g1_detected)}")
     for mineral_id in sorted(list(g1_detected))[:10]:  # Show first 10
-        mineral_name = next((name for idx, name in group1_minerals if idx == mineral_id), f"Unknown_{mineral_id}")
+        mineral_name = index.name(mineral_id)
         print(f"   - ID {mineral_id}: {mineral_name}")
     
     print(f"\n   Group 2 minerals detected: {len(g2_detected)}")
     for mineral_id in sorted(list(g2_detected))[:10]:  # Show first 10
-        mineral_name = next((name for idx, name in group2_minerals if idx == mineral_id), f"Unknown_{mineral_id}")
+        mineral_name = index.name(mineral_id)
         print(f"   - ID {mineral_id}: {mineral_name}")
     
     print(f"\n📍 GEOGRAPHIC CONTEXT:")
@@ -3,6 +3,19 @@ let emitData = null;
 let currentDataset = 0;
 let currentVisualization = 'heatmap';
 let currentGroup = 'both';
+let currentView = null; // visible window in native pixels {x0, y0, x1, y1}, null = whole scene
+let renderToken = 0;
+
+// Tile pyramid state
+const MAX_VIEW_CELLS = 160; // finest level is picked so the view spans at most this many cells
+const pyramidCache = new Map();
+const tileCache = new Map();
+const bufferCache = new Map();
+const datasetCache = new Map();
+const coverageCache = new Map();
+
+// Binary array format (see binary_format.py); float16 is decoded from its raw bits
+const TYPED_ARRAYS = { uint8: Uint8Array, uint16: Uint16Array, float16: Uint16Array, float32: Float32Array };
 
 // Color scales
 const bandDepthColorScale = d3.scaleSequential(d3.interpolateViridis).domain([0, 0.5]);
@@ -18,6 +31,7 @@ function setupEventListeners() {
     // Control panel event listeners
     document.getElementById('dataset-select').addEventListener('change', function() {
         currentDataset = parseInt(this.value);
+        currentView = null;
         updateVisualization();
         updateDatasetInfo();
     });
@@ -178,9 +192,337 @@ function updateVisualization() {
     }
 }
 
-function createHeatmaps() {
+async function loadPyramid(url) {
+    if (!pyramidCache.has(url)) {
+        pyramidCache.set(url, fetch(url).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        }));
+    }
+    return pyramidCache.get(url);
+}
+
+function float16ToFloat32(bits) {
+    const sign = (bits & 0x8000) ? -1 : 1;
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x3ff;
+    if (exponent === 0) return sign * Math.pow(2, -14) * (fraction / 1024);
+    if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+    return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+}
+
+function decodeBinaryArrays(buffer, arrays) {
+    // View each array in place and expose it as rows so it indexes like the nested-list JSON
+    const decoded = {};
+    Object.entries(arrays).forEach(([name, info]) => {
+        const ArrayType = TYPED_ARRAYS[info.dtype];
+        let values = new ArrayType(buffer, info.offset, info.length / ArrayType.BYTES_PER_ELEMENT);
+        if (info.scale !== undefined) {
+            values = Float32Array.from(values, code => code * info.scale);
+        } else if (info.dtype === 'float16') {
+            values = Float32Array.from(values, float16ToFloat32);
+        }
+        const [rows, cols] = info.shape;
+        decoded[name] = Array.from({ length: rows }, (_, i) => values.subarray(i * cols, (i + 1) * cols));
+    });
+    return decoded;
+}
+
+function fetchBuffer(url) {
+    if (!bufferCache.has(url)) {
+        bufferCache.set(url, fetch(url).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.arrayBuffer();
+        }));
+    }
+    return bufferCache.get(url);
+}
+
+function decodeSparseArrays(vizData) {
+    // Expand sparse mineral maps (coo: flat indices of detected pixels, rle: [id, length] runs)
+    // and their band depth (one value per detected pixel, row-major) back into rows
+    const decoded = {};
+    ['group1', 'group2'].forEach(group => {
+        const ids = vizData[`${group}_mineral_id`];
+        const depths = vizData[`${group}_band_depth`];
+        if (!ids || !ids.encoding) return;
+        const [rows, cols] = ids.shape;
+        const idValues = new Uint16Array(rows * cols);
+        if (ids.encoding === 'coo') {
+            ids.index.forEach((flat, k) => { idValues[flat] = ids.values[k]; });
+        } else {
+            for (let k = 0, pos = 0; k < ids.runs.length; k += 2) {
+                idValues.fill(ids.runs[k], pos, pos + ids.runs[k + 1]);
+                pos += ids.runs[k + 1];
+            }
+        }
+        const depthValues = new Float32Array(rows * cols).fill(NaN);
+        for (let flat = 0, k = 0; flat < idValues.length; flat++) {
+            if (idValues[flat] > 0) depthValues[flat] = depths.values[k++];
+        }
+        decoded[`${group}_mineral_id`] = Array.from({ length: rows }, (_, i) => idValues.subarray(i * cols, (i + 1) * cols));
+        decoded[`${group}_band_depth`] = Array.from({ length: rows }, (_, i) => depthValues.subarray(i * cols, (i + 1) * cols));
+    });
+    return decoded;
+}
+
+function loadVisualizationData(dataset) {
+    // Split layouts list only summaries; a granule's arrays are fetched the first time it is shown
+    if (dataset.visualization_data || !dataset.data_url) {
+        return Promise.resolve(dataset.visualization_data);
+    }
+    if (!datasetCache.has(dataset.data_url)) {
+        datasetCache.set(dataset.data_url, fetch(dataset.data_url).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        }).then(data => data.visualization_data));
+    }
+    return datasetCache.get(dataset.data_url);
+}
+
+function fetchTile(baseUrl, pyramid, z, x, y) {
+    const extension = pyramid.format === 'binary' ? 'bin' : 'json';
+    const url = `${baseUrl}${z}/${x}_${y}.${extension}`;
+    if (!tileCache.has(url)) {
+        if (pyramid.format === 'binary') {
+            const size = pyramid.tile_size;
+            tileCache.set(url, fetchBuffer(url).then(buffer => {
+                bufferCache.delete(url);
+                return Object.assign({ x: x, y: y, shape: [size, size] }, decodeBinaryArrays(buffer, pyramid.tile_arrays));
+            }));
+        } else {
+            tileCache.set(url, fetch(url).then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            }));
+        }
+    }
+    return tileCache.get(url);
+}
+
+function chooseTileLevel(pyramid, view) {
+    // Finest level whose cells covering the view stay within MAX_VIEW_CELLS
+    for (let z = pyramid.max_zoom; z > 0; z--) {
+        const level = pyramid.levels[z];
+        if ((view.x1 - view.x0) / level.factor <= MAX_VIEW_CELLS &&
+            (view.y1 - view.y0) / level.factor <= MAX_VIEW_CELLS) {
+            return level;
+        }
+    }
+    return pyramid.levels[0];
+}
+
+async function loadTileWindow(pyramidUrl, view) {
+    const pyramid = await loadPyramid(pyramidUrl);
+    const baseUrl = pyramidUrl.slice(0, pyramidUrl.lastIndexOf('/') + 1);
+    const level = chooseTileLevel(pyramid, view);
+    const size = pyramid.tile_size;
+    const factor = level.factor;
+    
+    // View window in level cells
+    const c0 = Math.floor(view.x0 / factor);
+    const r0 = Math.floor(view.y0 / factor);
+    const c1 = Math.min(level.shape[1], Math.ceil(view.x1 / factor));
+    const r1 = Math.min(level.shape[0], Math.ceil(view.y1 / factor));
+    const rows = Math.max(1, r1 - r0);
+    const cols = Math.max(1, c1 - c0);
+    
+    const keys = ['group1_band_depth', 'group1_mineral_id', 'group2_band_depth', 'group2_mineral_id'];
+    const windowData = { origin: { row: r0 * factor, col: c0 * factor, factor: factor } };
+    keys.forEach(key => {
+        const fill = key.endsWith('band_depth') ? NaN : 0;
+        windowData[key] = Array.from({ length: rows }, () => new Array(cols).fill(fill));
+    });
+    
+    // Only fetch tiles that intersect the view and were written (non-empty)
+    const present = new Set(level.tiles.map(([x, y]) => `${x}_${y}`));
+    const requests = [];
+    for (let ty = Math.floor(r0 / size); ty <= Math.floor((r0 + rows - 1) / size); ty++) {
+        for (let tx = Math.floor(c0 / size); tx <= Math.floor((c0 + cols - 1) / size); tx++) {
+            if (present.has(`${tx}_${ty}`)) {
+                requests.push(fetchTile(baseUrl, pyramid, level.z, tx, ty));
+            }
+        }
+    }
+    
+    const tiles = await Promise.all(requests);
+    
+    // Pre-rendered tile images, placed in window cells; edge tiles are smaller than tile_size
+    if (pyramid.rasters) {
+        windowData.mineralColors = {};
+        Object.entries(pyramid.rasters).forEach(([group, raster]) => {
+            windowData.mineralColors[group] = raster.mineral_colors;
+        });
+        windowData.images = tiles.map(tile => {
+            const urls = {};
+            keys.forEach(key => {
+                urls[key] = `${baseUrl}${level.z}/${tile.x}_${tile.y}_${key}.png`;
+            });
+            return {
+                row: tile.y * size - r0,
+                col: tile.x * size - c0,
+                rows: Math.min(size, level.shape[0] - tile.y * size),
+                cols: Math.min(size, level.shape[1] - tile.x * size),
+                urls: urls
+            };
+        });
+    }
+    
+    tiles.forEach(tile => {
+        const tileRow0 = tile.y * size;
+        const tileCol0 = tile.x * size;
+        const rStart = Math.max(r0, tileRow0);
+        const rEnd = Math.min(r0 + rows, tileRow0 + tile.shape[0]);
+        const cStart = Math.max(c0, tileCol0);
+        const cEnd = Math.min(c0 + cols, tileCol0 + tile.shape[1]);
+        keys.forEach(key => {
+            for (let r = rStart; r < rEnd; r++) {
+                const source = tile[key][r - tileRow0];
+                const target = windowData[key][r - r0];
+                for (let c = cStart; c < cEnd; c++) {
+                    const value = source[c - tileCol0];
+                    target[c - c0] = value === null ? NaN : value;
+                }
+            }
+        });
+    });
+    
+    return windowData;
+}
+
+function sceneShape(dataset) {
+    const dims = dataset.summary.dimensions;
+    return [dims.downtrack, dims.crosstrack];
+}
+
+async function getVisualizationWindow(dataset) {
+    // Tiled granules only fetch what is in view; older outputs fall back to the single grid
+    if (dataset.summary.tiles) {
+        const [rows, cols] = sceneShape(dataset);
+        const view = currentView || { x0: 0, y0: 0, x1: cols, y1: rows };
+        return loadTileWindow(dataset.summary.tiles, view);
+    }
+    
+    const vizData = await loadVisualizationData(dataset);
+    const windowData = { origin: { row: 0, col: 0, factor: emitData.metadata.downsample_factor } };
+    if (vizData.rasters) {
+        const [rows, cols] = vizData.downsampled_shape;
+        const urls = {};
+        windowData.mineralColors = {};
+        Object.entries(vizData.rasters).forEach(([group, raster]) => {
+            urls[`${group}_band_depth`] = raster.band_depth;
+            urls[`${group}_mineral_id`] = raster.mineral_id;
+            windowData.mineralColors[group] = raster.mineral_colors;
+        });
+        windowData.images = [{ row: 0, col: 0, rows: rows, cols: cols, urls: urls }];
+    }
+    if (vizData.format === 'binary') {
+        const buffer = await fetchBuffer(vizData.buffer);
+        return Object.assign(windowData, decodeBinaryArrays(buffer, vizData.arrays));
+    }
+    return Object.assign(windowData, vizData, decodeSparseArrays(vizData));
+}
+
+function rasterImages(vizData, key) {
+    // Pre-rendered images for one array of the window, or null to draw cells
+    if (!vizData.images) return null;
+    return vizData.images.map(image => ({
+        row: image.row,
+        col: image.col,
+        rows: image.rows,
+        cols: image.cols,
+        url: image.urls[key]
+    }));
+}
+
+function drawRasterImages(g, images, cellWidth, cellHeight, width, height, clipId) {
+    // One <image> per raster instead of one <rect> per pixel
+    g.append('clipPath')
+     .attr('id', clipId)
+     .append('rect')
+     .attr('width', width)
+     .attr('height', height);
+    
+    g.append('g')
+     .attr('clip-path', `url(#${clipId})`)
+     .selectAll('image')
+     .data(images)
+     .enter()
+     .append('image')
+     .attr('href', d => d.url)
+     .attr('x', d => d.col * cellWidth)
+     .attr('y', d => d.row * cellHeight)
+     .attr('width', d => d.cols * cellWidth)
+     .attr('height', d => d.rows * cellHeight)
+     .attr('preserveAspectRatio', 'none')
+     .style('image-rendering', 'pixelated');
+}
+
+function attachHitTest(g, width, height, cellWidth, cellHeight, lookup) {
+    // Tooltips read the window arrays under the pointer, so there are no per-pixel listeners
+    g.append('rect')
+     .attr('width', width)
+     .attr('height', height)
+     .attr('fill', 'transparent')
+     .on('mousemove', function(event) {
+         const [x, y] = d3.pointer(event);
+         const data = lookup(Math.floor(y / cellHeight), Math.floor(x / cellWidth));
+         if (data) {
+             showTooltip(event, data);
+         } else {
+             hideTooltip();
+         }
+     })
+     .on('mouseout', hideTooltip);
+}
+
+function attachZoom(svg, dataset, width, height) {
+    if (!dataset.summary.tiles) return;
+    
+    const [rows, cols] = sceneShape(dataset);
+    const maxZoom = Math.max(1, Math.max(rows, cols) / 16);
+    const zoom = d3.zoom()
+                   .scaleExtent([1, maxZoom])
+                   .translateExtent([[0, 0], [width, height]])
+                   .extent([[0, 0], [width, height]])
+                   .on('end', function(event) {
+                       const t = event.transform;
+                       const view = {
+                           x0: Math.max(0, (-t.x / t.k) / width * cols),
+                           y0: Math.max(0, (-t.y / t.k) / height * rows),
+                           x1: Math.min(cols, ((width - t.x) / t.k) / width * cols),
+                           y1: Math.min(rows, ((height - t.y) / t.k) / height * rows)
+                       };
+                       if (currentView && ['x0', 'y0', 'x1', 'y1'].every(key => currentView[key] === view[key])) return;
+                       currentView = view;
+                       updateVisualization();
+                   });
+    svg.call(zoom);
+    
+    // Keep every map's zoom state in sync with the shared view
+    if (currentView) {
+        const k = cols / (currentView.x1 - currentView.x0);
+        svg.node().__zoom = d3.zoomIdentity
+                              .translate(-currentView.x0 / cols * width * k, -currentView.y0 / rows * height * k)
+                              .scale(k);
+    } else {
+        svg.node().__zoom = d3.zoomIdentity;
+    }
+}
+
+async function createHeatmaps() {
     const dataset = emitData.datasets[currentDataset];
-    const vizData = dataset.visualization_data;
+    const token = ++renderToken;
+    const vizData = await getVisualizationWindow(dataset);
+    if (token !== renderToken) return;
     
     // Show/hide groups based on selection
     const group1Section = document.getElementById('group1-heatmap');
@@ -190,17 +532,20 @@ function createHeatmaps() {
     group2Section.style.display = (currentGroup === 'group1') ? 'none' : 'block';
     
     if (currentGroup !== 'group2') {
-        createHeatmap('group1-svg', vizData.group1_band_depth, vizData.group1_mineral_id, 'Group 1');
+        createHeatmap('group1-svg', vizData.group1_band_depth, vizData.group1_mineral_id, 'Group 1', vizData.origin,
+                      rasterImages(vizData, 'group1_band_depth'));
     }
     
     if (currentGroup !== 'group1') {
-        createHeatmap('group2-svg', vizData.group2_band_depth, vizData.group2_mineral_id, 'Group 2');
+        createHeatmap('group2-svg', vizData.group2_band_depth, vizData.group2_mineral_id, 'Group 2', vizData.origin,
+                      rasterImages(vizData, 'group2_band_depth'));
     }
 }
 
-function createHeatmap(svgId, bandDepthData, mineralIdData, groupName) {
+function createHeatmap(svgId, bandDepthData, mineralIdData, groupName, origin, images) {
     const svg = d3.select(`#${svgId}`);
     svg.selectAll('*').remove();
+    origin = origin || { row: 0, col: 0, factor: 1 };
     
     const margin = { top: 10, right: 10, bottom: 10, left: 10 };
     const width = 400 - margin.left - margin.right;
@@ -221,35 +566,47 @@ function createHeatmap(svgId, bandDepthData, mineralIdData, groupName) {
     const cellWidth = width / cols;
     const cellHeight = height / rows;
     
-    // Create heatmap cells
-    for (let i = 0; i < rows; i++) {
-        for (let j = 0; j < cols; j++) {
-            const bandDepth = bandDepthData[i][j];
-            const mineralId = mineralIdData[i][j];
-            
-            if (mineralId > 0 && !isNaN(bandDepth)) {
-                g.append('rect')
-                 .attr('x', j * cellWidth)
-                 .attr('y', i * cellHeight)
-                 .attr('width', cellWidth)
-                 .attr('height', cellHeight)
-                 .attr('fill', bandDepthColorScale(bandDepth))
-                 .attr('stroke', 'none')
-                 .on('mouseover', function(event) {
-                     showTooltip(event, {
-                         group: groupName,
-                         row: i,
-                         col: j,
-                         bandDepth: bandDepth.toFixed(3),
-                         mineralId: mineralId,
-                         mineralName: emitData.mineral_mapping[mineralId] || `Mineral ${mineralId}`
-                     });
-                 })
-                 .on('mouseout', hideTooltip);
+    const tooltipData = (i, j) => {
+        const bandDepth = bandDepthData[i][j];
+        const mineralId = mineralIdData[i][j];
+        if (!(mineralId > 0) || isNaN(bandDepth)) return null;
+        return {
+            group: groupName,
+            row: origin.row + i * origin.factor,
+            col: origin.col + j * origin.factor,
+            bandDepth: bandDepth.toFixed(3),
+            mineralId: mineralId,
+            mineralName: emitData.mineral_mapping[mineralId] || `Mineral ${mineralId}`
+        };
+    };
+    
+    if (images) {
+        drawRasterImages(g, images, cellWidth, cellHeight, width, height, `${svgId}-clip`);
+        attachHitTest(g, width, height, cellWidth, cellHeight,
+                      (i, j) => (i >= 0 && i < rows && j >= 0 && j < cols) ? tooltipData(i, j) : null);
+    } else {
+        // Create heatmap cells
+        for (let i = 0; i < rows; i++) {
+            for (let j = 0; j < cols; j++) {
+                const data = tooltipData(i, j);
+                
+                if (data) {
+                    g.append('rect')
+                     .attr('x', j * cellWidth)
+                     .attr('y', i * cellHeight)
+                     .attr('width', cellWidth)
+                     .attr('height', cellHeight)
+                     .attr('fill', bandDepthColorScale(bandDepthData[i][j]))
+                     .attr('stroke', 'none')
+                     .on('mouseover', event => showTooltip(event, data))
+                     .on('mouseout', hideTooltip);
+                }
             }
         }
     }
     
+    attachZoom(svg, emitData.datasets[currentDataset], width + margin.left + margin.right, height + margin.top + margin.bottom);
+    
     // Create colorbar
     createColorbar(`${svgId.replace('-svg', '-colorbar')}`, bandDepthColorScale, [0, 0.5], 'Band Depth');
 }
@@ -313,9 +670,11 @@ function createColorbar(containerId, colorScale, domain, label) {
        .style('font-weight', 'bold');
 }
 
-function createMineralMap() {
+async function createMineralMap() {
     const dataset = emitData.datasets[currentDataset];
-    const vizData = dataset.visualization_data;
+    const token = ++renderToken;
+    const vizData = await getVisualizationWindow(dataset);
+    if (token !== renderToken) return;
     
     const container = d3.select('#mineral-map-container');
     container.selectAll('*').remove();
@@ -336,7 +695,8 @@ function createMineralMap() {
                       .style('color', '#555')
                       .text('Group 1 Mineral Distribution');
         
-        createMineralIdMap(group1Container, vizData.group1_mineral_id, 'group1', 'Group 1');
+        createMineralIdMap(group1Container, vizData.group1_mineral_id, 'group1', 'Group 1', vizData.origin,
+                           rasterImages(vizData, 'group1_mineral_id'), vizData.mineralColors && vizData.mineralColors.group1);
     }
     
     if (currentGroup !== 'group1') {
@@ -347,11 +707,13 @@ function createMineralMap() {
                       .style('color', '#555')
                       .text('Group 2 Mineral Distribution');
         
-        createMineralIdMap(group2Container, vizData.group2_mineral_id, 'group2', 'Group 2');
+        createMineralIdMap(group2Container, vizData.group2_mineral_id, 'group2', 'Group 2', vizData.origin,
+                           rasterImages(vizData, 'group2_mineral_id'), vizData.mineralColors && vizData.mineralColors.group2);
     }
 }
 
-function createMineralIdMap(container, mineralIdData, groupName, groupDisplayName) {
+function createMineralIdMap(container, mineralIdData, groupName, groupDisplayName, origin, images, colors) {
+    origin = origin || { row: 0, col: 0, factor: 1 };
     const margin = { top: 10, right: 10, bottom: 10, left: 10 };
     const width = 400 - margin.left - margin.right;
     const height = 300 - margin.bottom - margin.top;
@@ -370,45 +732,54 @@ function createMineralIdMap(container, mineralIdData, groupName, groupDisplayNam
     const cellHeight = height / rows;
     
     // Get unique mineral IDs in this group for color scaling
-    const uniqueMinerals = [...new Set(mineralIdData.flat().filter(id => id > 0))];
-    
-    // Create a color scale with enough distinct colors
-    const mineralColors = d3.scaleOrdinal()
-                            .domain(uniqueMinerals)
-                            .range(d3.schemeSet3.concat(d3.schemeSet2).concat(d3.schemeSet1));
-    
-    // Create mineral map cells
-    for (let i = 0; i < rows; i++) {
-        for (let j = 0; j < cols; j++) {
-            const mineralId = mineralIdData[i][j];
-            
-            if (mineralId > 0 && !isNaN(mineralId)) {
-                const mineralName = emitData.mineral_mapping[mineralId] || `Mineral ${mineralId}`;
-                const color = mineralColors(mineralId);
+    const uniqueMinerals = [...new Set(mineralIdData.flatMap(row => Array.from(row)).filter(id => id > 0))];
+    
+    // Pre-rendered maps carry the granule's color assignment; otherwise color by the minerals in view
+    const mineralColors = colors ? (id => colors[id]) : d3.scaleOrdinal()
+                                                           .domain(uniqueMinerals)
+                                                           .range(d3.schemeSet3.concat(d3.schemeSet2).concat(d3.schemeSet1));
+    
+    const tooltipData = (i, j) => {
+        const mineralId = mineralIdData[i][j];
+        if (!(mineralId > 0)) return null;
+        return {
+            group: groupDisplayName,
+            row: origin.row + i * origin.factor,
+            col: origin.col + j * origin.factor,
+            mineralId: mineralId,
+            mineralName: emitData.mineral_mapping[mineralId] || `Mineral ${mineralId}`,
+            color: mineralColors(mineralId)
+        };
+    };
+    
+    if (images) {
+        drawRasterImages(g, images, cellWidth, cellHeight, width, height, `${groupName}-mineral-clip`);
+        attachHitTest(g, width, height, cellWidth, cellHeight,
+                      (i, j) => (i >= 0 && i < rows && j >= 0 && j < cols) ? tooltipData(i, j) : null);
+    } else {
+        // Create mineral map cells
+        for (let i = 0; i < rows; i++) {
+            for (let j = 0; j < cols; j++) {
+                const data = tooltipData(i, j);
                 
-                g.append('rect')
-                 .attr('x', j * cellWidth)
-                 .attr('y', i * cellHeight)
-                 .attr('width', cellWidth)
-                 .attr('height', cellHeight)
-                 .attr('fill', color)
-                 .attr('stroke', '#ffffff')
-                 .attr('stroke-width', 0.1)
-                 .on('mouseover', function(event) {
-                     showTooltip(event, {
-                         group: groupDisplayName,
-                         row: i,
-                         col: j,
-                         mineralId: mineralId,
-                         mineralName: mineralName,
-                         color: color
-                     });
-                 })
-                 .on('mouseout', hideTooltip);
+                if (data) {
+                    g.append('rect')
+                     .attr('x', j * cellWidth)
+                     .attr('y', i * cellHeight)
+                     .attr('width', cellWidth)
+                     .attr('height', cellHeight)
+                     .attr('fill', data.color)
+                     .attr('stroke', '#ffffff')
+                     .attr('stroke-width', 0.1)
+                     .on('mouseover', event => showTooltip(event, data))
+                     .on('mouseout', hideTooltip);
+                }
             }
         }
     }
     
+    attachZoom(svg, emitData.datasets[currentDataset], width + margin.left + margin.right, height + margin.top + margin.bottom);
+    
     // Create a mineral legend for this group
     createMineralLegend(container, uniqueMinerals, mineralColors, groupDisplayName);
 }
@@ -469,9 +840,22 @@ function createMineralLegend(container, uniqueMinerals, colorScale, groupName) {
     });
 }
 
-function createStatisticsCharts() {
+function loadCoverage(url) {
+    if (!coverageCache.has(url)) {
+        coverageCache.set(url, fetch(url).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        }));
+    }
+    return coverageCache.get(url);
+}
+
+async function createStatisticsCharts() {
     const dataset = emitData.datasets[currentDataset];
     const summary = dataset.summary;
+    const token = ++renderToken;
     
     // Mineral count chart
     createMineralCountChart(summary);
@@ -479,11 +863,39 @@ function createStatisticsCharts() {
     // Band depth statistics chart
     createBandDepthChart(summary);
     
-    // Spatial distribution placeholder
-    createSpatialChart();
+    // Coverage sidecar with full-resolution per-mineral statistics (older outputs have none)
+    const coverage = summary.coverage ? await loadCoverage(summary.coverage) : null;
+    if (token !== renderToken) return;
+    
+    createSpatialChart(summary, coverage);
+    createComparisonChart(summary, coverage);
+}
+
+function groupMetrics(summary, coverage, group) {
+    // Percentages for the comparison chart
+    const stats = summary.band_depth_stats[group];
+    if (!coverage) {
+        const dims = summary.dimensions;
+        return {
+            coverage: 100 * stats.pixels_with_minerals / (dims.downtrack * dims.crosstrack),
+            diversity: 0,
+            intensity: 100 * stats.mean / 0.5,
+            dominance: 0
+        };
+    }
     
-    // Comparison chart placeholder
-    createComparisonChart();
+    const groupCoverage = coverage.groups[group];
+    const detected = groupCoverage.detected_pixels;
+    const shares = groupCoverage.minerals.map(m => m.pixels / detected);
+    const entropy = -shares.reduce((sum, p) => sum + p * Math.log(p), 0);
+    return {
+        coverage: 100 * groupCoverage.coverage_fraction,
+        // Shannon evenness of the mineral mix
+        diversity: shares.length > 1 ? 100 * entropy / Math.log(shares.length) : 0,
+        intensity: 100 * stats.mean / 0.5,
+        // Share of detections taken by the most common mineral
+        dominance: shares.length ? 100 * shares[0] : 0
+    };
 }
 
 function createMineralCountChart(summary) {
@@ -573,18 +985,29 @@ function createBandDepthChart(summary) {
     });
 }
 
-function createSpatialChart() {
+function createSpatialChart(summary, coverage) {
     const ctx = document.getElementById('spatial-distribution-chart');
     if (ctx.chart) {
         ctx.chart.destroy();
     }
     
+    let withMinerals, total;
+    if (coverage) {
+        withMinerals = coverage.detected_pixels;
+        total = coverage.valid_pixels;
+    } else {
+        // Without the sidecar the best estimate is the larger group over the whole scene
+        withMinerals = Math.max(summary.band_depth_stats.group1.pixels_with_minerals,
+                                summary.band_depth_stats.group2.pixels_with_minerals);
+        total = summary.dimensions.downtrack * summary.dimensions.crosstrack;
+    }
+    
     ctx.chart = new Chart(ctx, {
         type: 'doughnut',
         data: {
             labels: ['Pixels with Minerals', 'Pixels without Minerals'],
             datasets: [{
-                data: [25, 75], // Placeholder data
+                data: [withMinerals, Math.max(0, total - withMinerals)],
                 backgroundColor: ['#667eea', '#e9ecef'],
                 borderColor: ['#5a6fd8', '#dee2e6'],
                 borderWidth: 1
@@ -603,25 +1026,29 @@ function createSpatialChart() {
     });
 }
 
-function createComparisonChart() {
+function createComparisonChart(summary, coverage) {
     const ctx = document.getElementById('comparison-chart');
     if (ctx.chart) {
         ctx.chart.destroy();
     }
     
+    const metrics = ['coverage', 'diversity', 'intensity', 'dominance'];
+    const group1 = groupMetrics(summary, coverage, 'group1');
+    const group2 = groupMetrics(summary, coverage, 'group2');
+    
     ctx.chart = new Chart(ctx, {
         type: 'radar',
         data: {
-            labels: ['Coverage', 'Diversity', 'Intensity', 'Quality'],
+            labels: ['Coverage %', 'Diversity %', 'Intensity %', 'Dominance %'],
             datasets: [{
                 label: 'Group 1',
-                data: [65, 59, 80, 81],
+                data: metrics.map(key => group1[key]),
                 borderColor: '#667eea',
                 backgroundColor: 'rgba(102, 126, 234, 0.2)',
                 pointBackgroundColor: '#667eea'
             }, {
                 label: 'Group 2',
-                data: [28, 48, 40, 19],
+                data: metrics.map(key => group2[key]),
                 borderColor: '#764ba2',
                 backgroundColor: 'rgba(118, 75, 162, 0.2)',
                 pointBackgroundColor: '#764ba2'
@@ -635,6 +1062,12 @@ function createComparisonChart() {
                     display: true,
                     text: 'Group Comparison'
                 }
+            },
+            scales: {
+                r: {
+                    min: 0,
+                    max: 100
+                }
             }
         }
     });
@@ -0,0 +1,98 @@
+import json
+import os
+import numpy as np
+from pathlib import Path
+
+ARRAY_DIR = "arrays"
+META_FILE = "meta.json"
+
+
+def write_array_store(out_dir, arrays, attrs=None):
+    """
+    Write full-resolution arrays as one .npy file each plus a meta.json describing them,
+    so readers can memory-map any array and slice windows without loading the granule.
+    Each file is written to a temporary name and renamed, so readers never see a partial array.
+    Returns the metadata.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / META_FILE).unlink(missing_ok=True)
+    meta = {"shape": None, "arrays": {}, "attrs": attrs or {}}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        tmp_path = out_dir / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_path, out_dir / f"{name}.npy")
+        meta["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape)}
+        meta["shape"] = meta["shape"] or list(arr.shape)
+
+    write_meta(out_dir, meta)
+    return meta
+
+
+def write_meta(out_dir, meta):
+    """Write meta.json last, so a store only becomes visible once all its arrays are in place"""
+    tmp_path = Path(out_dir) / f"{META_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, Path(out_dir) / META_FILE)
+
+
+def source_attrs(file_path):
+    """Identify the granule a store was built from, so stale stores can be detected"""
+    stat = os.stat(file_path)
+    return {"filename": Path(file_path).name, "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def is_current(store_dir, file_path):
+    """True if store_dir holds a complete store built from the current version of file_path"""
+    meta_path = Path(store_dir) / META_FILE
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        attrs = json.load(f)["attrs"]
+    current = source_attrs(file_path)
+    return all(attrs.get(key) == value for key, value in current.items())
+
+
+def store_files(store_dir):
+    """Names of the files making up a store, meta.json last"""
+    with open(Path(store_dir) / META_FILE) as f:
+        meta = json.load(f)
+    return [f"{name}.npy" for name in meta["arrays"]] + [META_FILE]
+
+
+class ArrayStore:
+    """
+    Read-only view of an array store. Arrays are opened lazily as read-only memory maps,
+    so only the pages a window touches are read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+        self.attrs = self.meta["attrs"]
+        self._arrays = {}
+
+    @property
+    def names(self):
+        return list(self.meta["arrays"])
+
+    def __contains__(self, name):
+        return name in self.meta["arrays"]
+
+    def __getitem__(self, name):
+        if name not in self.meta["arrays"]:
+            raise KeyError(f"{name} not in array store {self.path}")
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = self._arrays[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return arr
+
+
+def unique_ids(mineral_id):
+    """Sorted IDs present in an unsigned integer mineral ID array, by bincount instead of a full sort"""
+    return np.flatnonzero(np.bincount(np.asarray(mineral_id).ravel()))
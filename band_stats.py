@@ -0,0 +1,118 @@
+import numpy as np
+from netCDF4 import Dataset
+
+CHUNK_ROWS = 256
+HISTOGRAM_BINS = 50
+HISTOGRAM_RANGE = (0.0, 0.5)
+GROUPS = {
+    "group1": ("group_1_band_depth", "group_1_mineral_id"),
+    "group2": ("group_2_band_depth", "group_2_mineral_id")
+}
+
+
+def read_array(variable, key=Ellipsis):
+    """Read a netCDF4 variable (or a slice of it) as float32 with fill values as NaN"""
+    return np.ma.filled(variable[key].astype(np.float32), np.nan)
+
+
+def read_rows(variable, start, stop):
+    """Read rows [start, stop) of a netCDF4 variable"""
+    return read_array(variable, slice(start, stop))
+
+
+def iter_chunks(nc, names, chunk_rows=CHUNK_ROWS):
+    """
+    Yield (start_row, {name: rows}) downtrack chunks of the given root variables from an open
+    netCDF4 Dataset, so peak memory is bounded by chunk_rows instead of the scene size.
+    """
+    total = nc.dimensions["downtrack"].size
+    for start in range(0, total, chunk_rows):
+        stop = min(start + chunk_rows, total)
+        yield start, {name: read_rows(nc.variables[name], start, stop) for name in names}
+
+
+class BandDepthAccumulator:
+    """
+    Streaming min/max/mean/variance/histogram of band depth over pixels with a mineral detection.
+    Chunks are merged with Chan's parallel variance update, so the result matches a full pass.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS, value_range=HISTOGRAM_RANGE):
+        self.bins = bins
+        self.value_range = value_range
+        self.count = 0
+        self.detections = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.minerals = np.empty(0, dtype=np.int64)
+
+    def update(self, band_depth, mineral_id):
+        # NaN IDs (fill) compare False, so they never count as detections
+        detected = mineral_id > 0
+        self.detections += int(np.count_nonzero(detected))
+        self.minerals = np.union1d(self.minerals, np.unique(mineral_id[detected]).astype(np.int64))
+
+        values = band_depth[detected]
+        values = values[np.isfinite(values)].astype(np.float64)
+        n = values.size
+        if n == 0:
+            return
+
+        chunk_mean = values.mean()
+        chunk_m2 = np.square(values - chunk_mean).sum()
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        lo, hi = self.value_range
+        bins = ((values - lo) * (self.bins / (hi - lo))).astype(np.int64)
+        self.histogram += np.bincount(np.clip(bins, 0, self.bins - 1), minlength=self.bins)
+
+    def result(self):
+        """Summary dict; min/max/mean are 0 when nothing was detected, as in the web summary"""
+        found = self.count > 0
+        return {
+            "min": float(self.min) if found else 0,
+            "max": float(self.max) if found else 0,
+            "mean": float(self.mean) if found else 0,
+            "variance": float(self.m2 / self.count) if found else 0,
+            "count": int(self.count),
+            "pixels_with_minerals": int(self.detections),
+            "histogram": {
+                "range": list(self.value_range),
+                "counts": self.histogram.tolist()
+            }
+        }
+
+
+def compute_band_depth_stats(source, chunk_rows=CHUNK_ROWS, bins=HISTOGRAM_BINS, coverage=None):
+    """
+    Single-pass chunked band depth statistics for both mineral groups.
+    source is a granule path or an open netCDF4 Dataset.
+    coverage, if given, is fed the same chunks ({group: (band_depth, mineral_id)}) so further
+    accumulators (e.g. coverage_stats.CoverageAccumulator) do not need another read of the file.
+    Returns ({group: stats}, {group: sorted detected mineral IDs}).
+    """
+    nc = source if isinstance(source, Dataset) else Dataset(source, 'r')
+    try:
+        accumulators = {group: BandDepthAccumulator(bins) for group in GROUPS}
+        names = [name for pair in GROUPS.values() for name in pair]
+        for _, chunk in iter_chunks(nc, names, chunk_rows):
+            for group, (bd_name, id_name) in GROUPS.items():
+                accumulators[group].update(chunk[bd_name], chunk[id_name])
+            if coverage is not None:
+                coverage.update({group: (chunk[bd_name], chunk[id_name]) for group, (bd_name, id_name) in GROUPS.items()})
+    finally:
+        if nc is not source:
+            nc.close()
+
+    stats = {group: acc.result() for group, acc in accumulators.items()}
+    minerals = {group: acc.minerals.tolist() for group, acc in accumulators.items()}
+    return stats, minerals
@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from netCDF4 import Dataset
+
+from synthetic_emit import CROSSTRACK, DOWNTRACK, make_scene
+
+BENCH_DIR = "bench_work"
+DEFAULT_SIZES = (1, 4)
+DEFAULT_REPEAT = 3
+# A stage regresses when its median time or peak RSS grows by more than this fraction
+DEFAULT_THRESHOLD = 0.2
+# Stages faster than this in both runs are timer noise, not regressions
+MIN_SECONDS = 0.05
+SERVE_REQUESTS = 50
+
+
+def _dir_bytes(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _process_peak_rss_bytes(pid):
+    """Peak RSS of a process from /proc (Linux), or None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_bytes():
+    """
+    Peak resident set size of this process. Linux carries ru_maxrss over fork and exec (it would
+    report the parent's peak), so the per-process VmHWM is preferred; ru_maxrss is KiB on Linux,
+    bytes on macOS.
+    """
+    peak = _process_peak_rss_bytes(os.getpid())
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Each stage is (setup, run): setup(files, work_dir) prepares untimed state, run(state) is timed
+# and returns the number of output bytes it produced.
+
+def _setup_files(files, work_dir):
+    return {"files": files, "work_dir": Path(work_dir)}
+
+
+def _run_decode_chararray(state):
+    from mineral_names import decode_chararray
+    total = 0
+    for file_path in state["files"]:
+        nc = Dataset(file_path, 'r')
+        try:
+            total += sum(len(name) for name in decode_chararray(nc.groups["mineral_metadata"].variables["name"][:]))
+        finally:
+            nc.close()
+    return total
+
+
+def _run_band_depth_stats(state):
+    from band_stats import compute_band_depth_stats
+    from coverage_stats import CoverageAccumulator
+    total = 0
+    for file_path in state["files"]:
+        stats, _ = compute_band_depth_stats(file_path, coverage=CoverageAccumulator())
+        total += len(json.dumps(stats))
+    return total
+
+
+def _downsampled_lists(file_path):
+    from band_stats import read_array
+    from data_processor import DOWNSAMPLE_FACTOR
+    strided = (slice(None, None, DOWNSAMPLE_FACTOR), slice(None, None, DOWNSAMPLE_FACTOR))
+    nc = Dataset(file_path, 'r')
+    try:
+        arrays = {name: read_array(nc.variables[name], strided)
+                  for name in ("group_1_band_depth", "group_2_band_depth", "group_1_mineral_id", "group_2_mineral_id")}
+    finally:
+        nc.close()
+    return {name: (arr.tolist() if "band_depth" in name else arr.astype(int).tolist()) for name, arr in arrays.items()}
+
+
+def _run_downsample_tolist(state):
+    return sum(len(rows) * len(rows[0]) for file_path in state["files"]
+               for rows in _downsampled_lists(file_path).values())
+
+
+def _setup_json_dump(files, work_dir):
+    state = _setup_files(files, work_dir)
+    state["datasets"] = [_downsampled_lists(file_path) for file_path in files]
+    return state
+
+
+def _run_json_dump(state):
+    path = state["work_dir"] / "json_dump.json"
+    with open(path, "w") as f:
+        json.dump(state["datasets"], f, indent=2)
+    return path.stat().st_size
+
+
+def _run_process(state):
+    from data_processor import create_mineral_mapping, process_granules
+    from web_writer import write_web_data
+    out_dir = state["work_dir"] / "process_out"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    records = process_granules(state["files"], out_dir, workers=1)
+    mapping = create_mineral_mapping(state["files"], str(out_dir / "mineral_index.sqlite"))
+    write_web_data(out_dir, {}, mapping, [r["dataset_path"] for r in records])
+    return _dir_bytes(out_dir)
+
+
+def _setup_serve(files, work_dir):
+    """Process the scene (untimed) and start server.py on a free port over the output"""
+    from data_processor import create_mineral_mapping, process_granules
+    from web_writer import write_web_data
+    state = _setup_files(files, work_dir)
+    out_dir = state["work_dir"] / "serve_root"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    records = process_granules(files, out_dir, workers=1, write_tiles=False)
+    mapping = create_mineral_mapping(files, str(out_dir / "mineral_index.sqlite"))
+    write_web_data(out_dir, {}, mapping, [r["dataset_path"] for r in records])
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, str(Path(__file__).parent / "server.py"), "--port", str(port), "--bind", "127.0.0.1",
+         "--directory", str(out_dir), "--precompress", "--no-browser"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/web_data.json"
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    else:
+        server.kill()
+        raise RuntimeError("server.py did not start")
+    state.update(server=server, url=url)
+    return state
+
+
+def _run_serve(state):
+    """SERVE_REQUESTS full downloads of web_data.json, alternating identity and gzip"""
+    total = 0
+    for i in range(SERVE_REQUESTS):
+        request = urllib.request.Request(state["url"], headers={"Accept-Encoding": "gzip" if i % 2 else "identity"})
+        with urllib.request.urlopen(request) as response:
+            total += len(response.read())
+    return total
+
+
+STAGES = {
+    "decode_chararray": (_setup_files, _run_decode_chararray),
+    "band_depth_stats": (_setup_files, _run_band_depth_stats),
+    "downsample_tolist": (_setup_files, _run_downsample_tolist),
+    "json_dump": (_setup_json_dump, _run_json_dump),
+    "process": (_setup_files, _run_process),
+    "serve": (_setup_serve, _run_serve)
+}
+
+
+def run_stage(name, scene_dir, work_dir, repeat):
+    """Run one stage in this process and return its measurements (called in a fresh subprocess)"""
+    setup, run = STAGES[name]
+    files = sorted(str(p) for p in Path(scene_dir).glob("*.nc"))
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state = setup(files, work_dir)
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output_bytes = run(state)
+            times.append(time.perf_counter() - start)
+        peak = _peak_rss_bytes()
+        if "server" in state:
+            peak = _process_peak_rss_bytes(state["server"].pid) or peak
+    finally:
+        if "server" in state:
+            state["server"].terminate()
+            state["server"].wait()
+    return {
+        "seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "peak_rss_mb": peak / 1024 ** 2,
+        "output_bytes": output_bytes
+    }
+
+
+def scene(bench_dir, count, downtrack, crosstrack):
+    """Synthetic scene of count granules, generated once and reused while its shape is unchanged"""
+    scene_dir = Path(bench_dir) / "scenes" / f"{count}x{downtrack}x{crosstrack}"
+    if len(list(scene_dir.glob("*.nc"))) != count:
+        shutil.rmtree(scene_dir, ignore_errors=True)
+        print(f"Generating {count} synthetic granules in {scene_dir}...")
+        make_scene(scene_dir, count, downtrack, crosstrack)
+    return scene_dir
+
+
+def run_benchmarks(stages, sizes, repeat, bench_dir=BENCH_DIR, downtrack=DOWNTRACK, crosstrack=CROSSTRACK):
+    """
+    Run every stage against synthetic scenes of each size. Each stage runs in its own
+    subprocess, so peak RSS is the stage's own and no imports or caches leak between stages.
+    """
+    results = {}
+    for count in sizes:
+        scene_dir = scene(bench_dir, count, downtrack, crosstrack)
+        for name in stages:
+            work_dir = Path(bench_dir) / "work" / f"{name}_{count}"
+            proc = subprocess.run(
+                [sys.executable, __file__, "--run-stage", name, "--scene", str(scene_dir.resolve()),
+                 "--work", str(work_dir.resolve()), "--repeat", str(repeat)],
+                capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{name} ({count} granules) failed:\n{proc.stderr}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results[f"{name}@{count}"] = result
+            print(f"{name:18} {count:3} granules  {result['seconds']:8.3f}s  "
+                  f"{result['peak_rss_mb']:8.1f} MB RSS  {result['output_bytes'] / 1024 ** 2:9.2f} MB out")
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "shape": [downtrack, crosstrack],
+        "repeat": repeat,
+        "results": results
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print current results against a baseline and return the keys that regressed"""
+    regressions = []
+    if baseline.get("shape") != current["shape"]:
+        print(f"Warning: baseline granule shape {baseline.get('shape')} differs from {current['shape']}")
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:24} (no baseline)")
+            continue
+        time_ratio = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        rss_ratio = result["peak_rss_mb"] / base["peak_rss_mb"] if base["peak_rss_mb"] else 1.0
+        slow = time_ratio > 1 + threshold and result["seconds"] >= MIN_SECONDS
+        regressed = slow or rss_ratio > 1 + threshold
+        if regressed:
+            regressions.append(key)
+        print(f"{key:24} time x{time_ratio:5.2f}  rss x{rss_ratio:5.2f}  "
+              f"out {result['output_bytes'] - base['output_bytes']:+d} B{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the processing and serving hot paths on synthetic granules")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated stages ({', '.join(STAGES)})")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="scene sizes in granules")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per stage (median is reported)")
+    parser.add_argument("--downtrack", type=int, default=DOWNTRACK, help="synthetic granule rows")
+    parser.add_argument("--crosstrack", type=int, default=CROSSTRACK, help="synthetic granule columns")
+    parser.add_argument("--bench-dir", default=BENCH_DIR, help="where scenes and stage outputs are kept")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed fractional growth in time or peak RSS before a stage counts as regressed")
+    # internal: run one stage in this process and print its result as JSON
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--scene", help=argparse.SUPPRESS)
+    parser.add_argument("--work", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.run_stage:
+        # stage output goes to stderr so the last stdout line is the JSON result
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        result = run_stage(args.run_stage, args.scene, args.work, args.repeat)
+        sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(unknown)}")
+    sizes = [int(n) for n in args.sizes.split(",")]
+    current = run_benchmarks(stages, sizes, args.repeat, args.bench_dir, args.downtrack, args.crosstrack)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
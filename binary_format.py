@@ -0,0 +1,95 @@
+import numpy as np
+
+from downsample import clean_mineral_ids
+
+# EMIT band depth is quantized on a 1/510 grid between 0 and 0.5, so uint8 codes are lossless
+BAND_DEPTH_SCALE = 1 / 510
+BAND_DEPTH_ENCODINGS = ("uint8", "float16")
+ALIGNMENT = 8
+
+
+def encode_band_depth(bd, encoding="uint8"):
+    """
+    Encode band depth for the binary format. Returns (array, attrs).
+    uint8: code = round(band_depth / scale); NaN and 0 both map to code 0,
+    use the mineral ID (0 = no detection) to tell them apart.
+    float16: NaN is kept as NaN.
+    """
+    if encoding == "uint8":
+        codes = np.rint(np.where(np.isfinite(bd), bd, 0) / BAND_DEPTH_SCALE)
+        return np.clip(codes, 0, 255).astype(np.uint8), {"scale": BAND_DEPTH_SCALE}
+    if encoding == "float16":
+        return bd.astype(np.float16), {}
+    raise ValueError(f"Unknown band depth encoding: {encoding}")
+
+
+def encode_mineral_id(gid):
+    """Encode mineral IDs as uint8 when they fit, uint16 otherwise"""
+    ids = clean_mineral_ids(gid)
+    if ids.size == 0 or ids.max() <= np.iinfo(np.uint8).max:
+        return ids.astype(np.uint8), {}
+    return ids, {}
+
+
+def encode_visualization_arrays(groups, band_depth_encoding="uint8"):
+    """
+    Encode (band_depth, mineral_id) pairs keyed by group name ("group1", "group2")
+    into the named arrays used by visualization_data.
+    """
+    arrays = {}
+    for name, (bd, gid) in groups.items():
+        arrays[f"{name}_band_depth"] = encode_band_depth(bd, band_depth_encoding)
+        arrays[f"{name}_mineral_id"] = encode_mineral_id(gid)
+    return arrays
+
+
+def pack_arrays(arrays):
+    """
+    Concatenate encoded arrays into one little-endian buffer.
+    Each array starts on an 8-byte boundary so JavaScript can view it as a TypedArray in place.
+    Returns (buffer bytes, manifest dict of name -> dtype/shape/offset/length[/scale]).
+    """
+    chunks = []
+    manifest = {}
+    offset = 0
+    for name, (arr, attrs) in arrays.items():
+        data = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<')).tobytes()
+        padding = -offset % ALIGNMENT
+        if padding:
+            chunks.append(b"\0" * padding)
+            offset += padding
+        manifest[name] = dict({
+            "dtype": arr.dtype.name,
+            "shape": list(arr.shape),
+            "offset": offset,
+            "length": len(data)
+        }, **attrs)
+        chunks.append(data)
+        offset += len(data)
+    return b"".join(chunks), manifest
+
+
+def write_binary_arrays(path, arrays):
+    """Write encoded arrays to path and return the manifest describing them"""
+    buffer, manifest = pack_arrays(arrays)
+    with open(path, "wb") as f:
+        f.write(buffer)
+    return manifest
+
+
+def read_binary_arrays(path, manifest, decode=True):
+    """
+    Read arrays written by write_binary_arrays as read-only memory maps.
+    With decode=True band depth is returned as float32 (uint8 codes are rescaled).
+    """
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, info in manifest.items():
+        dtype = np.dtype(info["dtype"]).newbyteorder('<')
+        arr = raw[info["offset"]:info["offset"] + info["length"]].view(dtype).reshape(info["shape"])
+        if decode and "scale" in info:
+            arr = arr.astype(np.float32) * np.float32(info["scale"])
+        elif decode and dtype.kind == 'f':
+            arr = arr.astype(np.float32)
+        arrays[name] = arr
+    return arrays
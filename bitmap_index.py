@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import time
+import zlib
+import numpy as np
+from pathlib import Path
+from netCDF4 import Dataset
+
+from array_store import META_FILE, ArrayStore, source_attrs, write_meta
+from band_stats import GROUPS, HISTOGRAM_BINS, HISTOGRAM_RANGE, read_array
+from catalog import resolve_minerals
+from downsample import clean_mineral_ids
+from mineral_index import DEFAULT_INDEX_PATH
+
+BITMAP_DIR = "bitmaps"
+BITMAP_FILE = "bitmaps.bin"
+COMPRESS_LEVEL = 6
+# Lower edges of the band depth bins: HISTOGRAM_BINS equal bins over HISTOGRAM_RANGE, the last one open-ended.
+# Bins exclude their lower edge and include the upper one, (edge, next edge], so a threshold on an edge
+# selects exactly the pixels above it; EMIT's 1/510 steps land on edges (0.3 is 153/510).
+BAND_DEPTH_EDGES = np.round(np.linspace(*HISTOGRAM_RANGE, HISTOGRAM_BINS + 1)[:-1], 6)
+BAND_DEPTH_BINS = "upper"
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Bitmap:
+    """
+    One bit per pixel of a granule, row-major, packed 8 pixels to a byte. &, | and ~ work on the
+    packed bytes, so combining bitmaps touches 1/8 of the memory of boolean masks.
+    """
+
+    def __init__(self, bits, shape):
+        self.bits = bits
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_mask(cls, mask):
+        return cls(np.packbits(mask, axis=None), np.shape(mask))
+
+    @classmethod
+    def empty(cls, shape):
+        return cls(np.zeros((int(np.prod(shape)) + 7) // 8, dtype=np.uint8), shape)
+
+    @classmethod
+    def decode(cls, data, shape):
+        return cls(np.frombuffer(zlib.decompress(data), dtype=np.uint8), shape)
+
+    def encode(self):
+        return zlib.compress(self.bits.tobytes(), COMPRESS_LEVEL)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def _check(self, other):
+        if self.shape != other.shape:
+            raise ValueError(f"Bitmap shapes differ: {self.shape} vs {other.shape}")
+
+    def __and__(self, other):
+        self._check(other)
+        return Bitmap(self.bits & other.bits, self.shape)
+
+    def __or__(self, other):
+        self._check(other)
+        return Bitmap(self.bits | other.bits, self.shape)
+
+    def __invert__(self):
+        bits = ~self.bits
+        pad = len(bits) * 8 - self.size
+        if pad:
+            # keep the padding bits of the last byte clear, so count() stays exact
+            bits[-1] &= (0xFF << pad) & 0xFF
+        return Bitmap(bits, self.shape)
+
+    def count(self):
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def to_mask(self):
+        return np.unpackbits(self.bits, count=self.size).astype(bool).reshape(self.shape)
+
+
+def _bin_index(values, edges=BAND_DEPTH_EDGES):
+    # edges in the values' dtype, so a float32 0.3 counts as on the 0.3 edge, not just above it
+    return np.searchsorted(edges.astype(values.dtype), values, side="left") - 1
+
+
+def build_bitmaps(out_dir, groups, shape, attrs):
+    """
+    Write the bitmap index of one granule to out_dir: per group a bitmap of valid (non-fill)
+    pixels, one per mineral ID present and one per band depth bin (BAND_DEPTH_EDGES) holding
+    the detected pixels (band depth > 0) in it. groups maps group -> (band depth with NaN fill,
+    cleaned mineral IDs). Bitmaps are zlib-compressed one after another into BITMAP_FILE, and
+    meta.json records each one's offset and pixel count, so a query reads only what it uses.
+    Returns the metadata.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / META_FILE).unlink(missing_ok=True)
+    entries = {}
+    tmp_path = out_dir / f"{BITMAP_FILE}.tmp"
+    with open(tmp_path, "wb") as f:
+        def put(key, mask):
+            bitmap = Bitmap.from_mask(mask.reshape(shape))
+            data = bitmap.encode()
+            entries[key] = {"offset": f.tell(), "length": len(data), "count": bitmap.count()}
+            f.write(data)
+
+        def put_values(prefix, values, skip):
+            # one sort gives every value's pixels, instead of a full comparison pass per value
+            order = np.argsort(values, kind="stable")
+            present, starts = np.unique(values[order], return_index=True)
+            for value, start, stop in zip(present, starts, list(starts[1:]) + [len(order)]):
+                if value == skip:
+                    continue
+                mask = np.zeros(len(values), dtype=bool)
+                mask[order[start:stop]] = True
+                put(f"{prefix}/{value}", mask)
+
+        for group, (band_depth, mineral_id) in groups.items():
+            band_depth = np.asarray(band_depth).ravel()
+            put(f"{group}/valid", ~np.isnan(band_depth))
+            put_values(f"{group}/id", clean_mineral_ids(mineral_id).ravel(), skip=0)
+            bins = np.full(len(band_depth), -1, dtype=np.int16)
+            detected = band_depth > 0
+            bins[detected] = _bin_index(band_depth[detected])
+            put_values(f"{group}/bd", bins, skip=-1)
+    os.replace(tmp_path, out_dir / BITMAP_FILE)
+
+    meta = {"shape": list(shape), "attrs": attrs, "band_depth_edges": BAND_DEPTH_EDGES.tolist(),
+            "band_depth_bins": BAND_DEPTH_BINS, "bitmaps": entries}
+    write_meta(out_dir, meta)
+    return meta
+
+
+def bitmap_path(file_path, bitmap_dir=BITMAP_DIR):
+    return Path(bitmap_dir) / Path(file_path).stem
+
+
+def store_source_attrs(store):
+    """The source attrs of the granule an ArrayStore was ingested from, as source_attrs gives them for the file"""
+    return {key: store.attrs[key] for key in ("filename", "source_size", "source_mtime_ns")}
+
+
+def index_current(out_dir, attrs):
+    """
+    True if out_dir holds a complete index, with the current bin layout, of the granule version
+    described by attrs (source_attrs of the file or store_source_attrs of its store)
+    """
+    meta_path = Path(out_dir) / META_FILE
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return (meta.get("band_depth_bins") == BAND_DEPTH_BINS
+            and all(meta["attrs"].get(key) == value for key, value in attrs.items()))
+
+
+def build_granule_bitmaps(file_path, bitmap_dir=BITMAP_DIR):
+    """Build the bitmap index of a granule from its NetCDF file. Returns the index directory."""
+    nc = Dataset(file_path, 'r')
+    try:
+        shape = (nc.dimensions["downtrack"].size, nc.dimensions["crosstrack"].size)
+        groups = {group: (read_array(nc.variables[bd_var]), read_array(nc.variables[id_var]))
+                  for group, (bd_var, id_var) in GROUPS.items()}
+    finally:
+        nc.close()
+    out_dir = bitmap_path(file_path, bitmap_dir)
+    build_bitmaps(out_dir, groups, shape, source_attrs(file_path))
+    return out_dir
+
+
+def build_store_bitmaps(store, bitmap_dir=BITMAP_DIR):
+    """Build the bitmap index of an ingested granule from its ArrayStore, without touching the NetCDF"""
+    out_dir = Path(bitmap_dir) / store.path.name
+    groups = {group: (store[f"{group}_band_depth"], store[f"{group}_mineral_id"]) for group in GROUPS}
+    build_bitmaps(out_dir, groups, store.shape, store_source_attrs(store))
+    return out_dir
+
+
+class GranuleBitmaps:
+    """
+    Read side of one granule's bitmap index. Bitmaps are decompressed on first use and kept;
+    a bitmap that was never written (a mineral or bin absent from the granule) reads as empty.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        if self.meta.get("band_depth_bins") != BAND_DEPTH_BINS:
+            raise ValueError(f"{self.path} has an outdated band depth bin layout; rebuild it")
+        self.shape = tuple(self.meta["shape"])
+        self.attrs = self.meta["attrs"]
+        self.edges = np.array(self.meta["band_depth_edges"])
+        self.entries = self.meta["bitmaps"]
+        self._bitmaps = {}
+
+    def _get(self, key):
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            entry = self.entries.get(key)
+            if entry is None:
+                bitmap = Bitmap.empty(self.shape)
+            else:
+                with open(self.path / BITMAP_FILE, "rb") as f:
+                    f.seek(entry["offset"])
+                    bitmap = Bitmap.decode(f.read(entry["length"]), self.shape)
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def _union(self, keys):
+        result = Bitmap.empty(self.shape)
+        for key in keys:
+            if key in self.entries:
+                result = result | self._get(key)
+        return result
+
+    def valid(self, group):
+        return self._get(f"{group}/valid")
+
+    def mineral_ids(self, group):
+        prefix = f"{group}/id/"
+        return sorted(int(key[len(prefix):]) for key in self.entries if key.startswith(prefix))
+
+    def mineral(self, group, ids):
+        """Pixels whose mineral ID in group is any of ids"""
+        return self._union(f"{group}/id/{i}" for i in ids)
+
+    def mineral_count(self, group, ids):
+        """Pixel count of mineral(group, ids), from the metadata alone (IDs are disjoint)"""
+        return sum(self.entries.get(f"{group}/id/{i}", {}).get("count", 0) for i in ids)
+
+    def band_depth(self, group, minimum=None, maximum=None):
+        """
+        Detected pixels with minimum < band depth <= maximum. Bounds snap to the bin edges:
+        a bound that is not an edge is rounded up to the next one.
+        """
+        first = 0 if minimum is None else int(np.searchsorted(self.edges, minimum - 1e-9))
+        last = len(self.edges) if maximum is None else int(np.searchsorted(self.edges, maximum - 1e-9))
+        return self._union(f"{group}/bd/{k}" for k in range(first, last))
+
+
+def open_bitmaps(bitmap_dir=BITMAP_DIR):
+    """The bitmap indexes of every granule under bitmap_dir"""
+    root = Path(bitmap_dir)
+    if not root.is_dir():
+        return []
+    return [GranuleBitmaps(path) for path in sorted(root.iterdir()) if (path / META_FILE).exists()]
+
+
+def query(indexes, minerals=None, min_band_depth=None, combine="and"):
+    """
+    Evaluate a query on each granule's bitmaps. minerals maps group -> mineral IDs (pixel is
+    any of them) and min_band_depth maps group -> threshold the band depth must exceed
+    (strictly, see GranuleBitmaps.band_depth); the conditions are combined with
+    AND, or OR with combine="or". Returns [{filename, pixels, valid_pixels, bitmap}] for the
+    granules with at least one matching pixel; valid_pixels counts the pixels valid in the
+    queried groups, combined the same way.
+    """
+    groups = list(dict.fromkeys([*(minerals or {}), *(min_band_depth or {})]))
+    results = []
+    for index in indexes:
+        conditions = [index.mineral(group, ids) for group, ids in (minerals or {}).items()]
+        conditions += [index.band_depth(group, threshold) for group, threshold in (min_band_depth or {}).items()]
+        if not conditions:
+            continue
+        bitmap = conditions[0]
+        for condition in conditions[1:]:
+            bitmap = bitmap & condition if combine == "and" else bitmap | condition
+        pixels = bitmap.count()
+        if pixels:
+            valid = index.valid(groups[0])
+            for group in groups[1:]:
+                valid = valid & index.valid(group) if combine == "and" else valid | index.valid(group)
+            results.append({
+                "filename": index.attrs["filename"],
+                "pixels": pixels,
+                "valid_pixels": valid.count(),
+                "bitmap": bitmap
+            })
+    return results
+
+
+def _group_values(items, parse):
+    """Parse repeated group=value arguments into {group: parsed value}"""
+    values = {}
+    for item in items or []:
+        group, _, value = item.partition("=")
+        if group not in GROUPS:
+            raise ValueError(f"Unknown group {group}; expected one of {', '.join(GROUPS)}")
+        values[group] = parse(value)
+    return values
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-granule bitmap index for mineral ID and band depth queries")
+    parser.add_argument("--bitmap-dir", default=BITMAP_DIR, help="bitmap index root")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="index granules (NetCDF files or array store directories)")
+    build.add_argument("inputs", nargs="+")
+    build.add_argument("--force", action="store_true", help="rebuild indexes that are already current")
+
+    search = sub.add_parser("query", help="count matching pixels across the indexed granules")
+    search.add_argument("--mineral", action="append", metavar="GROUP=MINERALS",
+                        help="e.g. group1=Goethite,Hematite (IDs or names; repeatable)")
+    search.add_argument("--min-band-depth", action="append", metavar="GROUP=DEPTH",
+                        help=f"e.g. group2=0.3 for band depth > 0.3; thresholds snap up to multiples "
+                             f"of {BAND_DEPTH_EDGES[1]:g}")
+    search.add_argument("--any", action="store_true", help="match pixels meeting any condition instead of all")
+    search.add_argument("--mineral-index", default=DEFAULT_INDEX_PATH, help="mineral index for name lookups")
+    search.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "build":
+        for item in args.inputs:
+            start = time.perf_counter()
+            store = ArrayStore(item) if Path(item).is_dir() else None
+            if store is not None:
+                out_dir, attrs = Path(args.bitmap_dir) / store.path.name, store_source_attrs(store)
+            else:
+                out_dir, attrs = bitmap_path(item, args.bitmap_dir), source_attrs(item)
+            if not args.force and index_current(out_dir, attrs):
+                print(f"{item} is already indexed")
+                continue
+            if store is not None:
+                build_store_bitmaps(store, args.bitmap_dir)
+            else:
+                build_granule_bitmaps(item, args.bitmap_dir)
+            size = (out_dir / BITMAP_FILE).stat().st_size
+            print(f"Indexed {item} into {out_dir} ({size / 1024:.0f} KB) in {time.perf_counter() - start:.2f}s")
+        return
+
+    minerals = _group_values(args.mineral, lambda text: resolve_minerals(text, args.mineral_index))
+    thresholds = _group_values(args.min_band_depth, float)
+    start = time.perf_counter()
+    indexes = open_bitmaps(args.bitmap_dir)
+    results = query(indexes, minerals, thresholds, "or" if args.any else "and")
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps([{k: v for k, v in r.items() if k != "bitmap"} for r in results], indent=2))
+        return
+    for r in results:
+        print(f"{r['filename']}  {r['pixels']} pixels ({r['pixels'] / max(1, r['valid_pixels']):.2%} of valid)")
+    print(f"{sum(r['pixels'] for r in results)} pixels in {len(results)}/{len(indexes)} granules ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
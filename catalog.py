@@ -0,0 +1,299 @@
+import argparse
+import json
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from netCDF4 import Dataset
+
+from band_stats import compute_band_depth_stats
+from coverage_stats import CoverageAccumulator
+from mineral_index import DEFAULT_INDEX_PATH, load_index
+
+DEFAULT_CATALOG_PATH = "granule_catalog.sqlite"
+GROUP_NUMBERS = {"group1": 1, "group2": 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS granules (
+    id INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    time_start TEXT,
+    time_end TEXT,
+    t_start REAL,
+    t_end REAL,
+    north REAL, south REAL, east REAL, west REAL,
+    downtrack INTEGER,
+    crosstrack INTEGER,
+    valid_pixels INTEGER,
+    detected_pixels INTEGER,
+    band_depth_stats TEXT
+);
+CREATE INDEX IF NOT EXISTS granules_time ON granules (t_start, t_end);
+CREATE VIRTUAL TABLE IF NOT EXISTS granule_bbox USING rtree (id, west, east, south, north);
+CREATE TABLE IF NOT EXISTS granule_minerals (
+    granule_id INTEGER NOT NULL REFERENCES granules (id),
+    grp INTEGER NOT NULL,
+    mineral_id INTEGER NOT NULL,
+    pixels INTEGER,
+    fraction REAL,
+    mean_band_depth REAL,
+    max_band_depth REAL,
+    PRIMARY KEY (granule_id, grp, mineral_id)
+);
+CREATE INDEX IF NOT EXISTS granule_minerals_mineral ON granule_minerals (mineral_id, max_band_depth);
+"""
+
+
+def parse_time(text):
+    """Seconds since the epoch for an ISO 8601 time (EMIT writes e.g. 2025-10-02T06:48:04+0000)"""
+    if not text:
+        return None
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _is_date(text):
+    """True for a bare ISO 8601 date such as 2025-10-02, without a time of day"""
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        return False
+    return len(text) <= 10
+
+
+class GranuleCatalog:
+    """
+    Local catalog of processed granules: time range, footprint, detected minerals and per-group
+    statistics. Footprints are in an R-tree and times and mineral IDs are indexed, so searches
+    by area, time window and mineral are answered from the catalog without opening any granule.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM granules").fetchone()[0]
+
+    def add(self, summary, coverage):
+        """
+        Insert or replace one granule from its data_processor summary and coverage statistics
+        (CoverageAccumulator.result()).
+        """
+        extent = summary["spatial_extent"]
+        with self.con:
+            old = self.con.execute("SELECT id FROM granules WHERE filename = ?", (summary["filename"],)).fetchone()
+            if old:
+                self._delete(old[0])
+            cursor = self.con.execute(
+                "INSERT INTO granules (filename, time_start, time_end, t_start, t_end, north, south, east, west, "
+                "downtrack, crosstrack, valid_pixels, detected_pixels, band_depth_stats) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (summary["filename"], summary["time_start"], summary["time_end"],
+                 parse_time(summary["time_start"]), parse_time(summary["time_end"]),
+                 extent["north"], extent["south"], extent["east"], extent["west"],
+                 summary["dimensions"]["downtrack"], summary["dimensions"]["crosstrack"],
+                 coverage["valid_pixels"], coverage["detected_pixels"], json.dumps(summary["band_depth_stats"])))
+            granule_id = cursor.lastrowid
+            self.con.execute("INSERT INTO granule_bbox VALUES (?, ?, ?, ?, ?)",
+                             (granule_id, extent["west"], extent["east"], extent["south"], extent["north"]))
+            self.con.executemany(
+                "INSERT INTO granule_minerals VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(granule_id, GROUP_NUMBERS[group], m["id"], m["pixels"], m["fraction"], m["mean_band_depth"],
+                  m["max_band_depth"])
+                 for group, stats in coverage["groups"].items() for m in stats["minerals"]])
+        return granule_id
+
+    def add_processed(self, dataset_path, out_dir="."):
+        """Add a granule from data_processor output: its dataset JSON and the coverage sidecar it points to"""
+        with open(dataset_path) as f:
+            summary = json.load(f)["summary"]
+        with open(Path(out_dir) / summary["coverage"]) as f:
+            coverage = json.load(f)
+        return self.add(summary, coverage)
+
+    def remove(self, filename):
+        with self.con:
+            old = self.con.execute("SELECT id FROM granules WHERE filename = ?", (filename,)).fetchone()
+            if old:
+                self._delete(old[0])
+        return old is not None
+
+    def _delete(self, granule_id):
+        self.con.execute("DELETE FROM granule_minerals WHERE granule_id = ?", (granule_id,))
+        self.con.execute("DELETE FROM granule_bbox WHERE id = ?", (granule_id,))
+        self.con.execute("DELETE FROM granules WHERE id = ?", (granule_id,))
+
+    def search(self, bbox=None, start=None, end=None, mineral_ids=None, min_band_depth=None, group=None):
+        """
+        Granules whose footprint intersects bbox (west, south, east, north) and whose time range
+        overlaps [start, end] (ISO 8601 strings; an end given as a bare date includes that whole
+        day, i.e. it is exclusive at the next midnight UTC). With mineral_ids, only granules where one of
+        them was detected (in group, if given) with a maximum band depth above min_band_depth;
+        each result then lists the matching minerals. Results are sorted by start time.
+        """
+        joins, where, params = [], [], []
+        if bbox is not None:
+            west, south, east, north = bbox
+            joins.append("JOIN granule_bbox b ON b.id = g.id")
+            where.append("b.west <= ? AND b.east >= ? AND b.south <= ? AND b.north >= ?")
+            params += [east, west, north, south]
+        if start:
+            where.append("g.t_end >= ?")
+            params.append(parse_time(start))
+        if end and _is_date(end):
+            where.append("g.t_start < ?")
+            params.append(parse_time(end) + timedelta(days=1).total_seconds())
+        elif end:
+            where.append("g.t_start <= ?")
+            params.append(parse_time(end))
+
+        mineral_filter, mineral_params = "", []
+        if mineral_ids is not None:
+            mineral_filter = f"m.mineral_id IN ({','.join('?' * len(mineral_ids))})"
+            mineral_params = [int(i) for i in mineral_ids]
+            if min_band_depth is not None:
+                mineral_filter += " AND m.max_band_depth > ?"
+                mineral_params.append(min_band_depth)
+            if group is not None:
+                mineral_filter += " AND m.grp = ?"
+                mineral_params.append(GROUP_NUMBERS[group])
+            where.append(f"EXISTS (SELECT 1 FROM granule_minerals m WHERE m.granule_id = g.id AND {mineral_filter})")
+            params += mineral_params
+
+        query = ("SELECT g.id, g.filename, g.time_start, g.time_end, g.west, g.south, g.east, g.north, "
+                 "g.valid_pixels, g.detected_pixels FROM granules g "
+                 + " ".join(joins) + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY g.t_start, g.filename")
+        results = []
+        for row in self.con.execute(query, params):
+            granule_id, filename, time_start, time_end, west, south, east, north, valid, detected = row
+            result = {
+                "filename": filename,
+                "time_start": time_start,
+                "time_end": time_end,
+                "bbox": [west, south, east, north],
+                "valid_pixels": valid,
+                "detected_pixels": detected
+            }
+            if mineral_ids is not None:
+                result["minerals"] = [
+                    {"group": f"group{grp}", "id": mid, "pixels": pixels, "max_band_depth": max_bd}
+                    for grp, mid, pixels, max_bd in self.con.execute(
+                        "SELECT m.grp, m.mineral_id, m.pixels, m.max_band_depth FROM granule_minerals m "
+                        f"WHERE m.granule_id = ? AND {mineral_filter} ORDER BY m.max_band_depth DESC",
+                        [granule_id] + mineral_params)
+                ]
+            results.append(result)
+        return results
+
+
+def catalog_granule(file_path, catalog):
+    """Add a granule straight from its NetCDF file, computing its statistics in one chunked pass"""
+    nc = Dataset(file_path, 'r')
+    try:
+        coverage = CoverageAccumulator()
+        band_depth_stats, _ = compute_band_depth_stats(nc, coverage=coverage)
+        attrs = nc.ncattrs()
+        summary = {
+            "filename": Path(file_path).name,
+            "time_start": nc.getncattr("time_coverage_start") if "time_coverage_start" in attrs else "",
+            "time_end": nc.getncattr("time_coverage_end") if "time_coverage_end" in attrs else "",
+            "spatial_extent": {
+                side: float(nc.getncattr(attr)) if attr in attrs else 0.0
+                for side, attr in (("north", "northernmost_latitude"), ("south", "southernmost_latitude"),
+                                   ("east", "easternmost_longitude"), ("west", "westernmost_longitude"))
+            },
+            "dimensions": {
+                "downtrack": nc.dimensions["downtrack"].size,
+                "crosstrack": nc.dimensions["crosstrack"].size
+            },
+            "band_depth_stats": band_depth_stats
+        }
+    finally:
+        nc.close()
+    return catalog.add(summary, coverage.result())
+
+
+def resolve_minerals(text, index_path=DEFAULT_INDEX_PATH):
+    """Mineral IDs for a comma-separated list of IDs and/or (partial) names from the mineral index"""
+    ids, names = [], []
+    for item in (part.strip() for part in text.split(",")):
+        (ids if item.isdigit() else names).append(int(item) if item.isdigit() else item)
+    if names:
+        index = load_index(index_path)
+        if index is None:
+            raise FileNotFoundError(f"No mineral index at {index_path} to look up {', '.join(names)}; "
+                                    "run data_processor.py first or pass mineral IDs")
+        for name in names:
+            found = index.find(name)
+            if not found:
+                print(f"Warning: no mineral matches '{name}'")
+            ids.extend(found)
+    return sorted(set(ids))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Catalog processed EMIT granules and search them")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="catalog location")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="catalog granules (NetCDF files, or data_processor dataset JSON)")
+    add.add_argument("inputs", nargs="+")
+    add.add_argument("--out-dir", default=".", help="web root the dataset JSON coverage paths are relative to")
+
+    search = sub.add_parser("search", help="find granules by area, time and mineral")
+    search.add_argument("--bbox", help="west,south,east,north")
+    search.add_argument("--start", help="ISO 8601 start time, e.g. 2025-09-29")
+    search.add_argument("--end", help="ISO 8601 end time; a bare date such as 2025-10-02 includes that whole day (UTC)")
+    search.add_argument("--mineral", help="comma-separated mineral IDs or names (e.g. Hematite)")
+    search.add_argument("--min-band-depth", type=float, default=None, help="minimum of a mineral's max band depth")
+    search.add_argument("--group", choices=list(GROUP_NUMBERS), default=None, help="only match minerals in this group")
+    search.add_argument("--mineral-index", default=DEFAULT_INDEX_PATH, help="mineral index for name lookups")
+    search.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with GranuleCatalog(args.catalog) as catalog:
+        if args.command == "add":
+            for item in args.inputs:
+                if item.endswith(".json"):
+                    catalog.add_processed(item, args.out_dir)
+                else:
+                    catalog_granule(item, catalog)
+                print(f"Cataloged {Path(item).name}")
+            print(f"{len(catalog)} granules in {args.catalog}")
+            return
+
+        bbox = [float(v) for v in args.bbox.split(",")] if args.bbox else None
+        mineral_ids = resolve_minerals(args.mineral, args.mineral_index) if args.mineral else None
+        start = time.perf_counter()
+        results = catalog.search(bbox, args.start, args.end, mineral_ids, args.min_band_depth, args.group)
+        elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['filename']}  {result['time_start']}  bbox {result['bbox']}")
+        for m in result.get("minerals", []):
+            print(f"    {m['group']} mineral {m['id']}: {m['pixels']} pixels, max band depth {m['max_band_depth']:.3f}")
+    print(f"{len(results)} granules matched in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import time
+import numpy as np
+from pathlib import Path
+from netCDF4 import Dataset
+
+from array_store import ARRAY_DIR, source_attrs
+from catalog import parse_time
+from ingest import open_or_ingest
+from mineral_index import DEFAULT_INDEX_PATH, load_index
+from mosaic import GROUPS, TILE_SIZE, DEFAULT_RES, Mosaic, _granule_geometry
+
+CHANGE_DIR = "changes"
+CHANGE_FILE = "changes.json"
+# Neighbouring scenes of one orbit overlap and are seconds apart; a cell seen again within this gap
+# keeps its first observation instead of counting as a revisit
+MIN_REVISIT_SECONDS = 3600
+DAY_SECONDS = 86400.0
+DAYS_PER_YEAR = 365.25
+# Per-cell change at the latest revisit
+NO_CHANGE, NEW, LOST, REPLACED, PERSISTED = 0, 1, 2, 3, 4
+CHANGE_NAMES = {NO_CHANGE: "no change", NEW: "new", LOST: "lost", REPLACED: "replaced", PERSISTED: "persisted"}
+# Per-group state arrays of a tile: name -> (dtype, empty value)
+STATE = {
+    "last_band_depth": (np.float32, np.nan),
+    "last_mineral_id": (np.uint16, 0),
+    "last_time": (np.float64, np.nan),
+    "delta": (np.float32, np.nan),
+    "change": (np.uint8, NO_CHANGE),
+    "observations": (np.uint16, 0),
+    "detections": (np.uint16, 0),
+    # running least-squares sums of band depth (0 = no detection) against days since the epoch
+    "sum_t": (np.float64, 0),
+    "sum_y": (np.float64, 0),
+    "sum_tt": (np.float64, 0),
+    "sum_ty": (np.float64, 0)
+}
+COUNTS = ("new", "lost", "pixels", "band_depth_sum")
+
+
+def _add_counts(totals, key, ids, weights=None):
+    """Add a per-mineral bincount of ids into totals[key], growing it as needed"""
+    counts = np.bincount(ids, weights=weights)
+    current = totals[key]
+    if len(counts) > len(current):
+        current = totals[key] = np.pad(current, (0, len(counts) - len(current)))
+    current[:len(counts)] += counts
+
+
+def _mineral_counts(totals):
+    """mineral ID -> [detected pixels, band depth sum, new, lost] for the IDs with any nonzero count"""
+    size = max(len(totals[key]) for key in COUNTS)
+    counts = {key: np.pad(totals[key], (0, size - len(totals[key]))) for key in COUNTS}
+    return {str(i): [int(counts["pixels"][i]), float(counts["band_depth_sum"][i]),
+                     int(counts["new"][i]), int(counts["lost"][i])]
+            for i in range(1, size) if any(counts[key][i] for key in COUNTS)}
+
+
+class ChangeDetector(Mosaic):
+    """
+    Change between passes over the same ground, kept as per-cell state on the mosaic grid.
+
+    Every granule is resampled onto the grid exactly like Mosaic does, one tile at a time.
+    Per group, each cell keeps its last observation (band depth, mineral ID, time), what
+    happened at the latest revisit (band depth delta and a NEW/LOST/REPLACED/PERSISTED code),
+    observation and detection counts, and running sums for a least-squares band depth trend.
+    A new pass only updates the cells it covers, from that state, so history is never
+    recomputed. Passes must arrive in time order; each one also records per-mineral detected
+    pixels, mean band depth and new/lost counts, which trends() turns into a time series.
+    Updated tiles are staged and committed with the metadata as in Mosaic, so an interrupted
+    pass is either fully applied or not at all, never twice.
+    """
+    meta_file = CHANGE_FILE
+
+    def __init__(self, change_dir=CHANGE_DIR, res=None, tile_size=TILE_SIZE):
+        super().__init__(change_dir, res, tile_size)
+        self.meta.setdefault("epoch", None)
+        self.meta.setdefault("passes", [])
+
+    def empty_tile(self):
+        shape = (self.tile_size, self.tile_size)
+        return {f"{group}_{name}": np.full(shape, empty, dtype=dtype)
+                for group in GROUPS for name, (dtype, empty) in STATE.items()}
+
+    def add_granule(self, file_path, store_dir=ARRAY_DIR):
+        """Apply one pass to the change state. Returns the number of tiles touched (0 if skipped)."""
+        self.recover()
+        attrs = source_attrs(file_path)
+        granules = self.meta["granules"]
+        existing = [g for g in granules if g["filename"] == attrs["filename"]]
+        if existing and existing[0] == attrs:
+            return 0
+        if existing:
+            raise ValueError(f"{attrs['filename']} changed since it was added; rebuild the change state")
+
+        store = open_or_ingest(file_path, store_dir)
+        t = parse_time(store.attrs.get("time_coverage_start"))
+        if t is None:
+            raise ValueError(f"{attrs['filename']} has no time_coverage_start")
+        passes = self.meta["passes"]
+        if passes and t < passes[-1]["t"]:
+            raise ValueError(f"{attrs['filename']} is older than the latest pass ({passes[-1]['time']}); "
+                             "passes must be added in time order, rebuild the change state to insert it")
+        gt, glt_x, glt_y = _granule_geometry(file_path)
+        if self.res is None:
+            self.meta["res"] = abs(gt[1]) or DEFAULT_RES
+        if self.meta["epoch"] is None:
+            self.meta["epoch"] = t
+        days = (t - self.meta["epoch"]) / DAY_SECONDS
+
+        totals = {group: dict({key: np.zeros(0) for key in COUNTS}, cells=0, revisited=0) for group in GROUPS}
+        touched = 0
+        for ty, tx, window, valid, rows, cols in self.granule_windows(gt, glt_x, glt_y):
+            tile = self.read_tile(ty, tx)
+            for group in GROUPS:
+                self._update(tile, group, window, valid, store[f"{group}_band_depth"][rows, cols],
+                             store[f"{group}_mineral_id"][rows, cols], t, days, totals[group])
+            self.stage_tile(ty, tx, tile)
+            touched += 1
+
+        granules.append(attrs)
+        passes.append({
+            "filename": attrs["filename"],
+            "time": store.attrs["time_coverage_start"],
+            "t": t,
+            "groups": {group: {
+                "cells": total["cells"],
+                "revisited": total["revisited"],
+                "minerals": _mineral_counts(total)
+            } for group, total in totals.items()}
+        })
+        self.commit()
+        return touched
+
+    @staticmethod
+    def _update(tile, group, window, valid, band_depth, mineral_id, t, days, totals):
+        """Apply one pass's values to the valid cells of a tile window, vectorized over the cells"""
+        views = {name: tile[f"{group}_{name}"][window] for name in STATE}
+        cells = {name: view[valid] for name, view in views.items()}
+        last_time = cells["last_time"]
+        # NaN band depth is fill: the sensor saw nothing there
+        fresh = ~np.isnan(band_depth) & ~(t - last_time < MIN_REVISIT_SECONDS)
+        if not fresh.any():
+            return
+        bd, mid = band_depth[fresh], mineral_id[fresh]
+        seen = ~np.isnan(last_time[fresh])
+        detected = mid > 0
+        y = np.where(detected, bd, 0).astype(np.float64)
+        old_id = cells["last_mineral_id"][fresh]
+        old_detected = old_id > 0
+        change = np.select([~seen, detected & ~old_detected, old_detected & ~detected,
+                            detected & old_detected & (mid != old_id), detected & old_detected],
+                           [NO_CHANGE, NEW, LOST, REPLACED, PERSISTED], NO_CHANGE)
+
+        cells["delta"][fresh] = np.where(seen, y - np.nan_to_num(cells["last_band_depth"][fresh]), np.nan)
+        cells["change"][fresh] = change
+        cells["last_band_depth"][fresh] = np.where(detected, bd, np.nan)
+        cells["last_mineral_id"][fresh] = mid
+        cells["last_time"][fresh] = t
+        cells["observations"][fresh] += 1
+        cells["detections"][fresh] += detected
+        cells["sum_t"][fresh] += days
+        cells["sum_y"][fresh] += y
+        cells["sum_tt"][fresh] += days * days
+        cells["sum_ty"][fresh] += days * y
+        for name, view in views.items():
+            view[valid] = cells[name]
+
+        totals["cells"] += int(fresh.sum())
+        totals["revisited"] += int(seen.sum())
+        gained = (change == NEW) | (change == REPLACED)
+        lost = (change == LOST) | (change == REPLACED)
+        _add_counts(totals, "new", mid[gained])
+        _add_counts(totals, "lost", old_id[lost])
+        _add_counts(totals, "pixels", mid[detected])
+        _add_counts(totals, "band_depth_sum", mid[detected], bd[detected])
+
+    def read_changes(self, west, south, east, north, group="group1"):
+        """
+        Change arrays of one group for a lat/lon box: last band depth and mineral ID, delta and
+        change code at the latest revisit, observation count, and the band depth trend per year
+        (NaN where a cell has fewer than two observations).
+        """
+        names = [f"{group}_{name}" for name in STATE]
+        arrays = self.read_window(west, south, east, north, names)
+        window = {name: arrays[f"{group}_{name}"] for name in STATE}
+        n = window["observations"].astype(np.float64)
+        denominator = n * window["sum_tt"] - window["sum_t"] ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = (n * window["sum_ty"] - window["sum_t"] * window["sum_y"]) / denominator
+        result = {name: window[name] for name in
+                  ("last_band_depth", "last_mineral_id", "delta", "change", "observations", "detections")}
+        result["trend_per_year"] = np.where(denominator > 1e-12, slope * DAYS_PER_YEAR, np.nan).astype(np.float32)
+        result["geotransform"] = arrays["geotransform"]
+        return result
+
+    def trends(self, group="group1"):
+        """
+        Per-mineral time series over the passes (time, detected pixels, share of the pass's
+        observed cells, mean band depth, new and lost), with totals and the least-squares slope
+        of mean band depth per year over the passes that detected the mineral.
+        """
+        summary = {}
+        for p in self.meta["passes"]:
+            stats = p["groups"][group]
+            for mid, (pixels, bd_sum, new, lost) in stats["minerals"].items():
+                entry = summary.setdefault(int(mid), {"series": [], "new": 0, "lost": 0})
+                entry["series"].append({
+                    "time": p["time"],
+                    "pixels": pixels,
+                    "fraction": pixels / stats["cells"] if stats["cells"] else 0.0,
+                    "mean_band_depth": bd_sum / pixels if pixels else None,
+                    "new": new,
+                    "lost": lost
+                })
+                entry["new"] += new
+                entry["lost"] += lost
+        times = {p["time"]: (p["t"] - self.meta["epoch"]) / DAY_SECONDS for p in self.meta["passes"]}
+        for entry in summary.values():
+            points = [(times[s["time"]], s["mean_band_depth"]) for s in entry["series"] if s["mean_band_depth"] is not None]
+            t, y = np.array(points, dtype=np.float64).reshape(-1, 2).T
+            entry["band_depth_trend_per_year"] = (float(np.polyfit(t, y, 1)[0] * DAYS_PER_YEAR)
+                                                  if len(set(t)) > 1 else None)
+        return summary
+
+
+def _granule_time(file_path):
+    nc = Dataset(file_path, 'r')
+    try:
+        return parse_time(nc.getncattr("time_coverage_start")) if "time_coverage_start" in nc.ncattrs() else 0.0
+    finally:
+        nc.close()
+
+
+def update_changes(files, change_dir=CHANGE_DIR, res=None, tile_size=TILE_SIZE, store_dir=ARRAY_DIR):
+    """Add new passes to the change state, oldest first"""
+    detector = ChangeDetector(change_dir, res, tile_size)
+    for file_path in sorted(files, key=_granule_time):
+        start = time.perf_counter()
+        touched = detector.add_granule(file_path, store_dir)
+        if touched:
+            print(f"Applied {Path(file_path).name} to {touched} tiles in {time.perf_counter() - start:.2f}s")
+        else:
+            print(f"{Path(file_path).name} is already applied")
+    return detector
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Track mineral changes between EMIT passes over the same ground")
+    parser.add_argument("inputs", nargs="*", help="granule files of new passes")
+    parser.add_argument("--change-dir", default=CHANGE_DIR, help="change state location")
+    parser.add_argument("--store-dir", default=ARRAY_DIR, help="array store root used to read granules")
+    parser.add_argument("--res", type=float, default=None, help="cell size in degrees for a new change state")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="cells per tile side for a new change state")
+    parser.add_argument("--query", help="west,south,east,north box to summarize changes in")
+    parser.add_argument("--group", choices=GROUPS, default="group1")
+    parser.add_argument("--trends", type=int, default=10, help="show the N minerals with the largest net change")
+    parser.add_argument("--mineral-index", default=DEFAULT_INDEX_PATH, help="mineral index for names")
+    parser.add_argument("--json", help="write the per-mineral trend summary to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    detector = update_changes(args.inputs, args.change_dir, args.res, args.tile_size, args.store_dir)
+    if detector.res is None:
+        print(f"No passes in {args.change_dir}")
+        return
+
+    if args.query:
+        west, south, east, north = (float(v) for v in args.query.split(","))
+        window = detector.read_changes(west, south, east, north, args.group)
+        revisited = window["observations"] > 1
+        print(f"Window {window['change'].shape[0]}x{window['change'].shape[1]} cells, "
+              f"{int(np.count_nonzero(revisited))} revisited")
+        for code, name in CHANGE_NAMES.items():
+            if code != NO_CHANGE:
+                print(f"  {name}: {int(np.count_nonzero(revisited & (window['change'] == code)))} cells")
+        if revisited.any():
+            print(f"  mean band depth delta {np.nanmean(window['delta'][revisited]):+.4f}, "
+                  f"mean trend {np.nanmean(window['trend_per_year'][revisited]):+.4f}/year")
+
+    trends = detector.trends(args.group)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({str(k): v for k, v in trends.items()}, f, indent=2)
+    index = load_index(args.mineral_index)
+    names = index.mapping() if index is not None else {}
+    print(f"{len(detector.meta['passes'])} passes; minerals with the largest net change in {args.group}:")
+    ranked = sorted(trends.items(), key=lambda item: -abs(item[1]["new"] - item[1]["lost"]))[:args.trends]
+    for mid, entry in ranked:
+        slope = entry["band_depth_trend_per_year"]
+        print(f"  {names.get(mid, mid)}: +{entry['new']} -{entry['lost']} cells, "
+              f"band depth trend {'n/a' if slope is None else f'{slope:+.4f}/year'}")
+
+
+if __name__ == "__main__":
+    main()
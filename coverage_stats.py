@@ -0,0 +1,119 @@
+import numpy as np
+
+from band_stats import HISTOGRAM_BINS, HISTOGRAM_RANGE
+
+# Nominal EMIT ground sampling distance is 60 m
+PIXEL_AREA_KM2 = 0.06 * 0.06
+
+
+def _add(total, counts):
+    """Sum two 1D count arrays of possibly different lengths"""
+    if counts.size > total.size:
+        total = np.pad(total, (0, counts.size - total.size))
+    total[:counts.size] += counts
+    return total
+
+
+class CoverageAccumulator:
+    """
+    Full-resolution per-mineral coverage for both groups, fed chunk by chunk.
+    Per-mineral pixel counts, band depth sums and histograms are np.bincount reductions over
+    mineral IDs (histograms over id * bins + bin), band depth maxima a np.maximum.at scatter,
+    and group1 x group2 co-occurrence counts unique (id1, id2) pairs, so every chunk is a few
+    vectorized passes whatever the number of minerals.
+    As in band_stats, pixel counts cover every detection, while the band depth statistics only
+    use the detections with a finite band depth.
+    """
+
+    def __init__(self, groups=("group1", "group2"), bins=HISTOGRAM_BINS, value_range=HISTOGRAM_RANGE):
+        self.groups = groups
+        self.bins = bins
+        self.value_range = value_range
+        self.valid_pixels = 0
+        self.any_detected = 0
+        self.counts = {g: np.zeros(0, dtype=np.int64) for g in groups}
+        self.measured = {g: np.zeros(0, dtype=np.int64) for g in groups}
+        self.sums = {g: np.zeros(0, dtype=np.float64) for g in groups}
+        self.maxes = {g: np.zeros(0, dtype=np.float64) for g in groups}
+        self.histograms = {g: np.zeros(0, dtype=np.int64) for g in groups}
+        self.pairs = {}
+
+    def update(self, chunk):
+        """chunk maps group -> (band_depth, mineral_id) rows, with fill values as NaN"""
+        ids = {}
+        for group in self.groups:
+            bd, gid = chunk[group]
+            detected = gid > 0
+            gid = np.where(detected, gid, 0).astype(np.int64)
+            ids[group] = gid
+
+            self.counts[group] = _add(self.counts[group], np.bincount(gid[detected]))
+            # Detections without a finite band depth are left out of the band depth statistics, as in band_stats
+            measured = detected & np.isfinite(bd)
+            flat_ids, flat_values = gid[measured], bd[measured].astype(np.float64)
+            self.measured[group] = _add(self.measured[group], np.bincount(flat_ids))
+            self.sums[group] = _add(self.sums[group], np.bincount(flat_ids, weights=flat_values))
+
+            maxes = self.maxes[group]
+            if flat_ids.size and flat_ids.max() >= maxes.size:
+                maxes = self.maxes[group] = np.pad(maxes, (0, flat_ids.max() + 1 - maxes.size))
+            np.maximum.at(maxes, flat_ids, flat_values)
+
+            lo, hi = self.value_range
+            bins = np.clip(((flat_values - lo) * (self.bins / (hi - lo))).astype(np.int64), 0, self.bins - 1)
+            self.histograms[group] = _add(self.histograms[group], np.bincount(flat_ids * self.bins + bins))
+
+        # Pixels inside the swath have a mineral ID (0 = no match); outside it is the fill value
+        first = chunk[self.groups[0]][1]
+        self.valid_pixels += int(np.count_nonzero(np.isfinite(first) & (first >= 0)))
+        detected = [ids[g] > 0 for g in self.groups]
+        self.any_detected += int(np.count_nonzero(np.logical_or.reduce(detected)))
+
+        if len(self.groups) == 2:
+            both = detected[0] & detected[1]
+            pairs, counts = np.unique(np.stack([ids[self.groups[0]][both], ids[self.groups[1]][both]]),
+                                      axis=1, return_counts=True)
+            for (a, b), n in zip(pairs.T.tolist(), counts.tolist()):
+                self.pairs[(a, b)] = self.pairs.get((a, b), 0) + n
+
+    def result(self):
+        """Compact JSON-ready coverage summary; minerals are listed by pixel count, largest first"""
+        valid = max(self.valid_pixels, 1)
+        groups = {}
+        for group in self.groups:
+            counts = self.counts[group]
+            measured = np.pad(self.measured[group], (0, counts.size - self.measured[group].size))
+            sums = np.pad(self.sums[group], (0, counts.size - self.sums[group].size))
+            maxes = np.pad(self.maxes[group], (0, counts.size - self.maxes[group].size))
+            present = np.flatnonzero(counts)
+            present = present[np.argsort(-counts[present], kind="stable")]
+            histograms = self.histograms[group]
+            histograms = np.pad(histograms, (0, counts.size * self.bins - histograms.size)).reshape(-1, self.bins)
+            groups[group] = {
+                "detected_pixels": int(counts[1:].sum()),
+                "coverage_fraction": float(counts[1:].sum() / valid),
+                "minerals": [{
+                    "id": int(i),
+                    "pixels": int(counts[i]),
+                    "fraction": float(counts[i] / valid),
+                    "area_km2": round(float(counts[i] * PIXEL_AREA_KM2), 4),
+                    # 0 when none of the mineral's detections has a band depth, as in band_stats
+                    "mean_band_depth": float(sums[i] / measured[i]) if measured[i] else 0.0,
+                    "max_band_depth": float(maxes[i]),
+                    "histogram": histograms[i].tolist()
+                } for i in present]
+            }
+
+        pairs = sorted(self.pairs.items(), key=lambda item: (-item[1], item[0]))
+        return {
+            "valid_pixels": int(self.valid_pixels),
+            "detected_pixels": int(self.any_detected),
+            "pixel_area_km2": PIXEL_AREA_KM2,
+            "histogram_range": list(self.value_range),
+            "groups": groups,
+            "co_occurrence": {
+                "groups": list(self.groups),
+                "pixels": int(sum(self.pairs.values())),
+                "pairs": [[a, b, n] for (a, b), n in pairs]
+            }
+        }
@@ -1,178 +1,355 @@
-import xarray as xr
 import numpy as np
+import argparse
+import glob
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
 from pathlib import Path
 from netCDF4 import Dataset
 
-def decode_chararray(arr):
-    """
-    Decode netCDF char arrays or variable-length strings robustly to python strings.
-    arr may be: (N, M) array of bytes (S1), or (N,) array of variable-length bytes/strings.
-    """
-    if arr.dtype.kind in ('S','V','O'):
-        # char array -> join bytes in each row
-        names = []
-        for row in arr:
-            # row could be an array of bytes
-            try:
-                # try joining if row is sequence of bytes
-                joined = b''.join([(bytes([c]) if isinstance(c, int) else c) for c in row])
-                s = joined.decode('utf-8', errors='ignore').strip()
-            except Exception:
-                # fallback
-                try:
-                    s = ''.join([c.decode('utf-8', errors='ignore') if isinstance(c, (bytes, bytearray)) else str(c) for c in row]).strip()
-                except Exception:
-                    s = str(row).strip()
-            names.append(s)
-        return names
-    else:
-        # likely already string dtype or numpy unicode
-        return [str(x).strip() for x in arr[:]]
+from array_store import ARRAY_DIR, source_attrs, store_files, write_array_store
+from band_stats import compute_band_depth_stats, read_array
+from binary_format import BAND_DEPTH_ENCODINGS, encode_visualization_arrays, write_binary_arrays
+from catalog import GranuleCatalog
+from coverage_stats import CoverageAccumulator
+from downsample import (DOWNSAMPLE_MODES, SPARSE_ENCODINGS, clean_mineral_ids, downsample_group, read_downsampled,
+                        sparse_encode)
+from instrumentation import profiled, stage, write_profile
+from mineral_index import DEFAULT_INDEX_PATH, open_index
+from rasterize import mineral_colors, write_group_rasters
+from processing_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ProcessingCache
+from tiles import BAND_DEPTH_DECIMALS, _band_depth_list, write_tile_pyramid
+from web_writer import LAYOUTS, WebDataWriter
 
-def extract_mineral_names_from_netcdf(file_path):
-    """Extract actual mineral names from the NetCDF file's mineral_metadata group"""
-    try:
-        nc = Dataset(file_path, 'r')
-        
-        if 'mineral_metadata' not in nc.groups:
-            print(f"Warning: No 'mineral_metadata' group found in {file_path}")
-            return {}
-        
-        mm = nc.groups['mineral_metadata']
-        
-        # Get mineral names
-        if 'name' in mm.variables:
-            mnames_raw = mm.variables['name'][:]
-            mnames = decode_chararray(mnames_raw)
-        elif 'mineral_name' in mm.variables:
-            mnames_raw = mm.variables['mineral_name'][:]
-            mnames = decode_chararray(mnames_raw)
+DEFAULT_FILES = [
+    "emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc",
+    "emit_data/EMIT_L2B_MIN_001_20251002T064816_2527504_056.nc"
+]
+DOWNSAMPLE_FACTOR = 10
+TILE_DIR = "tiles"
+BINARY_DIR = "binary"
+GRANULE_DIR = "granules"
+RASTER_DIR = "rasters"
+STATS_DIR = "stats"
+OUTPUT_FORMATS = ("json", "binary")
+# Bump when process_granule output changes so cached results are not reused
+CACHE_VERSION = 6
+
+def find_granules(inputs):
+    """Expand directories, glob patterns and file paths into a sorted list of .nc granules"""
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.update(str(p) for p in path.glob("*.nc"))
+        elif glob.has_magic(item):
+            files.update(p for p in glob.glob(item, recursive=True) if p.endswith(".nc"))
+        elif path.exists():
+            files.add(str(path))
         else:
-            print(f"Warning: No 'name' or 'mineral_name' variable found in mineral_metadata")
-            return {}
-        
-        # Get indices (should be 1-based)
-        idx = mm.variables['index'][:] if 'index' in mm.variables else np.arange(1, len(mnames)+1)
-        
-        # Get groups
-        grp = mm.variables['group'][:] if 'group' in mm.variables else np.zeros_like(idx)
-        
-        # Create mapping
-        mineral_mapping = {}
-        for i, g, nm in zip(idx, grp, mnames):
-            # Clean up the mineral name - remove technical codes but keep main name
-            clean_name = nm.split(' ')[0]  # Take first word for cleaner display
-            if clean_name.endswith('_'):
-                clean_name = clean_name[:-1]
-            
-            # For better readability, replace underscores with spaces
-            clean_name = clean_name.replace('_', ' ')
-            
-            mineral_mapping[int(i)] = clean_name
-        
-        nc.close()
-        return mineral_mapping
-        
-    except Exception as e:
-        print(f"Error extracting mineral names from {file_path}: {e}")
-        return {}
+            print(f"Warning: {item} does not exist, skipping")
+    return sorted(files)
 
-def process_emit_data():
-    """Process EMIT data and convert to web-friendly formats"""
+def process_granule(file_path, file_index=0, out_dir=".", write_tiles=True, output_format="json",
+                    band_depth_encoding="uint8", downsample_factor=DOWNSAMPLE_FACTOR, array_store=False,
+                    write_rasters=True, downsample_mode="mean", sparse="none"):
+    """
+    Process one EMIT granule into its summary and visualization data.
+    Tiles (TILE_DIR), binary buffers (BINARY_DIR) and the memory-mappable array store used by
+    the region API (ARRAY_DIR) are written under out_dir, and the paths recorded in the result
+    are relative to out_dir (the web root).
+    write_rasters pre-renders the band depth and mineral maps as indexed PNGs (per tile, or
+    under RASTER_DIR for the downsampled grid when there are no tiles), so the viewer draws
+    images and keeps the arrays only for tooltips.
+    downsample_mode picks how the web grid is reduced (see downsample.DOWNSAMPLE_MODES), and
+    sparse ("coo" or "rle") writes JSON mineral maps and band depth as sparse objects instead
+    of dense lists.
+    """
+    out_dir = Path(out_dir)
+    stem = Path(file_path).stem
+    with stage("open"):
+        nc = Dataset(file_path, 'r')
+        attrs = nc.ncattrs()
+    
+    # Band depth statistics, detected minerals and per-mineral coverage in one chunked pass over the file
+    with stage("stats"):
+        coverage = CoverageAccumulator()
+        band_depth_stats, minerals = compute_band_depth_stats(nc, coverage=coverage)
     
+    # Create summary statistics
+    summary = {
+        "file_index": file_index,
+        "filename": Path(file_path).name,
+        "time_start": nc.getncattr("time_coverage_start") if "time_coverage_start" in attrs else "",
+        "time_end": nc.getncattr("time_coverage_end") if "time_coverage_end" in attrs else "",
+        "spatial_extent": {
+            "north": float(nc.getncattr("northernmost_latitude")) if "northernmost_latitude" in attrs else 0.0,
+            "south": float(nc.getncattr("southernmost_latitude")) if "southernmost_latitude" in attrs else 0.0,
+            "east": float(nc.getncattr("easternmost_longitude")) if "easternmost_longitude" in attrs else 0.0,
+            "west": float(nc.getncattr("westernmost_longitude")) if "westernmost_longitude" in attrs else 0.0
+        },
+        "dimensions": {
+            "downtrack": nc.dimensions["downtrack"].size,
+            "crosstrack": nc.dimensions["crosstrack"].size
+        },
+        "group1_minerals": minerals["group1"],
+        "group2_minerals": minerals["group2"],
+        "band_depth_stats": band_depth_stats
+    }
     
-    files = [
-        "emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc",
-        "emit_data/EMIT_L2B_MIN_001_20251002T064816_2527504_056.nc"
-    ]
+    # full-resolution coverage and co-occurrence go to a sidecar the dashboard loads on demand
+    coverage_path = Path(STATS_DIR) / f"{stem}.json"
+    (out_dir / coverage_path).parent.mkdir(parents=True, exist_ok=True)
+    with stage("write_coverage"), open(out_dir / coverage_path, "w") as f:
+        json.dump(coverage.result(), f, separators=(',', ':'))
+    summary["coverage"] = coverage_path.as_posix()
     
+    # downsample data for web proformance; full resolution is only loaded when tiles or the array store need it
+    names = ["group_1_band_depth", "group_2_band_depth", "group_1_mineral_id", "group_2_mineral_id"]
+    if write_tiles or array_store:
+        with stage("read"):
+            bd1, bd2, gid1, gid2 = (read_array(nc.variables[name]) for name in names)
+        with stage("downsample"):
+            bd1_ds, gid1_ds = downsample_group(bd1, gid1, downsample_factor, downsample_mode)
+            bd2_ds, gid2_ds = downsample_group(bd2, gid2, downsample_factor, downsample_mode)
+    else:
+        with stage("downsample"):
+            reduced = read_downsampled(nc, downsample_factor, downsample_mode)
+            (bd1_ds, gid1_ds), (bd2_ds, gid2_ds) = reduced["group1"], reduced["group2"]
+    
+    
+    if output_format == "binary":
+        buffer_path = Path(BINARY_DIR) / f"{stem}.bin"
+        (out_dir / buffer_path).parent.mkdir(parents=True, exist_ok=True)
+        with stage("serialize"):
+            arrays = encode_visualization_arrays({
+                "group1": (bd1_ds, gid1_ds),
+                "group2": (bd2_ds, gid2_ds)
+            }, band_depth_encoding)
+        with stage("write_buffer"):
+            viz_data = {
+                "downsampled_shape": [bd1_ds.shape[0], bd1_ds.shape[1]],
+                "format": "binary",
+                "buffer": buffer_path.as_posix(),
+                "arrays": write_binary_arrays(out_dir / buffer_path, arrays)
+            }
+    else:
+        with stage("serialize"):
+            viz_data = {"downsampled_shape": [bd1_ds.shape[0], bd1_ds.shape[1]]}
+            for name, bd_ds, gid_ds in (("group1", bd1_ds, gid1_ds), ("group2", bd2_ds, gid2_ds)):
+                if sparse != "none":
+                    viz_data[f"{name}_band_depth"], viz_data[f"{name}_mineral_id"] = sparse_encode(
+                        np.round(bd_ds.astype(np.float64), BAND_DEPTH_DECIMALS), gid_ds, sparse)
+                else:
+                    viz_data[f"{name}_band_depth"] = _band_depth_list(bd_ds)
+                    viz_data[f"{name}_mineral_id"] = gid_ds.astype(int).tolist()
+    
+    # tile pyramid so the viewer can zoom to native resolution
+    if write_tiles:
+        granule_tile_dir = Path(TILE_DIR) / stem
+        with stage("write_tiles"):
+            write_tile_pyramid(out_dir / granule_tile_dir, {
+                "group1": (bd1, clean_mineral_ids(gid1)),
+                "group2": (bd2, clean_mineral_ids(gid2))
+            }, tile_format=output_format, band_depth_encoding=band_depth_encoding, rasters=write_rasters)
+        summary["tiles"] = (granule_tile_dir / "pyramid.json").as_posix()
+    elif write_rasters:
+        granule_raster_dir = Path(RASTER_DIR) / stem
+        (out_dir / granule_raster_dir).mkdir(parents=True, exist_ok=True)
+        viz_data["rasters"] = {}
+        for name, bd_ds, gid_ds in (("group1", bd1_ds, gid1_ds), ("group2", bd2_ds, gid2_ds)):
+            with stage("write_rasters"):
+                files = write_group_rasters(out_dir / granule_raster_dir, name, bd_ds, gid_ds, minerals[name])
+            viz_data["rasters"][name] = dict(
+                {kind: (granule_raster_dir / file).as_posix() for kind, file in files.items()},
+                mineral_colors=mineral_colors(minerals[name]))
+    
+    # full-resolution arrays for on-demand region queries
+    if array_store:
+        granule_array_dir = Path(ARRAY_DIR) / stem
+        with stage("write_arrays"):
+            write_array_store(out_dir / granule_array_dir, {
+                "group1_band_depth": bd1,
+                "group1_mineral_id": clean_mineral_ids(gid1),
+                "group2_band_depth": bd2,
+                "group2_mineral_id": clean_mineral_ids(gid2)
+            }, source_attrs(file_path))
+        summary["arrays"] = granule_array_dir.as_posix()
+    
+    nc.close()
+    
+    return {
+        "summary": summary,
+        "visualization_data": viz_data
+    }
+
+def process_emit_data(files=None, **options):
+    """
+    Process EMIT data and convert to web-friendly formats, one granule after another.
+    options are passed to process_granule. Prefer process_granules for large batches:
+    this keeps every result in memory.
+    """
     processed_data = []
     
-    for i, file_path in enumerate(files):
+    for i, file_path in enumerate(files or DEFAULT_FILES):
         print(f"Processing {file_path}...")
-        ds = xr.open_dataset(file_path)
-        
-        # Get data arrays
-        bd1 = ds["group_1_band_depth"].values
-        bd2 = ds["group_2_band_depth"].values
-        gid1 = ds["group_1_mineral_id"].values
-        gid2 = ds["group_2_mineral_id"].values
-        
-        # Create summary statistics
-        summary = {
-            "file_index": i,
-            "filename": Path(file_path).name,
-            "time_start": ds.attrs.get("time_coverage_start", ""),
-            "time_end": ds.attrs.get("time_coverage_end", ""),
-            "spatial_extent": {
-                "north": float(ds.attrs.get("northernmost_latitude", 0)),
-                "south": float(ds.attrs.get("southernmost_latitude", 0)),
-                "east": float(ds.attrs.get("easternmost_longitude", 0)),
-                "west": float(ds.attrs.get("westernmost_longitude", 0))
-            },
-            "dimensions": {
-                "downtrack": int(ds.sizes["downtrack"]),
-                "crosstrack": int(ds.sizes["crosstrack"])
-            },
-            "group1_minerals": np.unique(gid1[gid1 != 0]).astype(int).tolist(),
-            "group2_minerals": np.unique(gid2[gid2 != 0]).astype(int).tolist(),
-            "band_depth_stats": {
-                "group1": {
-                    "min": float(bd1[gid1 != 0].min()) if np.any(gid1 != 0) else 0,
-                    "max": float(bd1[gid1 != 0].max()) if np.any(gid1 != 0) else 0,
-                    "mean": float(bd1[gid1 != 0].mean()) if np.any(gid1 != 0) else 0,
-                    "pixels_with_minerals": int(np.sum(gid1 != 0))
-                },
-                "group2": {
-                    "min": float(bd2[gid2 != 0].min()) if np.any(gid2 != 0) else 0,
-                    "max": float(bd2[gid2 != 0].max()) if np.any(gid2 != 0) else 0,
-                    "mean": float(bd2[gid2 != 0].mean()) if np.any(gid2 != 0) else 0,
-                    "pixels_with_minerals": int(np.sum(gid2 != 0))
-                }
-            }
-        }
-        
-        # downsample data for web proformance
-        downsample_factor = 10
-        bd1_ds = bd1[::downsample_factor, ::downsample_factor]
-        bd2_ds = bd2[::downsample_factor, ::downsample_factor]
-        gid1_ds = gid1[::downsample_factor, ::downsample_factor]
-        gid2_ds = gid2[::downsample_factor, ::downsample_factor]
-        
-        
-        viz_data = {
-            "downsampled_shape": [bd1_ds.shape[0], bd1_ds.shape[1]],
-            "group1_band_depth": bd1_ds.tolist(),
-            "group1_mineral_id": gid1_ds.astype(int).tolist(),
-            "group2_band_depth": bd2_ds.tolist(),
-            "group2_mineral_id": gid2_ds.astype(int).tolist()
-        }
-        
-        processed_data.append({
-            "summary": summary,
-            "visualization_data": viz_data
-        })
-        
-        ds.close()
+        processed_data.append(process_granule(file_path, i, **options))
     
     return processed_data
 
-def create_mineral_mapping():
-    """Create a mapping of mineral IDs to actual mineral names from the NetCDF files"""
+def _output_files(result, out_dir, dataset):
+    """All files written for one granule, relative to out_dir"""
+    files = [dataset, result["summary"]["coverage"]]
+    viz_data = result["visualization_data"]
+    if viz_data.get("format") == "binary":
+        files.append(viz_data["buffer"])
+    if "tiles" in result["summary"]:
+        tile_dir = Path(out_dir) / Path(result["summary"]["tiles"]).parent
+        files.extend(p.relative_to(out_dir).as_posix() for p in sorted(tile_dir.rglob("*")) if p.is_file())
+    for rasters in viz_data.get("rasters", {}).values():
+        files.extend([rasters["band_depth"], rasters["mineral_id"]])
+    if "arrays" in result["summary"]:
+        array_dir = Path(result["summary"]["arrays"])
+        files.extend((array_dir / name).as_posix() for name in store_files(Path(out_dir) / array_dir))
+    return files
+
+def _process_and_write(file_path, file_index, out_dir, options, profile=None):
+    """
+    Worker: process one granule and write its dataset JSON, returning only bookkeeping.
+    With profile options (see instrumentation.profiled) the record also carries the granule's
+    per-stage profile.
+    """
+    start = time.perf_counter()
+    with profiled(Path(file_path).stem, profile) as recorder:
+        result = process_granule(file_path, file_index, out_dir, **options)
+        
+        dataset = (Path(GRANULE_DIR) / f"{Path(file_path).stem}.json").as_posix()
+        dataset_path = Path(out_dir) / dataset
+        dataset_path.parent.mkdir(parents=True, exist_ok=True)
+        with stage("write_dataset"), open(dataset_path, "w") as f:
+            json.dump(result, f, indent=2)
     
-    # Try to extract mineral names from the first NetCDF file
-    files = [
-        "emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc",
-        "emit_data/EMIT_L2B_MIN_001_20251002T064816_2527504_056.nc"
-    ]
+    record = {
+        "file_index": file_index,
+        "dataset_path": str(dataset_path),
+        "input_bytes": Path(file_path).stat().st_size,
+        "seconds": time.perf_counter() - start,
+        "outputs": _output_files(result, out_dir, dataset)
+    }
+    if recorder is not None:
+        record["profile"] = recorder.result()
+    return record
+
+def _set_file_index(dataset_path, file_index):
+    """Cached datasets keep the index of the run that produced them; renumber if it moved"""
+    with open(dataset_path) as f:
+        result = json.load(f)
+    if result["summary"]["file_index"] != file_index:
+        result["summary"]["file_index"] = file_index
+        with open(dataset_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+def restore_cached(cache, key, out_dir, file_index):
+    """Restore a granule's outputs from the cache into out_dir, as a record with file_index, or None on a miss"""
+    cached = cache.restore(key, out_dir)
+    if cached is None:
+        return None
+    record = dict(cached, file_index=file_index, dataset_path=str(Path(out_dir) / cached["outputs"][0]))
+    _set_file_index(record["dataset_path"], file_index)
+    return record
+
+def store_cached(cache, key, out_dir, record):
+    """Copy a processed granule's outputs into the cache (its profile is not part of the entry)"""
+    cache.store(key, out_dir, record["outputs"], {k: v for k, v in record.items() if k != "profile"})
+
+def process_granules(files, out_dir=".", workers=None, cache=None, profile=None, on_record=None, **options):
+    """
+    Fan granules out over a process pool. Each worker writes its dataset JSON to
+    out_dir/GRANULE_DIR as soon as it finishes, so the parent never holds the arrays.
+    With a ProcessingCache, unchanged granules are restored from the cache instead.
+    profile turns on per-stage instrumentation of the processed granules (not part of the cache key).
+    on_record is called with each record as its granule finishes, in completion order.
+    Returns the per-granule records sorted by file index.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = len(files)
+    records = []
+    start = time.perf_counter()
+    params = dict(options, cache_version=CACHE_VERSION)
     
-    # Extract from the first file
-    mineral_mapping = extract_mineral_names_from_netcdf(files[0])
+    def report(record, cached=False):
+        records.append(record)
+        if on_record is not None:
+            on_record(record)
+        how = "from cache" if cached else f"in {record['seconds']:.2f}s"
+        print(f"[{len(records)}/{total}] {Path(record['dataset_path']).stem} "
+              f"({record['input_bytes'] / 1024 / 1024:.1f} MB) {how}")
     
-    # If that fails, try the second file
-    if not mineral_mapping:
-        mineral_mapping = extract_mineral_names_from_netcdf(files[1])
+    # Reuse cached outputs for granules that have not changed
+    pending = []
+    keys = {}
+    for i, file_path in enumerate(files):
+        if cache is not None:
+            keys[i] = cache.key(file_path, params)
+            record = restore_cached(cache, keys[i], out_dir, i)
+            if record is not None:
+                report(record, cached=True)
+                continue
+        pending.append((i, file_path))
+    reused = len(records)
+    
+    def finish(record):
+        if cache is not None:
+            store_cached(cache, keys[record["file_index"]], out_dir, record)
+        report(record)
+    
+    if workers == 1:
+        for i, file_path in pending:
+            try:
+                finish(_process_and_write(file_path, i, out_dir, options, profile))
+            except Exception as e:
+                print(f"Error processing {file_path}: {e}")
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_process_and_write, file_path, i, out_dir, options, profile): file_path
+                       for i, file_path in pending}
+            for future in as_completed(futures):
+                try:
+                    finish(future.result())
+                except Exception as e:
+                    print(f"Error processing {futures[future]}: {e}")
+    
+    if cache is not None:
+        cache.save()
+    
+    elapsed = time.perf_counter() - start
+    processed = records[reused:]
+    input_mb = sum(r["input_bytes"] for r in processed) / 1024 / 1024
+    print(f"Processed {len(processed)}/{total} granules ({input_mb:.1f} MB) in {elapsed:.2f}s "
+          f"with {workers} workers: {len(processed) / elapsed:.2f} granules/s, {input_mb / elapsed:.2f} MB/s")
+    if reused:
+        print(f"Reused {reused} unchanged granules from the processing cache")
+    
+    return sorted(records, key=lambda r: r["file_index"])
+
+def create_mineral_mapping(files=None, index_path=DEFAULT_INDEX_PATH):
+    """
+    Create a mapping of mineral IDs to actual mineral names.
+    Names come from the persistent mineral index, which is only rebuilt from the
+    granules' mineral_metadata when their library version changes.
+    """
+    
+    # Try the granules in order until one has usable mineral metadata
+    mineral_mapping = {}
+    for file_path in (files or DEFAULT_FILES)[:2]:
+        try:
+            mineral_mapping = open_index(file_path, index_path).mapping()
+        except Exception as e:
+            print(f"Error extracting mineral names from {file_path}: {e}")
+        if mineral_mapping:
+            break
     
     # If we still don't have mineral names, provide a fallback
     if not mineral_mapping:
@@ -185,46 +362,140 @@ def create_mineral_mapping():
     
     return mineral_mapping
 
+def add_processing_arguments(parser):
+    """Per-granule processing flags, shared with pipeline.py so both produce the same output"""
+    parser.add_argument("--downsample", type=int, default=DOWNSAMPLE_FACTOR, help="downsample factor for web_data.json")
+    parser.add_argument("--downsample-mode", choices=DOWNSAMPLE_MODES, default="mean",
+                        help="web grid reduction: block mean or max band depth with the block's majority mineral, "
+                             "or stride (every n-th pixel, aliases and drops isolated detections)")
+    parser.add_argument("--sparse", choices=SPARSE_ENCODINGS, default="none",
+                        help="JSON format only: write mineral maps as detected-pixel coordinates (coo) or "
+                             "run lengths (rle), with band depth kept only where a mineral was detected")
+    parser.add_argument("--no-tiles", action="store_true", help="skip the full-resolution tile pyramid")
+    parser.add_argument("--no-rasters", action="store_true",
+                        help="skip the pre-rendered PNG maps (the viewer then draws every pixel itself)")
+    parser.add_argument("--array-store", action="store_true",
+                        help="also write memory-mappable full-resolution arrays for the server's region API")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json",
+                        help="json: nested lists in web_data.json; binary: typed array buffers plus a JSON manifest")
+    parser.add_argument("--band-depth-encoding", choices=BAND_DEPTH_ENCODINGS, default="uint8",
+                        help="band depth encoding for binary output (uint8 is lossless for EMIT's 1/510 steps)")
+
+def check_processing_arguments(parser, args):
+    if args.sparse != "none" and args.format != "json":
+        parser.error("--sparse only applies to --format json")
+
+def processing_options(args):
+    """process_granule keyword arguments from the flags of add_processing_arguments"""
+    return dict(write_tiles=not args.no_tiles, output_format=args.format,
+                band_depth_encoding=args.band_depth_encoding, downsample_factor=args.downsample,
+                downsample_mode=args.downsample_mode, sparse=args.sparse,
+                array_store=args.array_store, write_rasters=not args.no_rasters)
+
+def add_cache_arguments(parser):
+    """Processing cache flags, shared with pipeline.py"""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="processing cache location")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="processing cache size limit in MB (least recently used entries are evicted)")
+    parser.add_argument("--no-cache", action="store_true", help="reprocess every granule")
+
+def processing_cache(args):
+    """The ProcessingCache of the add_cache_arguments flags, or None with --no-cache"""
+    return None if args.no_cache else ProcessingCache(args.cache_dir, int(args.cache_size * 1024 ** 2))
+
+def web_metadata(options):
+    """The metadata block of web_data.json for granules processed with options"""
+    return {
+        "generated": date.today().isoformat(),
+        "description": "EMIT L2B Mineral Data for Web Visualization",
+        "downsample_factor": options.get("downsample_factor", DOWNSAMPLE_FACTOR),
+        "downsample_mode": options.get("downsample_mode", "mean"),
+        "format": options.get("output_format", "json")
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert EMIT L2B MIN granules for web visualization")
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_FILES,
+                        help="granule files, directories or glob patterns (default: the two sample granules)")
+    parser.add_argument("--out-dir", default=".", help="web root to write web_data.json, tiles and buffers to")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    add_processing_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument("--mineral-index", default=DEFAULT_INDEX_PATH, help="persistent mineral index location")
+    parser.add_argument("--layout", choices=LAYOUTS, default="combined",
+                        help="combined: datasets inline in web_data.json; split: an index of summaries with "
+                             "data_url links to the per-granule files, which the viewer loads on demand")
+    parser.add_argument("--catalog", default=None,
+                        help="granule catalog to add the processed granules to, for catalog.py search")
+    parser.add_argument("--profile-out", default=None,
+                        help="write per-granule, per-stage timings, I/O and memory to this JSON file (Chrome trace format)")
+    parser.add_argument("--cprofile", default=None, metavar="DIR",
+                        help="also dump cProfile stats per granule to DIR (implies profiling)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also trace Python allocations per stage (slow; implies profiling)")
+    args = parser.parse_args()
+    check_processing_arguments(parser, args)
+    return args
+
 def main():
+    args = parse_args()
     print("Processing EMIT data for web visualization...")
     
-    # Process the data
-    processed_data = process_emit_data()
+    files = find_granules(args.inputs)
+    if not files:
+        print("No granules found")
+        return
     
-   
-    mineral_mapping = create_mineral_mapping()
-    
-   
-    output_data = {
-        "metadata": {
-            "generated": "2025-10-05",
-            "description": "EMIT L2B Mineral Data for Web Visualization",
-            "total_files": len(processed_data),
-            "downsample_factor": 10
-        },
-        "mineral_mapping": mineral_mapping,
-        "datasets": processed_data
-    }
-    
-    
-    with open("web_data.json", "w") as f:
-        json.dump(output_data, f, indent=2)
-    
-    print(f"Data processing complete!")
-    print(f"Generated web_data.json with {len(processed_data)} datasets")
-    print(f"File size: {Path('web_data.json').stat().st_size / 1024 / 1024:.2f} MB")
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
     
+    cache = processing_cache(args)
+    profile = None
+    if args.profile_out or args.cprofile or args.tracemalloc:
+        profile = {"cprofile_dir": args.cprofile, "tracemalloc": args.tracemalloc}
     
-    sample_data = {
-        "metadata": output_data["metadata"],
-        "mineral_mapping": mineral_mapping,
-        "datasets": [processed_data[0]] 
-    }
+    # Process the data, streaming each dataset into web_data.json and the sample as it finishes
+    options = processing_options(args)
+    start = time.perf_counter()
+    writer = WebDataWriter(out_dir, args.layout)
+    try:
+        records = process_granules(files, out_dir, args.workers, cache, profile,
+                                   lambda record: writer.add(record["file_index"], record["dataset_path"]),
+                                   **options)
+    except BaseException:
+        writer.abort()
+        raise
+    dataset_paths = [r["dataset_path"] for r in records]
     
-    with open("web_data_sample.json", "w") as f:
-        json.dump(sample_data, f, indent=2)
+    with profiled("batch", profile) as batch:
+        if args.catalog:
+            with stage("catalog"), GranuleCatalog(args.catalog) as catalog:
+                for dataset_path in dataset_paths:
+                    catalog.add_processed(dataset_path, out_dir)
+                print(f"Cataloged {len(dataset_paths)} granules in {args.catalog} ({len(catalog)} total)")
+        
+       
+        with stage("mineral_mapping"):
+            mineral_mapping = create_mineral_mapping(files, args.mineral_index)
+        
+       
+        with stage("write_web_data"):
+            writer.close(web_metadata(options), mineral_mapping)
+        
+        print(f"Data processing complete!")
+        print(f"Generated web_data.json with {writer.count} datasets ({args.layout} layout)")
+        print(f"File size: {(out_dir / 'web_data.json').stat().st_size / 1024 / 1024:.2f} MB")
+        print(f"Also created web_data_sample.json (smaller file for testing)")
     
-    print(f"Also created web_data_sample.json (smaller file for testing)")
+    if profile is not None:
+        profile_path = args.profile_out or out_dir / "profile.json"
+        units = [r["profile"] for r in records if "profile" in r] + [batch.result()]
+        totals = write_profile(profile_path, units, generated=date.today().isoformat(),
+                               workers=args.workers or os.cpu_count(), wall_seconds=time.perf_counter() - start)
+        print(f"Wrote profile of {len(units) - 1} granules to {profile_path}")
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall_seconds"]):
+            print(f"  {name:16} {total['wall_seconds']:8.2f}s wall {total['cpu_seconds']:8.2f}s cpu "
+                  f"{total['bytes_read'] / 1024 ** 2:9.1f} MB read {total['bytes_written'] / 1024 ** 2:9.1f} MB written")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
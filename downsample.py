@@ -0,0 +1,143 @@
+import numpy as np
+
+from band_stats import CHUNK_ROWS, GROUPS, iter_chunks
+
+
+def clean_mineral_ids(gid):
+    """
+    Return mineral IDs as uint16 with fill values (NaN, negatives) mapped to 0 (No_Match).
+    xarray decodes the mineral ID fill value to NaN, which would otherwise cast to garbage ints.
+    """
+    gid = np.asarray(gid)
+    if gid.dtype.kind == 'f':
+        gid = np.where(np.isfinite(gid), gid, 0)
+    return np.clip(gid, 0, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def _to_blocks(arr, factor, fill):
+    """Pad a 2D array to a multiple of factor and view it as (rows, cols, factor*factor) blocks"""
+    h, w = arr.shape
+    pad_h, pad_w = -h % factor, -w % factor
+    if pad_h or pad_w:
+        arr = np.pad(arr, ((0, pad_h), (0, pad_w)), constant_values=fill)
+    rows, cols = arr.shape[0] // factor, arr.shape[1] // factor
+    return arr.reshape(rows, factor, cols, factor).swapaxes(1, 2).reshape(rows, cols, factor * factor)
+
+
+def block_mean(band_depth, mineral_id, factor):
+    """
+    Mean band depth over the pixels with a mineral detection in each factor x factor block.
+    Blocks without any detection are NaN.
+    """
+    valid = (mineral_id > 0) & np.isfinite(band_depth)
+    if factor == 1:
+        return np.where(valid, band_depth, np.nan).astype(np.float32)
+
+    sums = _to_blocks(np.where(valid, band_depth, 0).astype(np.float64), factor, 0).sum(axis=2)
+    counts = _to_blocks(valid, factor, False).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).astype(np.float32)
+
+
+def block_mode(mineral_id, factor):
+    """
+    Majority (most frequent) non-zero mineral ID in each factor x factor block.
+    Ties go to the smallest ID; blocks without any detection are 0.
+    """
+    if factor == 1:
+        return mineral_id.copy()
+
+    blocks = _to_blocks(mineral_id, factor, 0)
+    rows, cols, k = blocks.shape
+    ordered = np.sort(blocks.reshape(-1, k), axis=1)
+
+    # Run-length encode every sorted block in one flat pass
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    starts = starts.ravel()
+    run_id = np.cumsum(starts) - 1
+    lengths = np.bincount(run_id)
+    values = ordered.ravel()[starts].astype(np.int64)
+    lengths[values == 0] = 0
+
+    # Score runs so that the longest run wins and ties prefer the smallest ID
+    top = int(values.max()) + 1
+    score = lengths * top + (top - 1 - values)
+    best = np.maximum.reduceat(score, run_id[::k])
+    counts, ids = best // top, top - 1 - best % top
+    return np.where(counts > 0, ids, 0).astype(mineral_id.dtype).reshape(rows, cols)
+
+
+def block_max(band_depth, mineral_id, factor):
+    """Maximum band depth over the pixels with a mineral detection in each factor x factor block (NaN if none)"""
+    valid = (mineral_id > 0) & np.isfinite(band_depth)
+    values = np.where(valid, band_depth, -np.inf).astype(np.float32)
+    if factor > 1:
+        values = _to_blocks(values, factor, -np.inf).max(axis=2)
+    return np.where(np.isfinite(values), values, np.nan).astype(np.float32)
+
+
+# stride keeps every factor-th pixel (cheap, but aliases and drops isolated detections);
+# mean and max aggregate band depth over each block, with the block's majority mineral ID
+DOWNSAMPLE_MODES = ("stride", "mean", "max")
+SPARSE_ENCODINGS = ("none", "coo", "rle")
+
+
+def downsample_group(band_depth, mineral_id, factor, mode="mean"):
+    """
+    Reduce one group's full-resolution (band_depth, mineral_id) to the factor-downsampled grid.
+    Returns float32 band depth (NaN where nothing was detected) and cleaned uint16 mineral IDs.
+    """
+    mineral_id = clean_mineral_ids(mineral_id)
+    if mode == "stride":
+        bd, gid = band_depth[::factor, ::factor], mineral_id[::factor, ::factor]
+        return np.where(gid > 0, bd, np.nan).astype(np.float32), gid
+    if mode == "mean":
+        return block_mean(band_depth, mineral_id, factor), block_mode(mineral_id, factor)
+    if mode == "max":
+        return block_max(band_depth, mineral_id, factor), block_mode(mineral_id, factor)
+    raise ValueError(f"Unknown downsample mode: {mode}")
+
+
+def sparse_encode(band_depth, mineral_id, encoding):
+    """
+    JSON-ready sparse form of a mostly-empty mineral map and its band depth.
+    coo lists the row-major flat index of every detected pixel with its ID; rle lists
+    (ID, run length) pairs over the row-major grid, zero runs included. Either way band depth
+    is only kept for the detected pixels, in row-major order.
+    Returns (band depth dict, mineral ID dict).
+    """
+    shape = list(mineral_id.shape)
+    flat = np.asarray(mineral_id).ravel()
+    detected = np.flatnonzero(flat)
+    if encoding == "coo":
+        ids = {"encoding": "coo", "shape": shape, "index": detected.tolist(), "values": flat[detected].tolist()}
+    elif encoding == "rle":
+        starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]]) if flat.size else np.zeros(0, dtype=np.int64)
+        lengths = np.diff(np.r_[starts, flat.size])
+        ids = {"encoding": "rle", "shape": shape, "runs": np.column_stack([flat[starts], lengths]).ravel().tolist()}
+    else:
+        raise ValueError(f"Unknown sparse encoding: {encoding}")
+    values = np.asarray(band_depth).ravel()[detected]
+    bd = {"encoding": "detected", "shape": shape, "values": np.where(np.isfinite(values), values, 0).tolist()}
+    return bd, ids
+
+
+def read_downsampled(nc, factor, mode="mean", chunk_rows=CHUNK_ROWS):
+    """
+    Downsampled {group: (band_depth, mineral_id)} straight from an open granule. Stride reads
+    only the kept rows and columns; block modes read whole blocks of rows chunk by chunk
+    (chunks are a multiple of factor rows), so peak memory stays at one chunk.
+    """
+    if mode == "stride":
+        strided = (slice(None, None, factor), slice(None, None, factor))
+        return {group: downsample_group(*(np.ma.filled(nc.variables[name][strided].astype(np.float32), np.nan)
+                                          for name in names), 1, mode)
+                for group, names in GROUPS.items()}
+
+    parts = {group: [] for group in GROUPS}
+    names = [name for pair in GROUPS.values() for name in pair]
+    for _, chunk in iter_chunks(nc, names, max(1, chunk_rows // factor) * factor):
+        for group, (bd_name, gid_name) in GROUPS.items():
+            parts[group].append(downsample_group(chunk[bd_name], chunk[gid_name], factor, mode))
+    return {group: tuple(np.concatenate(arrays) for arrays in zip(*chunks)) for group, chunks in parts.items()}
@@ -1,8 +1,14 @@
 import xarray as xr
 import numpy as np
 
-# Open the EMIT NetCDF dataset
-ds = xr.open_dataset("emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc")
+from array_store import unique_ids
+from ingest import open_or_ingest
+
+GRANULE = "emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc"
+
+# Open the EMIT NetCDF dataset (lazily, for its structure) and the memory-mapped arrays
+ds = xr.open_dataset(GRANULE)
+store = open_or_ingest(GRANULE)
 
 print("=== EMIT Data Structure Analysis ===")
 print(f"\nDataset dimensions: {dict(ds.dims)}")
@@ -16,13 +22,13 @@ for coord in ds.coords:
     print(f"  {coord}: {ds.coords[coord].shape} - {ds.coords[coord].dtype}")
 
 print(f"\nData value ranges:")
-print(f"  group_1_band_depth: {ds['group_1_band_depth'].min().values:.3f} to {ds['group_1_band_depth'].max().values:.3f}")
-print(f"  group_2_band_depth: {ds['group_2_band_depth'].min().values:.3f} to {ds['group_2_band_depth'].max().values:.3f}")
-print(f"  group_1_mineral_id: {ds['group_1_mineral_id'].min().values} to {ds['group_1_mineral_id'].max().values}")
-print(f"  group_2_mineral_id: {ds['group_2_mineral_id'].min().values} to {ds['group_2_mineral_id'].max().values}")
+print(f"  group_1_band_depth: {np.nanmin(store['group1_band_depth']):.3f} to {np.nanmax(store['group1_band_depth']):.3f}")
+print(f"  group_2_band_depth: {np.nanmin(store['group2_band_depth']):.3f} to {np.nanmax(store['group2_band_depth']):.3f}")
+print(f"  group_1_mineral_id: {store['group1_mineral_id'].min()} to {store['group1_mineral_id'].max()}")
+print(f"  group_2_mineral_id: {store['group2_mineral_id'].min()} to {store['group2_mineral_id'].max()}")
 
-print(f"\nUnique minerals in group 1: {np.unique(ds['group_1_mineral_id'].values)}")
-print(f"Unique minerals in group 2: {np.unique(ds['group_2_mineral_id'].values)}")
+print(f"\nUnique minerals in group 1: {unique_ids(store['group1_mineral_id'])}")
+print(f"Unique minerals in group 2: {unique_ids(store['group2_mineral_id'])}")
 
 # Check if there are geographic coordinates
 if 'latitude' in ds.coords and 'longitude' in ds.coords:
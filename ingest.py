@@ -0,0 +1,110 @@
+import argparse
+import os
+import time
+import numpy as np
+from pathlib import Path
+from netCDF4 import Dataset
+
+from array_store import ARRAY_DIR, META_FILE, ArrayStore, is_current, source_attrs, write_meta
+from band_stats import CHUNK_ROWS, iter_chunks
+from bitmap_index import bitmap_path, build_store_bitmaps, index_current
+from data_processor import DEFAULT_FILES
+from downsample import clean_mineral_ids
+
+# store array name -> (netCDF variable, dtype); mineral IDs are stored cleaned (fill -> 0)
+ARRAYS = {
+    "group1_band_depth": ("group_1_band_depth", np.float32),
+    "group1_mineral_id": ("group_1_mineral_id", np.uint16),
+    "group2_band_depth": ("group_2_band_depth", np.float32),
+    "group2_mineral_id": ("group_2_mineral_id", np.uint16)
+}
+ATTRS = ("time_coverage_start", "time_coverage_end", "northernmost_latitude", "southernmost_latitude",
+         "easternmost_longitude", "westernmost_longitude")
+
+
+def store_path(file_path, store_dir=ARRAY_DIR):
+    return Path(store_dir) / Path(file_path).stem
+
+
+def ingest_granule(file_path, store_dir=ARRAY_DIR, chunk_rows=CHUNK_ROWS, bitmap_dir=None):
+    """
+    Decompress one granule's band depth and mineral ID arrays into an array store, once.
+    Rows are copied chunk by chunk into .npy memory maps, so peak memory stays at one chunk.
+    With bitmap_dir, the granule's bitmap index is built from the new store as well.
+    Returns the store directory.
+    """
+    out_dir = store_path(file_path, store_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / META_FILE).unlink(missing_ok=True)
+
+    nc = Dataset(file_path, 'r')
+    try:
+        shape = (nc.dimensions["downtrack"].size, nc.dimensions["crosstrack"].size)
+        targets = {
+            name: np.lib.format.open_memmap(out_dir / f"{name}.npy.tmp", mode="w+", dtype=dtype, shape=shape)
+            for name, (_, dtype) in ARRAYS.items()
+        }
+        variables = {var: name for name, (var, _) in ARRAYS.items()}
+        for start, chunk in iter_chunks(nc, list(variables), chunk_rows):
+            for var, rows in chunk.items():
+                name = variables[var]
+                targets[name][start:start + len(rows)] = clean_mineral_ids(rows) if name.endswith("mineral_id") else rows
+        # numpy scalars -> plain python values for meta.json
+        attrs = dict(source_attrs(file_path), **{
+            key: np.asarray(nc.getncattr(key)).tolist() for key in ATTRS if key in nc.ncattrs()
+        })
+    finally:
+        nc.close()
+
+    meta = {"shape": list(shape), "arrays": {}, "attrs": attrs}
+    for name, target in targets.items():
+        target.flush()
+        meta["arrays"][name] = {"dtype": target.dtype.str, "shape": list(target.shape)}
+    targets.clear()
+    for name in meta["arrays"]:
+        os.replace(out_dir / f"{name}.npy.tmp", out_dir / f"{name}.npy")
+    write_meta(out_dir, meta)
+    if bitmap_dir:
+        build_store_bitmaps(ArrayStore(out_dir), bitmap_dir)
+    return out_dir
+
+
+def open_or_ingest(file_path, store_dir=ARRAY_DIR):
+    """
+    Open the array store for a granule, ingesting it first if it is missing or the granule
+    changed since. Arrays come back as read-only memory maps: slicing them is zero-copy and
+    every process reading the same store shares its pages through the OS cache.
+    """
+    path = store_path(file_path, store_dir)
+    if not is_current(path, file_path):
+        print(f"Ingesting {file_path} into {path}...")
+        ingest_granule(file_path, store_dir)
+    return ArrayStore(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest EMIT granules into the memory-mapped array store")
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_FILES, help="granule files")
+    parser.add_argument("--store-dir", default=ARRAY_DIR, help="array store root")
+    parser.add_argument("--force", action="store_true", help="re-ingest granules that are already current")
+    parser.add_argument("--bitmap-dir", default=None,
+                        help="also build each granule's bitmap index here, for bitmap_index.py query")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for file_path in args.inputs:
+        if not args.force and is_current(store_path(file_path, args.store_dir), file_path):
+            print(f"{file_path} is already ingested")
+            if args.bitmap_dir and not index_current(bitmap_path(file_path, args.bitmap_dir), source_attrs(file_path)):
+                build_store_bitmaps(ArrayStore(store_path(file_path, args.store_dir)), args.bitmap_dir)
+                print(f"Indexed {file_path} into {bitmap_path(file_path, args.bitmap_dir)}")
+            continue
+        start = time.perf_counter()
+        out_dir = ingest_granule(file_path, args.store_dir, bitmap_dir=args.bitmap_dir)
+        print(f"Ingested {file_path} into {out_dir} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
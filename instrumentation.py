@@ -0,0 +1,173 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+TOP_ALLOCATIONS = 10
+
+
+def _proc_io():
+    """(bytes read, bytes written) by this process so far, from /proc (Linux), or (None, None)"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _status_bytes(field):
+    """A memory field of /proc/self/status (e.g. VmHWM, VmRSS) in bytes (Linux), or None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reset this process's VmHWM to its current RSS (Linux 4.0+); False where that is not possible"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class StageRecorder:
+    """
+    Records named stages of one unit of work (a granule, or the batch itself): wall and CPU
+    time, bytes read and written by the process (including netCDF/HDF5 reads and every output
+    file) and the peak RSS since the unit started. Pool workers are reused, so active() resets
+    the process's RSS high-water mark first; where the kernel does not allow that, the peak is
+    None rather than an earlier unit's. With trace_memory, tracemalloc also gives the peak
+    Python allocation inside each stage and the top allocation sites of the whole unit.
+    Stages should not be nested, so per-stage totals add up.
+    """
+
+    def __init__(self, name, trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.allocations = None
+        self.peak_reset = False
+        self.start_rss = None
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        read0, written0 = _proc_io()
+        timestamp = time.time()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            read1, written1 = _proc_io()
+            entry = {
+                "stage": name,
+                "timestamp": timestamp,
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "bytes_read": None if read0 is None else read1 - read0,
+                "bytes_written": None if written0 is None else written1 - written0,
+                "unit_peak_rss_bytes": _status_bytes("VmHWM") if self.peak_reset else None
+            }
+            if self.trace_memory:
+                entry["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(entry)
+
+    @contextmanager
+    def active(self):
+        """Make this the recorder the module-level stage() reports to, for the duration"""
+        global _current
+        previous, _current = _current, self
+        self.peak_reset = _reset_peak_rss()
+        self.start_rss = _status_bytes("VmRSS")
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            _current = previous
+            if self.trace_memory:
+                top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+                self.allocations = [{"site": str(s.traceback), "bytes": s.size, "count": s.count} for s in top]
+            if started:
+                tracemalloc.stop()
+
+    def result(self):
+        totals = {key: sum(s[key] or 0 for s in self.stages)
+                  for key in ("wall_seconds", "cpu_seconds", "bytes_read", "bytes_written")}
+        result = {"name": self.name, "pid": os.getpid(), "start_rss_bytes": self.start_rss,
+                  "stages": self.stages, "totals": totals}
+        if self.allocations is not None:
+            result["top_allocations"] = self.allocations
+        return result
+
+
+_current = None
+
+
+def stage(name):
+    """Time a stage against the active recorder; does nothing when profiling is off"""
+    return _current.stage(name) if _current is not None else nullcontext()
+
+
+@contextmanager
+def profiled(name, options):
+    """
+    Run a unit of work under the profiling options ({"tracemalloc": bool, "cprofile_dir": path or None};
+    None disables profiling). Yields the StageRecorder, or None when profiling is off.
+    With cprofile_dir, the unit's cProfile stats are dumped to <cprofile_dir>/<name>.prof.
+    """
+    if not options:
+        yield None
+        return
+    recorder = StageRecorder(name, options.get("tracemalloc", False))
+    profiler = cProfile.Profile() if options.get("cprofile_dir") else None
+    with recorder.active():
+        if profiler:
+            profiler.enable()
+        try:
+            yield recorder
+        finally:
+            if profiler:
+                profiler.disable()
+                Path(options["cprofile_dir"]).mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(Path(options["cprofile_dir"]) / f"{name}.prof")
+
+
+def write_profile(path, units, **metadata):
+    """
+    Write the profile of a run: per-unit stage records, per-stage totals across units (to see
+    whether reading, reductions or serialization dominate) and a Chrome trace (traceEvents,
+    viewable in chrome://tracing or Perfetto) with one row per worker process.
+    """
+    totals = {}
+    events = []
+    for unit in units:
+        for s in unit["stages"]:
+            total = totals.setdefault(s["stage"], {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                                   "bytes_read": 0, "bytes_written": 0})
+            total["count"] += 1
+            for key in ("wall_seconds", "cpu_seconds", "bytes_read", "bytes_written"):
+                total[key] += s[key] or 0
+            events.append({
+                "name": s["stage"], "cat": unit["name"], "ph": "X", "pid": unit["pid"], "tid": 0,
+                "ts": s["timestamp"] * 1e6, "dur": s["wall_seconds"] * 1e6,
+                "args": {key: s[key] for key in ("cpu_seconds", "bytes_read", "bytes_written", "unit_peak_rss_bytes")}
+            })
+    profile = dict(metadata, units=units, stage_totals=totals, traceEvents=events)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return totals
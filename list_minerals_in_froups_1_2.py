@@ -1,9 +1,9 @@
-import xarray as xr
-import numpy as np
+from array_store import unique_ids
+from ingest import open_or_ingest
 
-ds = xr.open_dataset("emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc")
-gid1 = ds["group_1_mineral_id"].values
-gid2 = ds["group_2_mineral_id"].values
+store = open_or_ingest("emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc")
+gid1 = store["group1_mineral_id"]
+gid2 = store["group2_mineral_id"]
 
-print("Unique minerals in group 1:", np.unique(gid1))
-print("Unique minerals in group 2:", np.unique(gid2))
+print("Unique minerals in group 1:", unique_ids(gid1))
+print("Unique minerals in group 2:", unique_ids(gid2))
@@ -1,30 +1,45 @@
-import earthaccess
+import argparse
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 
-# Login (interactive or using .netrc)
-auth = earthaccess.login(strategy="interactive")
+DEST_DIR = "./emit_data/"
+MANIFEST_FILE = "manifest.json"
+DOWNLOAD_WORKERS = 4
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 60
+# UMM checksum algorithm names -> hashlib names
+HASH_ALGORITHMS = {"MD5": "md5", "SHA-1": "sha1", "SHA-256": "sha256", "SHA-384": "sha384", "SHA-512": "sha512"}
 
-# Search for EMIT L2B mineral data (global, all time)
-granules = earthaccess.search_data(
-    short_name="EMITL2BMIN",
-    version="001",
-    temporal=("2025-09-25", "2025-10-04")
-)
 
-print(f"Total granules found: {len(granules)}")
+def search_granules(start="2025-09-25", end="2025-10-04", short_name="EMITL2BMIN", version="001"):
+    """Search CMR through earthaccess and return the UMM records, latest first"""
+    import earthaccess
 
-# Sort by temporal metadata (latest first)
-granules_sorted = sorted(
-    granules,
-    key=lambda g: g["umm"]["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"],
-    reverse=True
-)
+    granules = earthaccess.search_data(short_name=short_name, version=version, temporal=(start, end))
+    print(f"Total granules found: {len(granules)}")
+    umms = [g["umm"] for g in granules]
+    return sorted(umms, key=lambda umm: umm["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"], reverse=True)
 
-# Take the two latest granules
-latest_two = granules_sorted[:2]
 
-# Print metadata for each
-for i, g in enumerate(latest_two, 1):
-    umm = g["umm"]
+def earthdata_token():
+    """Bearer token from EARTHDATA_TOKEN, or from an earthaccess login (interactive or .netrc)"""
+    token = os.environ.get("EARTHDATA_TOKEN")
+    if token:
+        return token
+    import earthaccess
+
+    auth = earthaccess.login(strategy="interactive")
+    return auth.token["access_token"] if auth.token else None
+
+
+def print_granule(i, umm):
     print(f"\n=== Granule {i} ===")
     print(f"Title: {umm.get('GranuleUR')}")
     print(f"Start Time: {umm['TemporalExtent']['RangeDateTime']['BeginningDateTime']}")
@@ -35,5 +50,218 @@ for i, g in enumerate(latest_two, 1):
         if "URL" in url_info:
             print(f"  - {url_info['URL']}")
 
-# Download both to local folder
-earthaccess.download(latest_two, "./emit_data/")
+
+def granule_files(umm):
+    """
+    Downloadable files of a UMM granule record with their expected size and checksum.
+    Sizes are only used when given exactly (SizeInBytes); checksums when the algorithm is known.
+    """
+    archive = {
+        info.get("Name"): info
+        for info in umm.get("DataGranule", {}).get("ArchiveAndDistributionInformation", [])
+    }
+    files = []
+    for url_info in umm.get("RelatedUrls", []):
+        url = url_info.get("URL", "")
+        if url_info.get("Type") != "GET DATA" or not url.startswith(("http://", "https://")):
+            continue
+        name = url.rsplit("/", 1)[-1]
+        info = archive.get(name, {})
+        checksum = info.get("Checksum", {})
+        files.append({
+            "granule": umm.get("GranuleUR"),
+            "name": name,
+            "url": url,
+            "size": info.get("SizeInBytes"),
+            "checksum": checksum.get("Value"),
+            "algorithm": checksum.get("Algorithm")
+        })
+    return files
+
+
+def load_manifest(dest_dir):
+    path = Path(dest_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(dest_dir, manifest):
+    path = Path(dest_dir) / MANIFEST_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_current(entry, dest_dir, manifest):
+    """A file is current if the manifest recorded it as verified and it is still the same size"""
+    recorded = manifest.get(entry["name"])
+    path = Path(dest_dir) / entry["name"]
+    if not recorded or not path.exists() or path.stat().st_size != recorded["size"]:
+        return False
+    return entry["checksum"] is None or entry["checksum"] == recorded.get("checksum")
+
+
+def checksum_matches(path, entry):
+    """True/False if the file matches the UMM checksum, None if there is no usable checksum"""
+    name = HASH_ALGORITHMS.get(entry["algorithm"] or "")
+    if not name or not entry["checksum"]:
+        return None
+    hasher = hashlib.new(name)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest().lower() == entry["checksum"].lower()
+
+
+def _record(entry, size, verified):
+    return {
+        "granule": entry["granule"],
+        "url": entry["url"],
+        "size": size,
+        "checksum": entry["checksum"],
+        "algorithm": entry["algorithm"],
+        "verified": verified,
+        "downloaded": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+
+class StripAuthRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Drop the Authorization header when a redirect leaves the original host. DAAC data URLs
+    redirect to presigned S3 URLs, which reject a second auth mechanism, and the Earthdata
+    token must not be sent to other hosts anyway.
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        new = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if new is not None and urllib.parse.urlsplit(newurl).netloc != urllib.parse.urlsplit(req.full_url).netloc:
+            new.remove_header("Authorization")
+        return new
+
+
+_opener = urllib.request.build_opener(StripAuthRedirectHandler)
+
+
+def download_file(entry, dest_dir, token=None):
+    """
+    Download one file to dest_dir, resuming a previous .part file with a Range request.
+    A file already present (e.g. from an earlier earthaccess download) is kept if it verifies.
+    The result is checked against the expected size and checksum before it is renamed into place;
+    a file that fails the checksum is deleted and an error raised.
+    Returns the manifest record for the file.
+    """
+    path = Path(dest_dir) / entry["name"]
+    part_path = path.with_name(path.name + ".part")
+
+    if path.exists() and entry["size"] == path.stat().st_size:
+        verified = checksum_matches(path, entry)
+        if verified is not False:
+            return _record(entry, entry["size"], bool(verified))
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    if entry["size"] is not None and offset > entry["size"]:
+        offset = 0
+
+    request = urllib.request.Request(entry["url"])
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = _opener.open(request, timeout=TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or entry["size"] != offset:
+            raise
+        # the .part file is already complete
+        response = None
+
+    if response is not None:
+        with response:
+            if offset and response.status != 206:
+                # server ignored the range: start over
+                offset = 0
+            with open(part_path, "ab" if offset else "wb") as f:
+                for block in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    f.write(block)
+
+    size = part_path.stat().st_size
+    if entry["size"] is not None and size != entry["size"]:
+        raise IOError(f"{entry['name']}: expected {entry['size']} bytes, got {size}")
+    verified = checksum_matches(part_path, entry)
+    if verified is False:
+        part_path.unlink()
+        raise IOError(f"{entry['name']}: {entry['algorithm']} checksum mismatch")
+
+    os.replace(part_path, path)
+    return _record(entry, size, bool(verified))
+
+
+def download_granules(umms, dest_dir=DEST_DIR, workers=DOWNLOAD_WORKERS, token=None):
+    """
+    Download every file of the given UMM records with a bounded thread pool.
+    Files the manifest already lists as verified are skipped, interrupted downloads resume,
+    and the manifest is updated as each file completes so an interrupted batch loses nothing.
+    Returns the paths of all files now present.
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(dest_dir)
+    entries = [entry for umm in umms for entry in granule_files(umm)]
+    pending = [entry for entry in entries if not is_current(entry, dest_dir, manifest)]
+    print(f"{len(entries) - len(pending)} files already downloaded, fetching {len(pending)}")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download_file, entry, dest_dir, token): entry for entry in pending}
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Error downloading {entry['name']}: {e}")
+                failed.append(entry["name"])
+                continue
+            manifest[entry["name"]] = record
+            save_manifest(dest_dir, manifest)
+            print(f"Downloaded {entry['name']} ({record['size'] / 1024 / 1024:.1f} MB)")
+
+    if failed:
+        print(f"{len(failed)} downloads failed; run again to resume them")
+    return [str(dest_dir / entry["name"]) for entry in entries if entry["name"] not in failed]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download EMIT L2B mineral granules")
+    parser.add_argument("--start", default="2025-09-25", help="temporal search start date")
+    parser.add_argument("--end", default="2025-10-04", help="temporal search end date")
+    parser.add_argument("--latest", type=int, default=2, help="number of latest granules to download (0 for all)")
+    parser.add_argument("--dest", default=DEST_DIR, help="download directory")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="concurrent downloads")
+    parser.add_argument("--umm", help="JSON file with a list of UMM granule records to use instead of a CMR search")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.umm:
+        with open(args.umm) as f:
+            umms = json.load(f)
+        token = os.environ.get("EARTHDATA_TOKEN")
+    else:
+        token = earthdata_token()
+        umms = search_granules(args.start, args.end)
+
+    selected = umms[:args.latest] if args.latest else umms
+    for i, umm in enumerate(selected, 1):
+        print_granule(i, umm)
+
+    download_granules(selected, args.dest, args.workers, token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from netCDF4 import Dataset
+
+from mineral_names import library_version, mineral_table
+
+DEFAULT_INDEX_PATH = "mineral_index.sqlite"
+UNKNOWN_VERSION = "unknown"
+
+
+class MineralIndex:
+    """
+    Mineral lookup loaded from the persistent index.
+    All rows are held in a dict keyed by mineral ID, so every lookup is O(1).
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.rows = {row["index"]: row for row in rows}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, mineral_id):
+        return int(mineral_id) in self.rows
+
+    def get(self, mineral_id):
+        return self.rows.get(int(mineral_id))
+
+    def name(self, mineral_id, default=None):
+        row = self.get(mineral_id)
+        return row["name"] if row else (default if default is not None else f"Unknown_{mineral_id}")
+
+    def clean_name(self, mineral_id, default=None):
+        row = self.get(mineral_id)
+        return row["clean_name"] if row else (default if default is not None else f"Mineral {mineral_id}")
+
+    def group(self, mineral_id):
+        row = self.get(mineral_id)
+        return row["group"] if row else None
+
+    def by_group(self, group):
+        return [row for row in self.rows.values() if row["group"] == group]
+
+    def find(self, text):
+        """IDs whose full or clean name contains text (case-insensitive)"""
+        text = text.lower()
+        return [i for i, row in self.rows.items() if text in row["name"].lower() or text in row["clean_name"].lower()]
+
+    def mapping(self):
+        """ID -> clean display name, as used by web_data.json"""
+        return {i: row["clean_name"] for i, row in self.rows.items()}
+
+
+def build_index(rows, version, path=DEFAULT_INDEX_PATH):
+    """Write the rows to a fresh SQLite index, replacing any previous one atomically"""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    con = sqlite3.connect(tmp_path)
+    with con:
+        con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        con.execute("CREATE TABLE minerals (id INTEGER PRIMARY KEY, grp INTEGER, name TEXT, clean_name TEXT, record INTEGER)")
+        con.execute("CREATE INDEX minerals_grp ON minerals (grp)")
+        con.execute("INSERT INTO meta VALUES ('library_version', ?)", (version,))
+        con.executemany("INSERT INTO minerals VALUES (?, ?, ?, ?, ?)",
+                        [(r["index"], r["group"], r["name"], r["clean_name"], r["record"]) for r in rows])
+    con.close()
+    os.replace(tmp_path, path)
+    return MineralIndex(rows, version)
+
+
+def load_index(path=DEFAULT_INDEX_PATH):
+    """Load an existing index, or return None if there is none"""
+    if not Path(path).exists():
+        return None
+    con = sqlite3.connect(path)
+    try:
+        version = con.execute("SELECT value FROM meta WHERE key = 'library_version'").fetchone()[0]
+        rows = [
+            {"index": i, "group": g, "name": nm, "clean_name": clean, "record": rec}
+            for i, g, nm, clean, rec in con.execute("SELECT id, grp, name, clean_name, record FROM minerals")
+        ]
+    except sqlite3.Error as e:
+        print(f"Warning: ignoring unreadable mineral index {path}: {e}")
+        return None
+    finally:
+        con.close()
+    return MineralIndex(rows, version)
+
+
+def open_index(granule=None, path=DEFAULT_INDEX_PATH):
+    """
+    Open the mineral index. If a granule (path or open netCDF4 Dataset) is given and the index
+    is missing or was built from a different library version, it is rebuilt from that granule's
+    mineral_metadata; otherwise only the index file is read.
+    """
+    index = load_index(path)
+    if granule is None:
+        if index is None:
+            raise FileNotFoundError(f"No mineral index at {path}; pass a granule to build it")
+        return index
+
+    nc = granule if isinstance(granule, Dataset) else Dataset(granule, 'r')
+    try:
+        version = library_version(nc) or UNKNOWN_VERSION
+        if index is not None and index.version == version:
+            return index
+        print(f"Building mineral index {path} for library version {version}")
+        return build_index(mineral_table(nc), version, path)
+    finally:
+        if nc is not granule:
+            nc.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python mineral_index.py /path/to/EMIT_L2B_MIN_...nc [index_path]")
+        sys.exit(1)
+    index = open_index(sys.argv[1], *sys.argv[2:3])
+    print(f"{len(index)} minerals, library version {index.version}")
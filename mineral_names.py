@@ -0,0 +1,92 @@
+import json
+import numpy as np
+from netCDF4 import Dataset
+
+# Global attributes that identify the product / spectral library a granule was built with
+VERSION_ATTRS = ("product_version", "software_build_version", "software_delivery_version", "spectral_library")
+
+_TABLE_CACHE = {}
+
+
+def decode_chararray(arr):
+    """
+    Decode netCDF char arrays or variable-length strings to python strings.
+    arr may be: (N, M) array of bytes (S1), or (N,) array of variable-length bytes/strings.
+    Char matrices are decoded with a single view over the row bytes instead of per character.
+    """
+    arr = np.ma.getdata(arr)
+    if arr.dtype.kind in ('S', 'V'):
+        arr = np.ascontiguousarray(arr)
+        if arr.ndim == 2:
+            # (N, M) S1 -> (N,) S<M>; numpy drops the trailing NUL padding
+            arr = arr.view(f"S{arr.shape[1] * arr.dtype.itemsize}").reshape(arr.shape[0])
+        elif arr.dtype.kind == 'V':
+            arr = arr.view(f"S{arr.dtype.itemsize}")
+        return [s.decode('utf-8', errors='ignore').strip() for s in arr.tolist()]
+    if arr.dtype.kind == 'O':
+        return [(x.decode('utf-8', errors='ignore') if isinstance(x, (bytes, bytearray)) else str(x)).strip()
+                for x in arr]
+    # likely already string dtype or numpy unicode
+    return [str(x).strip() for x in arr[:]]
+
+
+def clean_mineral_name(name):
+    """Short display name: first word, trailing '_' dropped, underscores as spaces"""
+    clean_name = name.split(' ')[0]
+    if clean_name.endswith('_'):
+        clean_name = clean_name[:-1]
+    return clean_name.replace('_', ' ')
+
+
+def library_version(nc):
+    """Key for the mineral library of an open granule, or None if it carries no version attributes"""
+    attrs = {k: str(nc.getncattr(k)) for k in VERSION_ATTRS if k in nc.ncattrs()}
+    return json.dumps(attrs, sort_keys=True) if attrs else None
+
+
+def _read_table(nc):
+    if 'mineral_metadata' not in nc.groups:
+        raise KeyError("No 'mineral_metadata' group found")
+    mm = nc.groups['mineral_metadata']
+
+    for var_name in ('name', 'mineral_name'):
+        if var_name in mm.variables:
+            names = decode_chararray(mm.variables[var_name][:])
+            break
+    else:
+        raise KeyError("No 'name' or 'mineral_name' variable found in mineral_metadata")
+
+    # index (should be 1-based), group and spectral library record if present
+    idx = mm.variables['index'][:] if 'index' in mm.variables else np.arange(1, len(names) + 1)
+    grp = mm.variables['group'][:] if 'group' in mm.variables else np.zeros_like(idx)
+    rec = mm.variables['record'][:] if 'record' in mm.variables else np.full(len(names), -1)
+
+    return [
+        {"index": int(i), "group": int(g), "name": nm, "clean_name": clean_mineral_name(nm), "record": int(r)}
+        for i, g, nm, r in zip(idx, grp, names, rec)
+    ]
+
+
+def mineral_table(source):
+    """
+    Rows of index/group/name/clean_name/record from a granule's mineral_metadata group.
+    source is a path or an already-open netCDF4 Dataset (which is not closed).
+    Tables are cached per library version, so granules of the same product share one decode.
+    """
+    nc = source if isinstance(source, Dataset) else Dataset(source, 'r')
+    try:
+        version = library_version(nc)
+        if version is not None and version in _TABLE_CACHE:
+            return _TABLE_CACHE[version]
+        table = _read_table(nc)
+        if version is not None:
+            _TABLE_CACHE[version] = table
+        return table
+    finally:
+        if nc is not source:
+            nc.close()
+
+
+def mineral_mapping(source):
+    """ID -> clean display name, as used by web_data.json"""
+    return {row["index"]: row["clean_name"] for row in mineral_table(source)}
@@ -0,0 +1,323 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+import numpy as np
+from pathlib import Path
+from netCDF4 import Dataset
+
+from array_store import ARRAY_DIR, ArrayStore, source_attrs, write_array_store
+from ingest import open_or_ingest
+
+MOSAIC_DIR = "mosaic"
+MOSAIC_FILE = "mosaic.json"
+STAGING_DIR = "staging"
+TILE_SIZE = 512
+# Nominal EMIT L2B ortho pixel size in degrees, used when the first granule has no geotransform
+DEFAULT_RES = 0.000542232520256367
+GROUPS = ("group1", "group2")
+# Scores for cells without a detection: in the swath but no match, and no data at all
+NO_MATCH, NO_DATA = -1.0, -2.0
+
+
+def _granule_geometry(file_path):
+    """Geotransform and 1-based GLT arrays (0 = outside the swath) of a granule's ortho grid"""
+    nc = Dataset(file_path, 'r')
+    try:
+        gt = [float(v) for v in nc.getncattr("geotransform")]
+        location = nc.groups["location"]
+        glt_x = np.asarray(location.variables["glt_x"][:], dtype=np.int32)
+        glt_y = np.asarray(location.variables["glt_y"][:], dtype=np.int32)
+    finally:
+        nc.close()
+    return gt, glt_x, glt_y
+
+
+class Mosaic:
+    """
+    Granules resampled onto one global lat/lon grid (origin 180W, 90N, square cells of res
+    degrees), stored as tiles of tile_size cells. Each tile is an array store holding, per group,
+    band depth (NaN = none), mineral ID (0 = none) and the index of the source granule
+    (-1 = no data).
+
+    Granules are mapped with their GLT: every mosaic cell center inside a granule's ortho grid
+    is looked up in the GLT to find the sensor pixel it shows, so resampling is a vectorized
+    gather with no gaps. Overlaps keep the larger band depth (a detection beats no match, which
+    beats no data); exact ties go to the granule whose name sorts first. The rule is commutative,
+    so the mosaic does not depend on the order granules are added in, and a granule already in
+    the mosaic is skipped unless it changed. Memory is bounded by one tile plus one granule's GLT.
+    Updated tiles are staged and only put in place with the metadata (see commit()), so an
+    interrupted add leaves either the old mosaic or the new one.
+    """
+    meta_file = MOSAIC_FILE
+
+    def __init__(self, mosaic_dir=MOSAIC_DIR, res=None, tile_size=TILE_SIZE):
+        self.dir = Path(mosaic_dir)
+        self.meta_path = self.dir / self.meta_file
+        if self.meta_path.exists():
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"res": res, "tile_size": tile_size, "origin": [-180.0, 90.0], "granules": [], "tiles": []}
+        self.staged = []
+
+    @property
+    def res(self):
+        return self.meta["res"]
+
+    @property
+    def tile_size(self):
+        return self.meta["tile_size"]
+
+    def save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def tile_dir(self, ty, tx):
+        return self.dir / "tiles" / f"{ty}_{tx}"
+
+    def stage_tile(self, ty, tx, tile):
+        """Write an updated tile to the staging area; commit() puts it in place"""
+        write_array_store(self.dir / STAGING_DIR / f"{ty}_{tx}", tile, {"tile": [ty, tx]})
+        self.staged.append([ty, tx])
+
+    def commit(self):
+        """
+        Publish the staged tiles together with the metadata. The metadata, listing the staged
+        tiles, is replaced first and is the commit point; the tiles are then renamed into place.
+        An interruption before it leaves the previous state, one after it is rolled forward by
+        recover().
+        """
+        for ty, tx in self.staged:
+            if [ty, tx] not in self.meta["tiles"]:
+                self.meta["tiles"].append([ty, tx])
+        self.meta["staged"] = self.staged
+        self.staged = []
+        self.save()
+        self._install_staged()
+
+    def recover(self):
+        """Finish a commit that was interrupted after its metadata was written, or drop an uncommitted one"""
+        if self.meta.get("staged"):
+            self._install_staged()
+        else:
+            shutil.rmtree(self.dir / STAGING_DIR, ignore_errors=True)
+
+    def _install_staged(self):
+        for ty, tx in self.meta["staged"]:
+            staged, final = self.dir / STAGING_DIR / f"{ty}_{tx}", self.tile_dir(ty, tx)
+            old = final.with_name(f"{final.name}.old")
+            if staged.exists():
+                if final.exists():
+                    shutil.rmtree(old, ignore_errors=True)
+                    os.replace(final, old)
+                final.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staged, final)
+            shutil.rmtree(old, ignore_errors=True)
+        self.meta["staged"] = []
+        self.save()
+        shutil.rmtree(self.dir / STAGING_DIR, ignore_errors=True)
+
+    def cell_range(self, west, south, east, north):
+        """Global (row0, row1, col0, col1) cell range covering a lat/lon box"""
+        lon0, lat0 = self.meta["origin"]
+        return (math.floor((lat0 - north) / self.res), math.ceil((lat0 - south) / self.res),
+                math.floor((west - lon0) / self.res), math.ceil((east - lon0) / self.res))
+
+    def read_tile(self, ty, tx):
+        """Tile arrays as writable copies, or empty arrays if the tile does not exist yet"""
+        if [ty, tx] in self.meta["tiles"]:
+            store = ArrayStore(self.tile_dir(ty, tx))
+            return {name: np.array(store[name]) for name in store.names}
+        return self.empty_tile()
+
+    def empty_tile(self):
+        shape = (self.tile_size, self.tile_size)
+        tile = {}
+        for group in GROUPS:
+            tile[f"{group}_band_depth"] = np.full(shape, np.nan, dtype=np.float32)
+            tile[f"{group}_mineral_id"] = np.zeros(shape, dtype=np.uint16)
+            tile[f"{group}_source"] = np.full(shape, -1, dtype=np.int16)
+        return tile
+
+    def _name_ranks(self):
+        """Rank of every granule index by name, for tie-breaks"""
+        names = [g["filename"] for g in self.meta["granules"]]
+        ranks = np.empty(len(names), dtype=np.int64)
+        ranks[np.argsort(names, kind="stable")] = np.arange(len(names))
+        return ranks
+
+    def granule_windows(self, gt, glt_x, glt_y):
+        """
+        Yield (ty, tx, window, valid, rows, cols) for every tile a granule's ortho grid overlaps:
+        the slice of the tile inside the granule's box, which of its cells show a sensor pixel,
+        and the 0-based (row, col) of those pixels in the granule's arrays.
+        """
+        ny, nx = glt_x.shape
+        west, north = gt[0], gt[3]
+        east, south = west + nx * gt[1], north + ny * gt[5]
+        row0, row1, col0, col1 = self.cell_range(west, south, east, north)
+        size = self.tile_size
+        lon0, lat0 = self.meta["origin"]
+
+        for ty in range(row0 // size, (row1 - 1) // size + 1):
+            for tx in range(col0 // size, (col1 - 1) // size + 1):
+                # Cells of this tile inside the granule's box, and the ortho pixel under each center
+                r_lo, r_hi = max(row0, ty * size), min(row1, (ty + 1) * size)
+                c_lo, c_hi = max(col0, tx * size), min(col1, (tx + 1) * size)
+                lat = lat0 - (np.arange(r_lo, r_hi) + 0.5) * self.res
+                lon = lon0 + (np.arange(c_lo, c_hi) + 0.5) * self.res
+                oy = np.floor((lat - north) / gt[5]).astype(np.int64)[:, None]
+                ox = np.floor((lon - west) / gt[1]).astype(np.int64)[None, :]
+                inside = (oy >= 0) & (oy < ny) & (ox >= 0) & (ox < nx)
+                oy, ox = np.broadcast_arrays(np.clip(oy, 0, ny - 1), np.clip(ox, 0, nx - 1))
+                gx, gy = glt_x[oy, ox], glt_y[oy, ox]
+                valid = inside & (gx > 0) & (gy > 0)
+                if not valid.any():
+                    continue
+                window = (slice(r_lo - ty * size, r_hi - ty * size), slice(c_lo - tx * size, c_hi - tx * size))
+                yield ty, tx, window, valid, gy[valid] - 1, gx[valid] - 1
+
+    def read_window(self, west, south, east, north, names):
+        """
+        The named tile arrays for a lat/lon box, assembled from the tiles (read-only memory maps,
+        only the overlapping parts are copied; cells without a tile keep the empty-tile value),
+        plus the window's geotransform.
+        """
+        row0, row1, col0, col1 = self.cell_range(west, south, east, north)
+        shape = (row1 - row0, col1 - col0)
+        empty = self.empty_tile()
+        window = {name: np.full(shape, empty[name].flat[0], dtype=empty[name].dtype) for name in names}
+        size = self.tile_size
+        for ty, tx in self.meta["tiles"]:
+            r_lo, r_hi = max(row0, ty * size), min(row1, (ty + 1) * size)
+            c_lo, c_hi = max(col0, tx * size), min(col1, (tx + 1) * size)
+            if r_lo >= r_hi or c_lo >= c_hi:
+                continue
+            store = ArrayStore(self.tile_dir(ty, tx))
+            for name in names:
+                window[name][r_lo - row0:r_hi - row0, c_lo - col0:c_hi - col0] = \
+                    store[name][r_lo - ty * size:r_hi - ty * size, c_lo - tx * size:c_hi - tx * size]
+
+        lon0, lat0 = self.meta["origin"]
+        window["geotransform"] = [lon0 + col0 * self.res, self.res, 0.0, lat0 - row0 * self.res, 0.0, -self.res]
+        return window
+
+    def add_granule(self, file_path, store_dir=ARRAY_DIR):
+        """Resample one granule into the mosaic. Returns the number of tiles touched (0 if skipped)."""
+        self.recover()
+        attrs = source_attrs(file_path)
+        granules = self.meta["granules"]
+        existing = [i for i, g in enumerate(granules) if g["filename"] == attrs["filename"]]
+        if existing and granules[existing[0]] == attrs:
+            return 0
+        if existing:
+            # A changed granule has to be rebuilt from scratch: its old pixels may have won overlaps
+            raise ValueError(f"{attrs['filename']} changed since it was mosaicked; rebuild the mosaic")
+
+        gt, glt_x, glt_y = _granule_geometry(file_path)
+        if self.res is None:
+            self.meta["res"] = abs(gt[1]) or DEFAULT_RES
+        store = open_or_ingest(file_path, store_dir)
+        source = len(granules)
+        granules.append(attrs)
+        ranks = self._name_ranks()
+
+        touched = 0
+        for ty, tx, window, valid, rows, cols in self.granule_windows(gt, glt_x, glt_y):
+            tile = self.read_tile(ty, tx)
+            for group in GROUPS:
+                self._merge(tile, group, window, valid, store[f"{group}_band_depth"][rows, cols],
+                            store[f"{group}_mineral_id"][rows, cols], source, ranks)
+            self.stage_tile(ty, tx, tile)
+            touched += 1
+
+        self.commit()
+        return touched
+
+    @staticmethod
+    def _merge(tile, group, window, valid, band_depth, mineral_id, source, ranks):
+        """Keep, per cell, whichever of the tile and the new granule has the higher score"""
+        bd_tile = tile[f"{group}_band_depth"][window]
+        id_tile = tile[f"{group}_mineral_id"][window]
+        src_tile = tile[f"{group}_source"][window]
+
+        old_bd, old_id, old_src = bd_tile[valid], id_tile[valid], src_tile[valid]
+        old_score = np.where(old_src < 0, NO_DATA, np.where(old_id > 0, np.nan_to_num(old_bd), NO_MATCH))
+        detected = mineral_id > 0
+        new_score = np.where(detected, np.nan_to_num(band_depth), NO_MATCH)
+        wins = (new_score > old_score) | (
+            (new_score == old_score) & (old_src >= 0) & (ranks[source] < ranks[np.maximum(old_src, 0)]))
+
+        old_bd[wins] = np.where(detected, band_depth, np.nan)[wins]
+        old_id[wins] = mineral_id[wins]
+        old_src[wins] = source
+        bd_tile[valid], id_tile[valid], src_tile[valid] = old_bd, old_id, old_src
+
+
+def build_mosaic(files, mosaic_dir=MOSAIC_DIR, res=None, tile_size=TILE_SIZE, store_dir=ARRAY_DIR):
+    mosaic = Mosaic(mosaic_dir, res, tile_size)
+    for file_path in files:
+        start = time.perf_counter()
+        touched = mosaic.add_granule(file_path, store_dir)
+        if touched:
+            print(f"Mosaicked {Path(file_path).name} into {touched} tiles in {time.perf_counter() - start:.2f}s")
+        else:
+            print(f"{Path(file_path).name} is already in the mosaic")
+    return mosaic
+
+
+def read_mosaic_window(mosaic_dir, west, south, east, north, group="group1"):
+    """
+    Band depth, mineral ID and source granule index for a lat/lon box, assembled from the tiles
+    (read-only memory maps, only the overlapping parts are copied). Returns a dict with the arrays,
+    the window's geotransform and the granule names the source indices refer to.
+    """
+    mosaic = Mosaic(mosaic_dir)
+    if mosaic.res is None:
+        raise FileNotFoundError(f"No mosaic at {mosaic_dir}")
+    keys = ("band_depth", "mineral_id", "source")
+    arrays = mosaic.read_window(west, south, east, north, [f"{group}_{key}" for key in keys])
+    window = {key: arrays[f"{group}_{key}"] for key in keys}
+    window["geotransform"] = arrays["geotransform"]
+    window["granules"] = [g["filename"] for g in mosaic.meta["granules"]]
+    return window
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mosaic EMIT granules onto a shared lat/lon grid")
+    parser.add_argument("inputs", nargs="*", help="granule files to add to the mosaic")
+    parser.add_argument("--mosaic-dir", default=MOSAIC_DIR, help="mosaic location")
+    parser.add_argument("--store-dir", default=ARRAY_DIR, help="array store root used to read granules")
+    parser.add_argument("--res", type=float, default=None,
+                        help="cell size in degrees for a new mosaic (default: the first granule's pixel size)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="cells per tile side for a new mosaic")
+    parser.add_argument("--query", help="west,south,east,north box to summarize")
+    parser.add_argument("--group", choices=GROUPS, default="group1", help="group for --query")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.inputs:
+        build_mosaic(args.inputs, args.mosaic_dir, args.res, args.tile_size, args.store_dir)
+
+    if args.query:
+        west, south, east, north = (float(v) for v in args.query.split(","))
+        window = read_mosaic_window(args.mosaic_dir, west, south, east, north, args.group)
+        detected = window["mineral_id"] > 0
+        print(f"Window {window['mineral_id'].shape[0]}x{window['mineral_id'].shape[1]} cells, "
+              f"{int(np.count_nonzero(window['source'] >= 0))} with data, {int(np.count_nonzero(detected))} detections")
+        for i, name in enumerate(window["granules"]):
+            count = int(np.count_nonzero(window["source"] == i))
+            if count:
+                print(f"  {name}: {count} cells")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,8 @@
 
 import sys
 from netCDF4 import Dataset
-import numpy as np
 
-def decode_chararray(arr):
-    """
-    Decode netCDF char arrays or variable-length strings robustly to python strings.
-    arr may be: (N, M) array of bytes (S1), or (N,) array of variable-length bytes/strings.
-    """
-    if arr.dtype.kind in ('S','V','O'):
-        # char array -> join bytes in each row
-        names = []
-        for row in arr:
-            # row could be an array of bytes
-            try:
-                # try joining if row is sequence of bytes
-                joined = b''.join([(bytes([c]) if isinstance(c, int) else c) for c in row])
-                s = joined.decode('utf-8', errors='ignore').strip()
-            except Exception:
-                # fallback
-                try:
-                    s = ''.join([c.decode('utf-8', errors='ignore') if isinstance(c, (bytes, bytearray)) else str(c) for c in row]).strip()
-                except Exception:
-                    s = str(row).strip()
-            names.append(s)
-        return names
-    else:
-        # likely already string dtype or numpy unicode
-        return [str(x).strip() for x in arr[:]]
+from mineral_index import open_index
 
 def main(fname):
     nc = Dataset(fname, 'r')
@@ -38,31 +13,16 @@ def main(fname):
     mm = nc.groups['mineral_metadata']
     print("Variables in mineral_metadata:", list(mm.variables.keys()))
 
-    # Get names
-    if 'mineral_name' in mm.variables:
-        mnames_raw = mm.variables['mineral_name'][:]
-        mnames = decode_chararray(mnames_raw)
-    elif 'name' in mm.variables:
-        mnames = decode_chararray(mm.variables['name'][:])
-    else:
-        raise SystemExit("Couldn't find 'mineral_name' or 'name' variable in mineral_metadata")
-
-    # index (should be 1-based), group, record if present
-    idx = mm.variables['index'][:] if 'index' in mm.variables else np.arange(1, len(mnames)+1)
-    grp = mm.variables['group'][:] if 'group' in mm.variables else np.zeros_like(idx)
+    # Names come from the persistent mineral index (rebuilt only if the library version changed)
+    try:
+        index = open_index(nc)
+    except KeyError as e:
+        raise SystemExit(f"Couldn't read mineral_metadata: {e}")
 
     # Print mapping (index -> name, group)
     print("\nMineral lookup (index -> group -> name). Note: 0 in the scene data == No_Match.\n")
-    for i, g, nm in zip(idx, grp, mnames):
-        print(f"{int(i):3d}   group:{int(g):2d}   {nm}")
-
-    # simple check: how many unique IDs appear in group_1_mineral_id
-    # open root variables safely
-    if 'group_1_mineral_id' in nc.variables:
-        g1 = nc.variables['group_1_mineral_id'][:]
-    else:
-        # root variables are often at dataset root -> use nc.variables keys
-        g1 = None
+    for i, row in sorted(index.rows.items()):
+        print(f"{i:3d}   group:{row['group']:2d}   {row['name']}")
 
     # close
     nc.close()
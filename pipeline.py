@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+from netCDF4 import Dataset
+
+from data_processor import (CACHE_VERSION, _process_and_write, add_cache_arguments, add_processing_arguments,
+                            check_processing_arguments, create_mineral_mapping, processing_cache, processing_options,
+                            restore_cached, store_cached, web_metadata)
+from loader import (DEST_DIR, DOWNLOAD_WORKERS, download_file, earthdata_token, granule_files, is_current,
+                    load_manifest, save_manifest, search_granules)
+from mineral_index import DEFAULT_INDEX_PATH, load_index
+from server import MyHTTPRequestHandler, ThreadingServer
+from web_writer import LAYOUTS, WebDataWriter
+
+QUEUE_SIZE = 4
+TEMP_LIMIT_MB = 4096
+
+
+class TempSpace:
+    """
+    Byte budget for granules on local disk between the start of their download and the end of
+    their processing. A download waits until its file fits, except when nothing is held,
+    so a single granule larger than the budget still goes through.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        with self.condition:
+            while self.used and self.used + size > self.limit:
+                self.condition.wait()
+            self.used += size
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+def mineral_granules(umms):
+    """The L2B MIN .nc file of each UMM record (uncertainty files and other data are skipped)"""
+    return [entry for umm in umms for entry in granule_files(umm)
+            if entry["name"].endswith(".nc") and "_MIN_" in entry["name"]]
+
+
+def run_pipeline(umms, dest_dir=DEST_DIR, out_dir=".", download_workers=DOWNLOAD_WORKERS, workers=None,
+                 queue_size=QUEUE_SIZE, temp_limit=TEMP_LIMIT_MB * 1024 ** 2, token=None, delete_after=False,
+                 cache=None, layout="combined", mineral_index=DEFAULT_INDEX_PATH, **options):
+    """
+    Download granules and process them as they land, overlapping network and compute.
+
+    Granules already in the cache under their archive name, size and checksum are restored
+    without being downloaded. The rest are fetched by download_workers threads; finished files
+    wait for one of the workers processes, and no new download starts while queue_size of them
+    are waiting, so a slow pool pauses the downloads (backpressure). TempSpace additionally
+    caps the bytes of granules downloaded but not yet processed. With delete_after, each
+    granule is removed once processed, so the disk only ever holds that window. Datasets
+    stream into web_data.json as they finish. options are passed to process_granule.
+    Returns the per-granule records.
+    """
+    workers = workers or os.cpu_count() or 1
+    dest_dir, out_dir = Path(dest_dir), Path(out_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    entries = mineral_granules(umms)
+    manifest = load_manifest(dest_dir)
+    manifest_lock = threading.Lock()
+    temp = TempSpace(temp_limit)
+    params = dict(options, cache_version=CACHE_VERSION)
+    start = time.perf_counter()
+
+    def fetch(index, entry, key):
+        path = dest_dir / entry["name"]
+        size = entry["size"] or 0
+        temp.acquire(size)
+        try:
+            with manifest_lock:
+                current = is_current(entry, dest_dir, manifest)
+            if not current:
+                record = download_file(entry, dest_dir, token)
+                with manifest_lock:
+                    manifest[entry["name"]] = record
+                    save_manifest(dest_dir, manifest)
+                print(f"Downloaded {entry['name']} ({record['size'] / 1024 / 1024:.1f} MB) "
+                      f"at {time.perf_counter() - start:.1f}s")
+        except BaseException:
+            temp.release(size)
+            raise
+        return index, path, size, key
+
+    writer = WebDataWriter(out_dir, layout)
+    records = []
+    seconds = []
+    mapping = None
+    downloads_done = None
+
+    def finish(record, name, path=None, size=0, cached=False):
+        temp.release(size)
+        records.append(record)
+        writer.add(record["file_index"], record["dataset_path"])
+        if delete_after and path is not None:
+            path.unlink(missing_ok=True)
+        if not cached:
+            seconds.append(record["seconds"])
+        how = "from cache" if cached else f"in {record['seconds']:.2f}s"
+        print(f"[{len(records)}/{len(entries)}] processed {Path(name).stem} {how} "
+              f"at {time.perf_counter() - start:.1f}s")
+
+    try:
+        pending = deque()
+        for index, entry in enumerate(entries):
+            key = cache.source_key(entry, params) if cache is not None else None
+            record = restore_cached(cache, key, out_dir, index) if key else None
+            if record is not None:
+                finish(record, entry["name"], cached=True)
+            else:
+                pending.append((index, entry, key))
+
+        ready = deque()
+        downloads, processing = {}, {}
+        with ThreadPoolExecutor(max_workers=download_workers) as downloader, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            while pending or downloads or ready or processing:
+                while pending and len(downloads) < download_workers and len(ready) < queue_size:
+                    index, entry, key = pending.popleft()
+                    downloads[downloader.submit(fetch, index, entry, key)] = entry["name"]
+
+                while ready and len(processing) < workers:
+                    index, path, size, key = ready.popleft()
+                    if mapping is None:
+                        # names come from the first granule, before it can be deleted
+                        mapping = create_mineral_mapping([str(path)], mineral_index)
+                    if cache is not None and key is None:
+                        key = cache.key(path, params)
+                    record = restore_cached(cache, key, out_dir, index) if key else None
+                    if record is not None:
+                        finish(record, path.name, path, size, cached=True)
+                    else:
+                        future = pool.submit(_process_and_write, str(path), index, out_dir, options)
+                        processing[future] = (path, size, key)
+
+                if not (downloads or processing):
+                    continue
+                done, _ = wait(list(downloads) + list(processing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in downloads:
+                        name = downloads.pop(future)
+                        try:
+                            ready.append(future.result())
+                        except Exception as e:
+                            print(f"Error downloading {name}: {e}")
+                        if not (pending or downloads):
+                            downloads_done = time.perf_counter() - start
+                        continue
+
+                    path, size, key = processing.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        temp.release(size)
+                        print(f"Error processing {path.name}: {e}")
+                        continue
+                    if cache is not None:
+                        store_cached(cache, key, out_dir, record)
+                    finish(record, path.name, path, size)
+    except BaseException:
+        writer.abort()
+        raise
+
+    if cache is not None:
+        cache.save()
+    if mapping is None:
+        # every granule came from the cache: names from the persistent index
+        index = load_index(mineral_index)
+        mapping = index.mapping() if index else None
+    writer.close(web_metadata(options), mapping or {0: "No Match"})
+
+    elapsed = time.perf_counter() - start
+    compute = sum(seconds) / max(1, min(workers, len(seconds)))
+    downloads_done = downloads_done or elapsed
+    print(f"Pipeline processed {len(records)}/{len(entries)} granules in {elapsed:.1f}s: downloads finished "
+          f"after {downloads_done:.1f}s, processing took ~{compute:.1f}s of pool time "
+          f"(~{downloads_done + compute:.1f}s if run one after the other)")
+    return sorted(records, key=lambda r: r["file_index"])
+
+
+class _ThrottledWriter:
+    def __init__(self, out, rate):
+        self.out = out
+        self.rate = rate
+
+    def write(self, block):
+        self.out.write(block)
+        time.sleep(len(block) / self.rate)
+
+
+class ThrottledHandler(MyHTTPRequestHandler):
+    """The web server's file handler (ETags, byte ranges for resumes), sending at most rate bytes/s per request"""
+    rate = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        super().copyfile(source, _ThrottledWriter(outputfile, self.rate) if self.rate else outputfile)
+
+
+def local_umms(directory, base_url):
+    """UMM-like records for the .nc files of a local directory, as served from base_url, with MD5 checksums"""
+    umms = []
+    for path in sorted(Path(directory).glob("*.nc")):
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        nc = Dataset(path, 'r')
+        try:
+            begin = nc.getncattr("time_coverage_start") if "time_coverage_start" in nc.ncattrs() else ""
+        finally:
+            nc.close()
+        umms.append({
+            "GranuleUR": path.stem,
+            "TemporalExtent": {"RangeDateTime": {"BeginningDateTime": begin, "EndingDateTime": begin}},
+            "RelatedUrls": [{"URL": f"{base_url}/{path.name}", "Type": "GET DATA"}],
+            "DataGranule": {"ArchiveAndDistributionInformation": [{
+                "Name": path.name,
+                "SizeInBytes": path.stat().st_size,
+                "Checksum": {"Value": digest.hexdigest(), "Algorithm": "MD5"}
+            }]}
+        })
+    return umms
+
+
+def serve_local(directory, rate=None, handler_class=ThrottledHandler):
+    """
+    Serve a directory of granules over HTTP on a free local port, optionally throttled to
+    rate bytes/s per download, as a stand-in for the DAAC. Returns (server, base_url).
+    """
+    handler = partial(type("Handler", (handler_class,), {"rate": rate}), directory=str(directory))
+    server = ThreadingServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download EMIT granules and process them as they arrive")
+    parser.add_argument("--start", default="2025-09-25", help="temporal search start date")
+    parser.add_argument("--end", default="2025-10-04", help="temporal search end date")
+    parser.add_argument("--latest", type=int, default=2, help="number of latest granules (0 for all)")
+    parser.add_argument("--umm", help="JSON file with a list of UMM granule records to use instead of a CMR search")
+    parser.add_argument("--local", metavar="DIR",
+                        help="serve the .nc files in DIR over local HTTP and fetch from there (testing stand-in)")
+    parser.add_argument("--local-rate", type=float, default=None, help="throttle --local downloads to MB/s each")
+    parser.add_argument("--dest", default=DEST_DIR, help="download directory")
+    parser.add_argument("--out-dir", default=".", help="web root to write web_data.json, tiles and buffers to")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS, help="concurrent downloads")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="downloaded granules allowed to wait for a worker before downloads pause")
+    parser.add_argument("--temp-limit", type=float, default=TEMP_LIMIT_MB,
+                        help="MB of granules allowed on disk between download and end of processing")
+    parser.add_argument("--delete-after", action="store_true", help="delete each granule once it is processed")
+    add_processing_arguments(parser)
+    parser.add_argument("--layout", choices=LAYOUTS, default="combined", help="web_data.json layout")
+    parser.add_argument("--mineral-index", default=DEFAULT_INDEX_PATH, help="persistent mineral index location")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    check_processing_arguments(parser, args)
+    for flag, value in (("--download-workers", args.download_workers), ("--queue-size", args.queue_size)):
+        if value < 1:
+            parser.error(f"{flag} must be at least 1")
+    return args
+
+
+def main():
+    args = parse_args()
+    server = None
+    if args.local:
+        rate = args.local_rate * 1024 ** 2 if args.local_rate else None
+        server, base_url = serve_local(args.local, rate)
+        umms = local_umms(args.local, base_url)
+        token = None
+        print(f"Serving {len(umms)} local granules from {base_url}")
+    elif args.umm:
+        with open(args.umm) as f:
+            umms = json.load(f)
+        token = os.environ.get("EARTHDATA_TOKEN")
+    else:
+        token = earthdata_token()
+        umms = search_granules(args.start, args.end)
+    selected = umms[:args.latest] if args.latest else umms
+
+    cache = processing_cache(args)
+    try:
+        run_pipeline(selected, args.dest, args.out_dir, args.download_workers, args.workers, args.queue_size,
+                     int(args.temp_limit * 1024 ** 2), token, args.delete_after, cache, args.layout,
+                     args.mineral_index, **processing_options(args))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,124 @@
-import xarray as xr
+import argparse
+import math
+import os
+import time
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from netCDF4 import Dataset
 
-# Open the EMIT NetCDF dataset
-ds = xr.open_dataset("emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc")
+from data_processor import find_granules
+from downsample import DOWNSAMPLE_MODES, read_downsampled
+from ingest import open_or_ingest
 
-# Extract band depth and mineral ID arrays
-bd1 = ds["group_1_band_depth"].values
-bd2 = ds["group_2_band_depth"].values
-gid1 = ds["group_1_mineral_id"].values
-gid2 = ds["group_2_mineral_id"].values
-
-# Mask out pixels with no mineral detected (ID = 0)
-bd1_masked = np.where(gid1 != 0, bd1, np.nan)
-bd2_masked = np.where(gid2 != 0, bd2, np.nan)
+DEFAULT_FILE = "emit_data/EMIT_L2B_MIN_001_20251002T064804_2527504_055.nc"
+QUICKLOOK_DIR = "quicklooks"
+FIGSIZE = (14, 6)
+DPI = 100
+# One fixed scale for every panel and granule, so quick-looks can be compared side by side
+CMAP, VMIN, VMAX = 'coolwarm', 0, 1
+COLORBAR_LABEL = 'Band Depth (0=none, 1=strongest)'
 
 # Function to plot heatmap with scale
-def plot_heatmap(data, title, ax):
-    im = ax.imshow(data, cmap='coolwarm', vmin=0, vmax=1)  # set depth scale from 0 to 1
-    cbar = plt.colorbar(im, ax=ax)
-    cbar.set_label('Band Depth (0=none, 1=strongest)')
+def plot_heatmap(data, title, ax, extent=None):
+    im = ax.imshow(data, cmap=CMAP, vmin=VMIN, vmax=VMAX, extent=extent, interpolation='nearest')
     ax.set_title(title)
     ax.set_xlabel('Crosstrack')
     ax.set_ylabel('Downtrack')
+    return im
+
+def show_granule(file_path=DEFAULT_FILE):
+    """Interactive full-resolution view of one granule's band depth"""
+    # Open the memory-mapped arrays of the EMIT granule (ingested on first use)
+    store = open_or_ingest(file_path)
+
+    # Mask out pixels with no mineral detected (ID = 0)
+    bd1_masked = np.where(store["group1_mineral_id"] != 0, store["group1_band_depth"], np.nan)
+    bd2_masked = np.where(store["group2_mineral_id"] != 0, store["group2_band_depth"], np.nan)
+
+    fig, axes = plt.subplots(1, 2, figsize=FIGSIZE)
+    for data, title, ax in ((bd1_masked, "Group 1 Band Depth Heatmap", axes[0]),
+                            (bd2_masked, "Group 2 Band Depth Heatmap", axes[1])):
+        cbar = plt.colorbar(plot_heatmap(data, title, ax), ax=ax)
+        cbar.set_label(COLORBAR_LABEL)
+
+    plt.tight_layout()
+    plt.show()
+
+def reduction_factor(shape, dpi=DPI):
+    """Smallest block size that brings a scene down to about the panel's height in output pixels"""
+    return max(1, math.ceil(max(shape) / (FIGSIZE[1] * dpi)))
+
+def render_quicklook(file_path, out_dir=QUICKLOOK_DIR, dpi=DPI, mode="max"):
+    """
+    Render one granule's two band depth panels to out_dir/<granule>.png without a display.
+    The arrays are block-reduced while being read, chunk by chunk, to about the output
+    resolution, so neither memory nor imshow ever sees the full scene. Both panels share one
+    colorbar with the fixed VMIN..VMAX scale. Returns (png path, reduction factor).
+    """
+    nc = Dataset(file_path, 'r')
+    try:
+        shape = (nc.dimensions["downtrack"].size, nc.dimensions["crosstrack"].size)
+        factor = reduction_factor(shape, dpi)
+        groups = read_downsampled(nc, factor, mode)
+    finally:
+        nc.close()
+
+    # Figure + Agg canvas instead of pyplot: no GUI backend and no global state in the workers
+    fig = Figure(figsize=FIGSIZE, dpi=dpi, layout='constrained')
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, 2)
+    extent = (0, shape[1], shape[0], 0)
+    for ax, (label, (band_depth, _)) in zip(axes, (("Group 1", groups["group1"]), ("Group 2", groups["group2"]))):
+        im = plot_heatmap(band_depth, f"{label} Band Depth ({mode} of {factor}x{factor})", ax, extent)
+    fig.colorbar(im, ax=axes, label=COLORBAR_LABEL)
+    fig.suptitle(Path(file_path).stem)
+
+    out_path = Path(out_dir) / f"{Path(file_path).stem}.png"
+    fig.savefig(out_path)
+    return str(out_path), factor
 
-# Create figure
-fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+def render_batch(files, out_dir=QUICKLOOK_DIR, workers=None, dpi=DPI, mode="max"):
+    """Render quick-looks for many granules on a process pool. Returns the PNG paths."""
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    written = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_quicklook, file_path, out_dir, dpi, mode): file_path for file_path in files}
+        for future in as_completed(futures):
+            try:
+                out_path, factor = future.result()
+            except Exception as e:
+                print(f"Error rendering {futures[future]}: {e}")
+                continue
+            written.append(out_path)
+            print(f"[{len(written)}/{len(files)}] {out_path} (reduced {factor}x{factor})")
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(written)}/{len(files)} granules in {elapsed:.2f}s with {workers} workers")
+    return sorted(written)
 
-# Plot Group 1
-plot_heatmap(bd1_masked, "Group 1 Band Depth Heatmap", axes[0])
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plot EMIT band depth heatmaps for groups 1 and 2")
+    parser.add_argument("inputs", nargs="*", help="granule files, directories or glob patterns")
+    parser.add_argument("--batch", action="store_true",
+                        help="render PNG quick-looks headless instead of showing one granule interactively")
+    parser.add_argument("--out-dir", default=QUICKLOOK_DIR, help="where --batch writes the PNGs")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=DPI, help="output resolution; sets how far scenes are reduced")
+    parser.add_argument("--mode", choices=[m for m in DOWNSAMPLE_MODES if m != "stride"], default="max",
+                        help="block reduction for --batch (max keeps isolated strong detections visible)")
+    return parser.parse_args()
 
-# Plot Group 2
-plot_heatmap(bd2_masked, "Group 2 Band Depth Heatmap", axes[1])
+def main():
+    args = parse_args()
+    if args.batch:
+        render_batch(find_granules(args.inputs or [DEFAULT_FILE]), args.out_dir, args.workers, args.dpi, args.mode)
+    else:
+        show_granule(args.inputs[0] if args.inputs else DEFAULT_FILE)
 
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = ".processing_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class ProcessingCache:
+    """
+    Content-addressed cache of per-granule outputs.
+
+    Entries are keyed on the granule's SHA-256 and file name (outputs are named after it) plus
+    the processing parameters, and hold copies of every output file (paths relative to the
+    web root) along with a small record.
+    File hashes are memoized by (size, mtime) so unchanged granules are not re-read.
+    Granules not on disk yet can be keyed on their archive name, size and checksum instead
+    (source_key), so a cached granule need not be downloaded to be found.
+    The cache is bounded to max_bytes by evicting the least recently used entries.
+    Only the parent process should use it; it is not safe for concurrent writers.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self.index = {"hashes": {}, "entries": {}}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring unreadable cache index {self.index_path}: {e}")
+
+    def file_hash(self, path):
+        """SHA-256 of a file, reusing the memoized hash while its size and mtime are unchanged"""
+        stat = os.stat(path)
+        memo_key = str(Path(path).resolve())
+        memo = self.index["hashes"].get(memo_key)
+        if memo and memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+            return memo["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        self.index["hashes"][memo_key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest.hexdigest()
+        }
+        return digest.hexdigest()
+
+    def key(self, path, params):
+        """Cache key for a granule processed with the given parameters"""
+        payload = json.dumps({"sha256": self.file_hash(path), "name": Path(path).name, "params": params},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def source_key(self, entry, params):
+        """
+        Cache key for a granule known only from its archive entry (name, size, checksum), or None
+        if the entry has neither a size nor a checksum to tell versions of the same name apart
+        """
+        if entry.get("size") is None and not entry.get("checksum"):
+            return None
+        source = {k: entry.get(k) for k in ("name", "size", "checksum", "algorithm")}
+        payload = json.dumps({"source": source, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def restore(self, key, out_dir):
+        """
+        Copy a cached entry's outputs into out_dir and return its record, or None on a miss.
+        Files already present with the same size and mtime (copies keep it) are left alone.
+        """
+        entry = self.index["entries"].get(key)
+        if entry is None:
+            return None
+
+        object_dir = self.objects_dir / key
+        out_dir = Path(out_dir)
+        try:
+            for rel in entry["files"]:
+                src, dst = object_dir / rel, out_dir / rel
+                if dst.exists():
+                    src_stat, dst_stat = src.stat(), dst.stat()
+                    if (dst_stat.st_size, dst_stat.st_mtime_ns) == (src_stat.st_size, src_stat.st_mtime_ns):
+                        continue
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+        except OSError as e:
+            print(f"Warning: dropping broken cache entry {key[:12]}: {e}")
+            self._remove(key)
+            return None
+
+        entry["last_used"] = time.time()
+        return entry["record"]
+
+    def store(self, key, out_dir, files, record):
+        """Copy the given output files (relative to out_dir) into the cache under key"""
+        object_dir = self.objects_dir / key
+        if object_dir.exists():
+            shutil.rmtree(object_dir)
+
+        size = 0
+        for rel in files:
+            dst = object_dir / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(Path(out_dir) / rel, dst)
+            size += dst.stat().st_size
+
+        self.index["entries"][key] = {
+            "files": list(files),
+            "bytes": size,
+            "last_used": time.time(),
+            "record": record
+        }
+        self.save()
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.index["entries"].values())
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = self.index["entries"]
+        total = self.total_bytes()
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            self._remove(key)
+
+    def _remove(self, key):
+        self.index["entries"].pop(key, None)
+        shutil.rmtree(self.objects_dir / key, ignore_errors=True)
+
+    def save(self):
+        """Evict down to max_bytes and atomically write the cache index"""
+        self.evict()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,105 @@
+import struct
+import zlib
+import numpy as np
+
+from binary_format import BAND_DEPTH_SCALE, encode_band_depth
+
+# Viridis at 17 evenly spaced stops over the band depth range [0, 0.5], as in the viewer's colorbar
+VIRIDIS = ["#440154", "#48186a", "#472d7b", "#424086", "#3b528b", "#33638d", "#2c728e", "#26828e", "#21918c",
+           "#1fa088", "#28ae80", "#3fbc73", "#5ec962", "#84d44b", "#addc30", "#d8e219", "#fde725"]
+# d3.schemeSet3 + schemeSet2 + schemeSet1, the viewer's categorical mineral colors
+MINERAL_COLORS = ["#8dd3c7", "#ffffb3", "#bebada", "#fb8072", "#80b1d3", "#fdb462", "#b3de69", "#fccde5",
+                  "#d9d9d9", "#bc80bd", "#ccebc5", "#ffed6f", "#66c2a5", "#fc8d62", "#8da0cb", "#e78ac3",
+                  "#a6d854", "#ffd92f", "#e5c494", "#b3b3b3", "#e41a1c", "#377eb8", "#4daf4a", "#984ea3",
+                  "#ff7f00", "#ffff33", "#a65628", "#f781bf", "#999999"]
+PNG_COMPRESSION = 6
+
+
+def _hex_to_rgb(colors):
+    return np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=np.float64)
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_indexed_png(indices, palette, transparent=(0,)):
+    """
+    Encode a 2D uint8 array of palette indices as an 8-bit indexed PNG.
+    palette is an (N, 3) array of RGB bytes; the listed indices are fully transparent.
+    """
+    indices = np.ascontiguousarray(indices, dtype=np.uint8)
+    rows, cols = indices.shape
+    palette = np.asarray(palette, dtype=np.uint8)
+    alpha = np.full(len(palette), 255, dtype=np.uint8)
+    alpha[list(transparent)] = 0
+
+    # Every scanline uses filter type 0 (None)
+    scanlines = np.zeros((rows, cols + 1), dtype=np.uint8)
+    scanlines[:, 1:] = indices
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _chunk(b"IHDR", struct.pack(">IIBBBBB", cols, rows, 8, 3, 0, 0, 0)),
+        _chunk(b"PLTE", palette.tobytes()),
+        _chunk(b"tRNS", alpha[:max(transparent) + 1].tobytes()),
+        _chunk(b"IDAT", zlib.compress(scanlines.tobytes(), PNG_COMPRESSION)),
+        _chunk(b"IEND", b"")
+    ])
+
+
+def band_depth_palette():
+    """
+    256-entry palette for uint8 band depth codes (code * BAND_DEPTH_SCALE): index 0 is
+    transparent (no detection), codes 1..255 follow viridis over [0, 0.5].
+    """
+    anchors = _hex_to_rgb(VIRIDIS)
+    stops = np.linspace(0, 1, len(VIRIDIS))
+    t = np.arange(256) * BAND_DEPTH_SCALE / 0.5
+    palette = np.stack([np.interp(t, stops, anchors[:, i]) for i in range(3)], axis=1)
+    return np.rint(palette).astype(np.uint8)
+
+
+def band_depth_indices(band_depth, mineral_id):
+    """Palette indices for band depth: detected pixels get codes >= 1, everything else 0"""
+    codes = encode_band_depth(band_depth, "uint8")[0]
+    detected = (mineral_id > 0) & np.isfinite(band_depth)
+    return np.where(detected, np.maximum(codes, 1), 0).astype(np.uint8)
+
+
+def mineral_colors(minerals):
+    """Color per mineral ID: the viewer's categorical colors assigned in ascending ID order"""
+    return {int(m): MINERAL_COLORS[i % len(MINERAL_COLORS)] for i, m in enumerate(sorted(minerals))}
+
+
+def mineral_palette():
+    """Palette for mineral indices: 0 transparent, then the categorical colors"""
+    return np.vstack([[0, 0, 0], _hex_to_rgb(MINERAL_COLORS)]).astype(np.uint8)
+
+
+def mineral_indices(mineral_id, minerals):
+    """
+    Palette indices for mineral IDs, given the sorted IDs that make up the color assignment.
+    Colors cycle, so any number of minerals fits the 8-bit palette.
+    """
+    minerals = np.asarray(sorted(minerals), dtype=np.int64)
+    if minerals.size == 0:
+        return np.zeros(mineral_id.shape, dtype=np.uint8)
+    rank = np.searchsorted(minerals, mineral_id)
+    return np.where(mineral_id > 0, 1 + rank % len(MINERAL_COLORS), 0).astype(np.uint8)
+
+
+def write_group_rasters(out_dir, prefix, band_depth, mineral_id, minerals):
+    """
+    Write <prefix>_band_depth.png and <prefix>_mineral_id.png for one group under out_dir.
+    minerals are the group's detected IDs for the whole granule, so colors stay the same
+    across every raster of it. Returns the file names.
+    """
+    files = {
+        "band_depth": f"{prefix}_band_depth.png",
+        "mineral_id": f"{prefix}_mineral_id.png"
+    }
+    with open(out_dir / files["band_depth"], "wb") as f:
+        f.write(encode_indexed_png(band_depth_indices(band_depth, mineral_id), band_depth_palette()))
+    with open(out_dir / files["mineral_id"], "wb") as f:
+        f.write(encode_indexed_png(mineral_indices(mineral_id, minerals), mineral_palette()))
+    return files
@@ -0,0 +1,175 @@
+import json
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+
+from array_store import ARRAY_DIR, META_FILE, ArrayStore
+from binary_format import BAND_DEPTH_ENCODINGS, encode_band_depth, encode_mineral_id, pack_arrays
+from downsample import block_mean, block_mode
+from tiles import _band_depth_list
+
+GROUPS = ("group1", "group2")
+FORMATS = ("json", "binary")
+DEFAULT_CACHE_BYTES = 256 * 1024 ** 2
+# Largest region (after reduction) a single request may return
+MAX_REGION_CELLS = 2048 * 2048
+
+
+class RegionError(ValueError):
+    """Invalid region request; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the total size of its values in bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def drop(self, predicate):
+        """Remove every entry whose key matches predicate"""
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                self.bytes -= self.entries.pop(key)[1]
+
+
+def store_version(path):
+    """
+    Identity of the store currently at path: meta.json is replaced last whenever a store is
+    rewritten, so its inode, mtime and size change with every rewrite. None if there is no store.
+    """
+    try:
+        stat = (Path(path) / META_FILE).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_region(store, group, x0, y0, x1, y1, res=1):
+    """
+    Cut a window [y0:y1, x0:x1] (downtrack rows, crosstrack columns) of one group from an
+    array store, reduced by res with the same block mean / majority ID as the tile pyramid.
+    Only the window is read from the memory-mapped arrays.
+    Returns (band_depth, mineral_id).
+    """
+    bd = store[f"{group}_band_depth"][y0:y1, x0:x1]
+    gid = store[f"{group}_mineral_id"][y0:y1, x0:x1]
+    return block_mean(bd, gid, res), block_mode(np.asarray(gid), res)
+
+
+class RegionService:
+    """
+    Answers region queries against the array stores under <root>/ARRAY_DIR.
+    Stores are opened once (memory maps, cheap) and encoded responses are kept in an LRU cache,
+    so a request only touches the one granule it names and repeated windows are free.
+    Both are keyed on the store's version: when data_processor or ingest rewrites a store, the
+    next request reopens it and drops the granule's cached windows instead of serving old data.
+    """
+
+    def __init__(self, root=".", cache_bytes=DEFAULT_CACHE_BYTES):
+        self.array_dir = Path(root) / ARRAY_DIR
+        self.cache = LRUCache(cache_bytes)
+        self.stores = {}
+        self.lock = threading.Lock()
+
+    def granules(self):
+        """Granules with an array store, with their shape and array names"""
+        if not self.array_dir.is_dir():
+            return []
+        granules = []
+        for name in sorted(p.parent.name for p in self.array_dir.glob(f"*/{META_FILE}")):
+            store = self.store(name)
+            granules.append({"granule": name, "shape": list(store.shape), "arrays": store.names})
+        return granules
+
+    def store(self, granule):
+        return self._open(granule)[1]
+
+    def _open(self, granule):
+        """(version, ArrayStore) of a granule, reopened if the store changed since it was last opened"""
+        if not granule or Path(granule).name != granule or granule.startswith("."):
+            raise RegionError(f"Invalid granule name: {granule!r}")
+        path = self.array_dir / granule
+        version = store_version(path)
+        with self.lock:
+            opened = self.stores.get(granule)
+            if opened is not None and opened[0] == version:
+                return opened
+            self.stores.pop(granule, None)
+            self.cache.drop(lambda key: key[0] == granule)
+            if version is None:
+                raise RegionError(f"Unknown granule: {granule}", status=404)
+            opened = self.stores[granule] = (version, ArrayStore(path))
+            return opened
+
+    def region(self, granule, group, x0, y0, x1, y1, res=1, fmt="json", band_depth_encoding="uint8"):
+        """
+        Encoded region response: (body bytes, content type, manifest or None).
+        Binary bodies are pack_arrays buffers described by the returned manifest.
+        """
+        if group not in GROUPS:
+            raise RegionError(f"group must be one of {', '.join(GROUPS)}")
+        if fmt not in FORMATS:
+            raise RegionError(f"format must be one of {', '.join(FORMATS)}")
+        if band_depth_encoding not in BAND_DEPTH_ENCODINGS:
+            raise RegionError(f"encoding must be one of {', '.join(BAND_DEPTH_ENCODINGS)}")
+        version, store = self._open(granule)
+
+        # Clamp the window to the scene
+        rows, cols = store.shape
+        x0, x1 = max(0, x0), min(cols, x1)
+        y0, y1 = max(0, y0), min(rows, y1)
+        if x1 <= x0 or y1 <= y0:
+            raise RegionError("Empty window")
+        if res < 1:
+            raise RegionError("res must be >= 1")
+        if -(-(x1 - x0) // res) * -(-(y1 - y0) // res) > MAX_REGION_CELLS:
+            raise RegionError(f"Region too large; increase res (max {MAX_REGION_CELLS} cells)")
+
+        key = (granule, version, group, x0, y0, x1, y1, res, fmt, band_depth_encoding)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        bd, gid = read_region(store, group, x0, y0, x1, y1, res)
+        window = {"granule": granule, "group": group, "window": [x0, y0, x1, y1], "res": res,
+                  "shape": list(bd.shape)}
+        if fmt == "binary":
+            body, manifest = pack_arrays({
+                "band_depth": encode_band_depth(bd, band_depth_encoding),
+                "mineral_id": encode_mineral_id(gid)
+            })
+            response = (body, "application/octet-stream", dict(window, arrays=manifest))
+        else:
+            window.update(band_depth=_band_depth_list(bd), mineral_id=gid.astype(int).tolist())
+            response = (json.dumps(window).encode(), "application/json", None)
+
+        self.cache.put(key, response, len(response[0]))
+        return response
@@ -1,40 +1,343 @@
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
-import webbrowser
+import json
 import os
+import re
+import threading
+import urllib.parse
+import webbrowser
+from functools import partial
 from pathlib import Path
 
-# Change to the directory containing the web files
-os.chdir(Path(__file__).parent)
+from region_api import DEFAULT_CACHE_BYTES, RegionError, RegionService
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 PORT = 8000
+COPY_BUFFER_SIZE = 64 * 1024
+COMPRESSIBLE_SUFFIXES = {".json", ".js", ".css", ".html", ".svg", ".txt", ".bin"}
+# Precompressed sidecars, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+
+def file_etag(path, stat):
+    """Strong ETag from the file content, cached while size and mtime are unchanged"""
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+    if etag is None:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BUFFER_SIZE * 16), b""):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()}"'
+        with _etag_lock:
+            _etag_cache[key] = etag
+    return etag
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (q > 0) from an Accept-Encoding header"""
+    accepted = set()
+    for part in (header or "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(fields[0].lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range. Returns (start, end) inclusive, "unsatisfiable",
+    or None when the header is not a single range we understand (serve the full body).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, end
+
+
+def precompress(root):
+    """Write .gz (and .br when brotli is installed) sidecars next to compressible files under root"""
+    written = 0
+    for path in Path(root).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        mtime = path.stat().st_mtime
+        for encoding, suffix in ENCODINGS:
+            sidecar = path.with_name(path.name + suffix)
+            if sidecar.exists() and sidecar.stat().st_mtime >= mtime:
+                continue
+            if encoding == "br":
+                if brotli is None:
+                    continue
+                data = brotli.compress(path.read_bytes())
+            else:
+                data = gzip.compress(path.read_bytes(), compresslevel=9, mtime=0)
+            sidecar.write_bytes(data)
+            written += 1
+    return written
+
 
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Static file handler with precompressed sidecars (.br/.gz), strong ETags,
+    304 revalidation (If-None-Match / If-Modified-Since) and single byte ranges.
+    Requests under /api/ are answered by the region service:
+      /api/granules
+      /api/region?granule=&group=&x0=&y0=&x1=&y1=&res=&format=json|binary&encoding=uint8|float16
+    Binary regions are pack_arrays buffers described by the JSON in the X-Region header.
+    """
+
+    region_service = None
+
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Range, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Range, Content-Length, ETag, X-Region')
         super().end_headers()
 
-print("Starting EMIT Data Visualization Server...")
-print(f"Server will run on http://localhost:{PORT}")
-print("Press Ctrl+C to stop the server")
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path.startswith("/api/"):
+            self.handle_api()
+        else:
+            super().do_GET()
 
-try:
-    with socketserver.TCPServer(("", PORT), MyHTTPRequestHandler) as httpd:
-        print(f"Server started successfully!")
-        print(f"Open your browser and navigate to: http://localhost:{PORT}")
-        
-        # Try to open the browser automatically
+    def handle_api(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        header = None
+        try:
+            if self.region_service is None:
+                raise RegionError("Region API is disabled", status=404)
+            if url.path == "/api/granules":
+                body, content_type = json.dumps(self.region_service.granules()).encode(), "application/json"
+            elif url.path == "/api/region":
+                window = [int(query[k]) for k in ("x0", "y0", "x1", "y1")]
+                body, content_type, header = self.region_service.region(
+                    query.get("granule"), query.get("group", "group1"), *window,
+                    res=int(query.get("res", 1)), fmt=query.get("format", "json"),
+                    band_depth_encoding=query.get("encoding", "uint8"))
+            else:
+                raise RegionError(f"Unknown endpoint: {url.path}", status=404)
+        except RegionError as e:
+            return self.send_json_error(e.status, str(e))
+        except KeyError as e:
+            return self.send_json_error(400, f"Missing parameter: {e.args[0]}")
+        except ValueError as e:
+            return self.send_json_error(400, f"Invalid parameter: {e}")
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if header is not None:
+            self.send_header("X-Region", json.dumps(header, separators=(",", ":")))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json_error(self, status, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def choose_representation(self, path, stat):
+        """Pick the best precompressed sidecar the client accepts, or the file itself"""
+        if Path(path).suffix not in COMPRESSIBLE_SUFFIXES or "Range" in self.headers:
+            return None, path
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        for encoding, suffix in ENCODINGS:
+            sidecar = path + suffix
+            if encoding in accepted and os.path.isfile(sidecar) and os.stat(sidecar).st_mtime >= stat.st_mtime:
+                return encoding, sidecar
+        return None, path
+
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def range_allowed(self, etag, mtime):
+        """If-Range: only honour the range when the validator still matches"""
+        if_range = self.headers.get("If-Range")
+        if not if_range:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
         try:
-            webbrowser.open(f'http://localhost:{PORT}')
-        except:
-            print("Could not open browser automatically. Please open manually.")
-        
-        httpd.serve_forever()
-        
-except KeyboardInterrupt:
-    print("\nServer stopped by user")
-except Exception as e:
-    print(f"Error starting server: {e}")
-    print("Make sure port 8000 is not already in use")
\ No newline at end of file
+            return int(mtime) <= email.utils.parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not urllib.parse.urlsplit(self.path).path.endswith("/") or not os.path.isfile(index):
+                # directory redirects and listings
+                return super().send_head()
+            path = index
+        if not os.path.isfile(path):
+            return super().send_head()
+
+        stat = os.stat(path)
+        encoding, served_path = self.choose_representation(path, stat)
+        served_stat = os.stat(served_path)
+        etag = file_etag(served_path, served_stat)
+        size = served_stat.st_size
+
+        def send_validators():
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Accept-Ranges", "bytes")
+            if Path(path).suffix in COMPRESSIBLE_SUFFIXES:
+                self.send_header("Vary", "Accept-Encoding")
+
+        if self.is_not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            send_validators()
+            self.end_headers()
+            return None
+
+        start, end = 0, size - 1
+        byte_range = None
+        if "Range" in self.headers and self.range_allowed(etag, stat.st_mtime):
+            byte_range = parse_range(self.headers["Range"], size)
+            if byte_range == "unsatisfiable":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+
+        f = open(served_path, "rb")
+        if byte_range:
+            start, end = byte_range
+            f.seek(start)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        send_validators()
+        self.end_headers()
+        self.remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        # Only send the selected byte range
+        remaining = getattr(self, "remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            block = source.read(min(COPY_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            outputfile.write(block)
+            remaining -= len(block)
+        self.remaining = None
+
+
+class ThreadingServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the EMIT visualization and its data")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--bind", default="", help="address to bind (default: all interfaces)")
+    parser.add_argument("--directory", default=str(Path(__file__).parent), help="web root to serve")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz/.br sidecars for compressible files before serving")
+    parser.add_argument("--region-cache", type=float, default=DEFAULT_CACHE_BYTES / 1024 ** 2,
+                        help="memory for cached region API responses, in MB")
+    parser.add_argument("--no-api", action="store_true", help="serve static files only")
+    parser.add_argument("--no-browser", action="store_true", help="don't open a browser tab")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.precompress:
+        print(f"Precompressed {precompress(args.directory)} files")
+
+    print("Starting EMIT Data Visualization Server...")
+    print(f"Server will run on http://localhost:{args.port}")
+    print("Press Ctrl+C to stop the server")
+
+    if not args.no_api:
+        MyHTTPRequestHandler.region_service = RegionService(args.directory, int(args.region_cache * 1024 ** 2))
+
+    handler = partial(MyHTTPRequestHandler, directory=args.directory)
+    try:
+        with ThreadingServer((args.bind, args.port), handler) as httpd:
+            print(f"Server started successfully!")
+            print(f"Open your browser and navigate to: http://localhost:{args.port}")
+
+            # Try to open the browser automatically
+            if not args.no_browser:
+                try:
+                    webbrowser.open(f'http://localhost:{args.port}')
+                except:
+                    print("Could not open browser automatically. Please open manually.")
+
+            httpd.serve_forever()
+
+    except KeyboardInterrupt:
+        print("\nServer stopped by user")
+    except Exception as e:
+        print(f"Error starting server: {e}")
+        print(f"Make sure port {args.port} is not already in use")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import numpy as np
+from datetime import datetime, timedelta
+from pathlib import Path
+from netCDF4 import Dataset
+
+# Shape of a real EMIT L2B MIN granule
+DOWNTRACK = 1280
+CROSSTRACK = 1242
+PIXEL_DEG = 0.000542232520256367
+# Along-track spacing of consecutive scenes, with some overlap as in real orbits
+SCENE_STEP_ROWS = 1100
+SCENE_SECONDS = 12
+N_MINERALS = 294
+GROUP1_MAX_ID = 95
+NAME_LENGTH = 80
+# Cycled through the synthetic library so name lookups such as "Hematite" find something
+MINERALS = ["Hematite", "Goethite", "Calcite", "Dolomite", "Kaolinite", "Montmorillonite", "Illite", "Gypsum",
+            "Chlorite", "Muscovite", "Jarosite", "Alunite", "Epidote", "Vermiculite", "Pyrophyllite", "Nontronite"]
+
+
+def _blocky_ids(rng, shape, lo, hi, block=16, fraction=0.6):
+    """Mineral IDs in [lo, hi) constant over block x block patches, with 1 - fraction of pixels unmatched (0)"""
+    small = rng.integers(lo, hi, size=(shape[0] // block + 1, shape[1] // block + 1))
+    ids = np.kron(small, np.ones((block, block), dtype=small.dtype))[:shape[0], :shape[1]]
+    return np.where(rng.random(shape) < fraction, ids, 0).astype(np.int16)
+
+
+def make_granule(path, downtrack=DOWNTRACK, crosstrack=CROSSTRACK, seed=0, lat0=39.3, lon0=63.2,
+                 time_start="2025-10-02T06:48:04+0000", heading=12.0, edge=8):
+    """
+    Write an EMIT-shaped L2B MIN granule: both groups' band depth (1/510 steps) and mineral ID
+    (fill -9999 on the swath edges) as compressed variables, the mineral_metadata table,
+    the location group (lat/lon per pixel and a GLT onto the ortho grid) and the global
+    attributes the pipeline reads. The swath is rotated by heading degrees, like a real orbit.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (downtrack, crosstrack)
+    rows, cols = np.mgrid[0:downtrack, 0:crosstrack]
+    angle = np.deg2rad(heading)
+    shift = (downtrack - 1) * np.sin(angle)
+    lon = lon0 + (cols * np.cos(angle) - rows * np.sin(angle) + shift) * PIXEL_DEG
+    lat = lat0 + (cols * np.sin(angle) + rows * np.cos(angle)) * PIXEL_DEG
+
+    gid1 = _blocky_ids(rng, shape, 1, GROUP1_MAX_ID + 1)
+    gid2 = _blocky_ids(rng, shape, GROUP1_MAX_ID + 1, N_MINERALS + 1)
+    bd1 = np.where(gid1 > 0, rng.integers(1, 256, shape) / 510.0, 0).astype(np.float32)
+    bd2 = np.where(gid2 > 0, rng.integers(1, 256, shape) / 510.0, 0).astype(np.float32)
+    for arr in (gid1, gid2, bd1, bd2):
+        arr[:, :edge] = -9999
+        arr[:, crosstrack - edge:] = -9999
+
+    # GLT: ortho cell centers mapped back through the rotation to the nearest sensor pixel (1-based, 0 = none)
+    west, east, south, north = lon.min(), lon.max(), lat.min(), lat.max()
+    ny = int(np.ceil((north - south) / PIXEL_DEG)) + 1
+    nx = int(np.ceil((east - west) / PIXEL_DEG)) + 1
+    oy, ox = np.mgrid[0:ny, 0:nx]
+    dx = (west + (ox + 0.5) * PIXEL_DEG - lon0) / PIXEL_DEG - shift
+    dy = (north - (oy + 0.5) * PIXEL_DEG - lat0) / PIXEL_DEG
+    c = np.rint(dx * np.cos(angle) + dy * np.sin(angle)).astype(np.int32)
+    r = np.rint(-dx * np.sin(angle) + dy * np.cos(angle)).astype(np.int32)
+    inside = (c >= 0) & (c < crosstrack) & (r >= 0) & (r < downtrack)
+
+    nc = Dataset(path, "w")
+    try:
+        nc.createDimension("downtrack", downtrack)
+        nc.createDimension("crosstrack", crosstrack)
+        for name, arr, dtype in (("group_1_band_depth", bd1, "f4"), ("group_1_mineral_id", gid1, "i2"),
+                                 ("group_2_band_depth", bd2, "f4"), ("group_2_mineral_id", gid2, "i2")):
+            var = nc.createVariable(name, dtype, ("downtrack", "crosstrack"), fill_value=-9999, zlib=True, complevel=4)
+            var[:] = arr
+
+        nc.time_coverage_start = time_start
+        nc.time_coverage_end = time_start
+        nc.northernmost_latitude = float(north)
+        nc.southernmost_latitude = float(south)
+        nc.easternmost_longitude = float(east)
+        nc.westernmost_longitude = float(west)
+        nc.geotransform = np.array([west, PIXEL_DEG, 0.0, north, 0.0, -PIXEL_DEG])
+        nc.product_version = "V001"
+        nc.spectral_library = "synthetic"
+
+        mm = nc.createGroup("mineral_metadata")
+        mm.createDimension("mineral_items", N_MINERALS)
+        mm.createDimension("name_length", NAME_LENGTH)
+        ids = np.arange(1, N_MINERALS + 1)
+        mm.createVariable("index", "u2", ("mineral_items",))[:] = ids
+        mm.createVariable("group", "u1", ("mineral_items",))[:] = np.where(ids <= GROUP1_MAX_ID, 1, 2)
+        mm.createVariable("record", "i4", ("mineral_items",))[:] = 1000 + ids
+        names = [f"{MINERALS[(i - 1) % len(MINERALS)]}_ SYN{i:03d} synthetic" for i in ids]
+        chars = np.zeros((N_MINERALS, NAME_LENGTH), dtype="S1")
+        for i, name in enumerate(names):
+            encoded = np.frombuffer(name.encode(), dtype="S1")
+            chars[i, :len(encoded)] = encoded
+        mm.createVariable("name", "S1", ("mineral_items", "name_length"))[:] = chars
+
+        location = nc.createGroup("location")
+        location.createDimension("ortho_y", ny)
+        location.createDimension("ortho_x", nx)
+        for name, arr in (("lat", lat), ("lon", lon)):
+            location.createVariable(name, "f8", ("downtrack", "crosstrack"), zlib=True)[:] = arr
+        for name, arr in (("glt_x", np.where(inside, c + 1, 0)), ("glt_y", np.where(inside, r + 1, 0))):
+            location.createVariable(name, "i4", ("ortho_y", "ortho_x"), zlib=True)[:] = arr.astype(np.int32)
+    finally:
+        nc.close()
+    return path
+
+
+def make_scene(out_dir, count, downtrack=DOWNTRACK, crosstrack=CROSSTRACK, seed=0,
+               start="2025-10-02T06:48:04", orbit=2527504):
+    """
+    Write count consecutive granules along one orbit track, named like real EMIT L2B MIN files
+    and overlapping the way neighbouring scenes do. Returns the file paths.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    t0 = datetime.fromisoformat(start)
+    step = SCENE_STEP_ROWS * downtrack / DOWNTRACK * PIXEL_DEG
+    paths = []
+    for i in range(count):
+        t = t0 + timedelta(seconds=SCENE_SECONDS * i)
+        path = out_dir / f"EMIT_L2B_MIN_001_{t:%Y%m%dT%H%M%S}_{orbit}_{i + 1:03d}.nc"
+        make_granule(path, downtrack, crosstrack, seed=seed + i, lat0=39.3 + i * step, lon0=63.2 - i * step * 0.2,
+                     time_start=f"{t:%Y-%m-%dT%H:%M:%S}+0000")
+        paths.append(str(path))
+    return paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic EMIT L2B MIN granules for testing and benchmarks")
+    parser.add_argument("--out-dir", default="synthetic_data", help="where to write the granules")
+    parser.add_argument("--count", type=int, default=2, help="number of consecutive granules")
+    parser.add_argument("--downtrack", type=int, default=DOWNTRACK)
+    parser.add_argument("--crosstrack", type=int, default=CROSSTRACK)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for path in make_scene(args.out_dir, args.count, args.downtrack, args.crosstrack, args.seed):
+        print(f"Wrote {path} ({Path(path).stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
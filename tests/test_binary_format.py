@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from binary_format import BAND_DEPTH_SCALE, encode_visualization_arrays, read_binary_arrays, write_binary_arrays
+from tiles import write_tile_pyramid
+
+
+def _groups(rng, shape):
+    groups = {}
+    for name, lo, hi in (("group1", 1, 96), ("group2", 96, 295)):
+        ids = np.where(rng.random(shape) < 0.5, rng.integers(lo, hi, shape), 0)
+        bd = np.where(ids > 0, rng.integers(1, 256, shape) * BAND_DEPTH_SCALE, np.nan).astype(np.float32)
+        groups[name] = (bd, ids.astype(np.float32))
+    return groups
+
+
+@pytest.mark.parametrize("encoding", ["uint8", "float16"])
+def test_arrays_round_trip(tmp_path, encoding):
+    groups = _groups(np.random.default_rng(0), (37, 29))
+    manifest = write_binary_arrays(tmp_path / "data.bin", encode_visualization_arrays(groups, encoding))
+    assert all(info["offset"] % 8 == 0 for info in manifest.values())
+    arrays = read_binary_arrays(tmp_path / "data.bin", manifest)
+
+    for name, (bd, ids) in groups.items():
+        np.testing.assert_array_equal(arrays[f"{name}_mineral_id"], ids)
+        detected = ids > 0
+        tolerance = 1e-6 if encoding == "uint8" else 1e-3
+        np.testing.assert_allclose(arrays[f"{name}_band_depth"][detected], bd[detected], atol=tolerance)
+    assert arrays["group1_mineral_id"].dtype == np.uint8
+    assert arrays["group2_mineral_id"].dtype == np.uint16
+
+
+def test_binary_tiles_round_trip(tmp_path):
+    groups = _groups(np.random.default_rng(1), (300, 200))
+    groups = {name: (bd, ids.astype(np.uint16)) for name, (bd, ids) in groups.items()}
+    manifest = write_tile_pyramid(tmp_path, groups, tile_size=128, tile_format="binary", rasters=False)
+    native = manifest["levels"][-1]
+    assert native["factor"] == 1
+
+    for x, y in native["tiles"]:
+        tile = read_binary_arrays(tmp_path / str(native["z"]) / f"{x}_{y}.bin", manifest["tile_arrays"])
+        rows, cols = slice(y * 128, (y + 1) * 128), slice(x * 128, (x + 1) * 128)
+        for name, (bd, ids) in groups.items():
+            part_ids, part_bd = ids[rows, cols], bd[rows, cols]
+            h, w = part_ids.shape
+            np.testing.assert_array_equal(tile[f"{name}_mineral_id"][:h, :w], part_ids)
+            assert not tile[f"{name}_mineral_id"][h:, :].any() and not tile[f"{name}_mineral_id"][:, w:].any()
+            detected = part_ids > 0
+            np.testing.assert_allclose(tile[f"{name}_band_depth"][:h, :w][detected], part_bd[detected], atol=1e-6)
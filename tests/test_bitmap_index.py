@@ -0,0 +1,67 @@
+import sys
+
+import numpy as np
+import pytest
+
+import bitmap_index
+from bitmap_index import GranuleBitmaps, build_bitmaps, query
+from ingest import ingest_granule
+from synthetic_emit import make_granule
+
+
+def test_band_depth_threshold_is_strict(tmp_path):
+    rng = np.random.default_rng(0)
+    shape = (40, 30)
+    # EMIT band depths are multiples of 1/510; 153/510 sits exactly on the 0.3 threshold
+    band_depth = (rng.integers(0, 256, shape) / 510).astype(np.float32)
+    band_depth[0, :5] = np.float32(153 / 510)
+    band_depth[1, :5] = np.float32(154 / 510)
+    band_depth[2, :3] = np.nan
+    mineral_id = rng.integers(0, 5, shape).astype(np.float32)
+    groups = {"group1": (band_depth, mineral_id), "group2": (band_depth[::-1].copy(), mineral_id)}
+    build_bitmaps(tmp_path, groups, shape, {"filename": "scene.nc"})
+    index = GranuleBitmaps(tmp_path)
+
+    for threshold in (0.0, 0.1, 0.3, 0.45):
+        expected = band_depth > threshold
+        mask = index.band_depth("group1", threshold).to_mask()
+        np.testing.assert_array_equal(mask, expected)
+    assert not index.band_depth("group1", 0.3).to_mask()[0, :5].any()
+    assert index.band_depth("group1", 0.3).to_mask()[1, :5].all()
+
+    np.testing.assert_array_equal(index.band_depth("group1", 0.1, 0.3).to_mask(),
+                                  (band_depth > 0.1) & (band_depth <= 0.3))
+    [result] = query([index], {"group1": [2]}, {"group1": 0.3})
+    assert result["pixels"] == int(((band_depth > 0.3) & (mineral_id == 2)).sum())
+
+
+def test_valid_pixels_follow_the_queried_groups(tmp_path):
+    shape = (10, 10)
+    ids = np.ones(shape, dtype=np.float32)
+    bd1 = np.full(shape, 0.4, dtype=np.float32)
+    bd2 = bd1.copy()
+    bd2[:4] = np.nan
+    build_bitmaps(tmp_path, {"group1": (bd1, ids), "group2": (bd2, ids)}, shape, {"filename": "scene.nc"})
+    index = GranuleBitmaps(tmp_path)
+
+    assert query([index], min_band_depth={"group2": 0.1})[0]["valid_pixels"] == 60
+    assert query([index], min_band_depth={"group1": 0.1})[0]["valid_pixels"] == 100
+    both = {"group1": 0.1, "group2": 0.1}
+    assert query([index], min_band_depth=both)[0]["valid_pixels"] == 60
+    assert query([index], min_band_depth=both, combine="or")[0]["valid_pixels"] == 100
+
+
+@pytest.mark.parametrize("as_store", [False, True])
+def test_build_skips_current_indexes_unless_forced(tmp_path, monkeypatch, capsys, as_store):
+    granule = make_granule(tmp_path / "EMIT_L2B_MIN_001_20251002T064804_2527504_001.nc", 40, 30)
+    item = ingest_granule(granule, tmp_path / "arrays") if as_store else granule
+
+    def build(*flags):
+        monkeypatch.setattr(sys, "argv", ["bitmap_index.py", "--bitmap-dir", str(tmp_path / "bitmaps"),
+                                          "build", str(item), *flags])
+        bitmap_index.main()
+        return capsys.readouterr().out
+
+    assert "Indexed" in build()
+    assert "already indexed" in build()
+    assert "Indexed" in build("--force")
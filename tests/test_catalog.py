@@ -0,0 +1,13 @@
+from catalog import GranuleCatalog, catalog_granule
+from synthetic_emit import make_scene
+
+
+def test_bare_end_date_includes_the_whole_day(tmp_path):
+    with GranuleCatalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        for path in make_scene(tmp_path / "granules", 2, downtrack=60, crosstrack=50):
+            catalog_granule(path, catalog)
+
+        assert len(catalog.search(start="2025-10-02", end="2025-10-02")) == 2
+        assert len(catalog.search(end="2025-10-01")) == 0
+        assert len(catalog.search(end="2025-10-02T06:48:10+00:00")) == 1
+        assert len(catalog.search(start="2025-10-03")) == 0
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from change_detection import ChangeDetector, update_changes
+from synthetic_emit import make_granule
+
+BOX = (63.2, 39.3, 63.3, 39.36)
+# Highest group 1 mineral ID per pass: the last pass loses IDs above anything it detects
+ID_RANGES = (30, 94, 12)
+
+
+@pytest.fixture
+def passes(tmp_path):
+    paths = []
+    for i, top in enumerate(ID_RANGES):
+        path = tmp_path / "granules" / f"EMIT_L2B_MIN_001_2025{8 + i:02d}01T064804_2527504_001.nc"
+        path.parent.mkdir(exist_ok=True)
+        make_granule(path, 120, 100, seed=i, time_start=f"2025-{8 + i:02d}-01T06:48:04+0000")
+        nc = Dataset(path, "a")
+        try:
+            var = nc.variables["group_1_mineral_id"]
+            ids = np.ma.filled(var[:], -9999)
+            var[:] = np.where(ids > 0, (ids - 1) % top + 1, ids)
+        finally:
+            nc.close()
+        paths.append(str(path))
+    return paths
+
+
+def _state(change_dir):
+    detector = ChangeDetector(change_dir)
+    return detector.meta["passes"], detector.read_changes(*BOX)
+
+
+def test_passes_with_different_mineral_ranges(tmp_path, passes):
+    detector = update_changes(passes, tmp_path / "changes", store_dir=tmp_path / "arrays")
+    recorded = detector.meta["passes"]
+    assert len(recorded) == 3
+    minerals = recorded[2]["groups"]["group1"]["minerals"]
+    assert max(int(i) for i, (pixels, _, _, _) in minerals.items() if pixels) <= ID_RANGES[2]
+    assert any(lost for i, (_, _, _, lost) in minerals.items() if int(i) > ID_RANGES[2])
+    trends = detector.trends()
+    assert sum(entry["lost"] for entry in trends.values()) == sum(
+        counts[3] for p in recorded for counts in p["groups"]["group1"]["minerals"].values())
+
+
+@pytest.mark.parametrize("fail_in", ["commit", "_install_staged"])
+def test_interrupted_pass_is_applied_once(tmp_path, passes, monkeypatch, fail_in):
+    store_dir = tmp_path / "arrays"
+    expected_passes, expected = _state(update_changes(passes, tmp_path / "reference", store_dir=store_dir).dir)
+
+    change_dir = tmp_path / "changes"
+    update_changes(passes[:2], change_dir, store_dir=store_dir)
+    original = getattr(ChangeDetector, fail_in)
+
+    def interrupted(self):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(ChangeDetector, fail_in, interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        ChangeDetector(change_dir).add_granule(passes[2], store_dir)
+    monkeypatch.setattr(ChangeDetector, fail_in, original)
+
+    update_changes(passes, change_dir, store_dir=store_dir)
+    recorded, window = _state(change_dir)
+    assert recorded == expected_passes
+    assert not ChangeDetector(change_dir).meta["staged"]
+    for key in ("last_band_depth", "last_mineral_id", "delta", "change", "observations", "trend_per_year"):
+        np.testing.assert_array_equal(window[key], expected[key])
+    assert window["observations"].max() == 3
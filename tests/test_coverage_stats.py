@@ -0,0 +1,23 @@
+import numpy as np
+
+from band_stats import BandDepthAccumulator
+from coverage_stats import CoverageAccumulator
+
+
+def test_counts_every_detection_and_averages_finite_band_depth():
+    bd = np.array([[0.2, np.nan, 0.4, 0.0], [np.nan, 0.1, np.nan, 0.3]], dtype=np.float32)
+    ids = np.array([[3, 3, 3, 0], [5, 5, 0, np.nan]], dtype=np.float32)
+    coverage = CoverageAccumulator(groups=("group1",))
+    coverage.update({"group1": (bd, ids)})
+    band = BandDepthAccumulator()
+    band.update(bd, ids)
+
+    group = coverage.result()["groups"]["group1"]
+    assert group["detected_pixels"] == band.result()["pixels_with_minerals"] == 5
+    minerals = {m["id"]: m for m in group["minerals"]}
+    assert minerals[3]["pixels"] == 3
+    assert np.isclose(minerals[3]["mean_band_depth"], 0.3)
+    assert np.isclose(minerals[3]["max_band_depth"], 0.4)
+    assert minerals[5]["pixels"] == 2
+    assert np.isclose(minerals[5]["mean_band_depth"], 0.1)
+    assert sum(m["histogram"][k] for m in group["minerals"] for k in range(len(m["histogram"]))) == 3
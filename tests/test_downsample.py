@@ -0,0 +1,73 @@
+import sys
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import data_processor
+import pipeline
+from downsample import block_max, block_mean, block_mode, sparse_encode
+
+
+def _blocks(shape, factor):
+    for r in range(0, shape[0], factor):
+        for c in range(0, shape[1], factor):
+            yield r // factor, c // factor, (slice(r, r + factor), slice(c, c + factor))
+
+
+@pytest.mark.parametrize("factor", [1, 2, 3, 5])
+def test_block_reductions_match_brute_force(factor):
+    rng = np.random.default_rng(factor)
+    shape = (23, 17)
+    # few IDs and many zeros, so blocks have ties and empty blocks
+    ids = np.where(rng.random(shape) < 0.4, rng.integers(1, 4, shape), 0).astype(np.uint16)
+    bd = np.where(ids > 0, rng.integers(1, 256, shape) / 510, np.nan).astype(np.float32)
+    bd[0, 0] = np.nan
+
+    mode, mean, peak = block_mode(ids, factor), block_mean(bd, ids, factor), block_max(bd, ids, factor)
+    assert mode.shape == mean.shape == peak.shape == (-(-shape[0] // factor), -(-shape[1] // factor))
+    for i, j, window in _blocks(shape, factor):
+        counts = Counter(ids[window][ids[window] > 0].tolist())
+        expected = min(counts, key=lambda k: (-counts[k], k)) if counts else 0
+        assert mode[i, j] == expected
+        values = bd[window][(ids[window] > 0) & np.isfinite(bd[window])]
+        if values.size:
+            assert np.isclose(mean[i, j], values.mean()) and peak[i, j] == values.max()
+        else:
+            assert np.isnan(mean[i, j]) and np.isnan(peak[i, j])
+
+
+def _decode_rle(ids):
+    runs = np.array(ids["runs"], dtype=np.int64).reshape(-1, 2)
+    return np.repeat(runs[:, 0], runs[:, 1]).reshape(ids["shape"])
+
+
+@pytest.mark.parametrize("grid", [
+    np.array([[0, 0, 3, 3], [3, 0, 0, 7], [7, 7, 0, 0]]),
+    np.zeros((3, 4), dtype=int),
+    np.full((2, 2), 5),
+    np.zeros((0, 4), dtype=int),
+])
+def test_rle_round_trip(grid):
+    bd = np.where(grid > 0, 0.25, np.nan)
+    band_depth, ids = sparse_encode(bd, grid, "rle")
+    np.testing.assert_array_equal(_decode_rle(ids), grid)
+    runs = np.array(ids["runs"]).reshape(-1, 2)
+    assert (runs[:, 1] > 0).all() and (runs[1:, 0] != runs[:-1, 0]).all()
+    assert band_depth["values"] == [0.25] * int(np.count_nonzero(grid))
+
+    _, coo = sparse_encode(bd, grid, "coo")
+    dense = np.zeros(grid.size, dtype=int)
+    dense[coo["index"]] = coo["values"]
+    np.testing.assert_array_equal(dense.reshape(grid.shape), grid)
+
+
+@pytest.mark.parametrize("module", [data_processor, pipeline])
+def test_sparse_rejected_with_binary_format(monkeypatch, capsys, module):
+    monkeypatch.setattr(sys, "argv", ["prog", "--sparse", "rle", "--format", "binary"])
+    with pytest.raises(SystemExit):
+        module.parse_args()
+    assert "--sparse only applies to --format json" in capsys.readouterr().err
+
+    monkeypatch.setattr(sys, "argv", ["prog", "--sparse", "rle"])
+    assert module.parse_args().sparse == "rle"
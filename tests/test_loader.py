@@ -0,0 +1,89 @@
+import hashlib
+import http.server
+import threading
+from functools import partial
+
+import pytest
+
+from loader import download_file
+from pipeline import ThrottledHandler, serve_local
+
+
+def _entry(path, url):
+    data = path.read_bytes()
+    return {"granule": path.stem, "name": path.name, "url": url, "size": len(data),
+            "checksum": hashlib.md5(data).hexdigest(), "algorithm": "MD5"}
+
+
+class InterruptingHandler(ThrottledHandler):
+    """Cuts the first full download off halfway, then serves normally"""
+    requests = []
+
+    def copyfile(self, source, outputfile):
+        self.requests.append(self.headers.get("Range"))
+        if len(self.requests) == 1:
+            outputfile.write(source.read(self.remaining // 2))
+            self.close_connection = True
+            return
+        super().copyfile(source, outputfile)
+
+
+def test_interrupted_download_resumes_with_range(tmp_path):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    src.mkdir()
+    dest.mkdir()
+    granule = src / "EMIT_L2B_MIN_001_test.nc"
+    granule.write_bytes(bytes(range(256)) * 4000)
+    server, base_url = serve_local(src, handler_class=InterruptingHandler)
+    try:
+        entry = _entry(granule, f"{base_url}/{granule.name}")
+        with pytest.raises(Exception):
+            download_file(entry, dest)
+        part = dest / f"{granule.name}.part"
+        assert 0 < part.stat().st_size < entry["size"]
+
+        record = download_file(entry, dest)
+    finally:
+        server.shutdown()
+    assert InterruptingHandler.requests == [None, f"bytes={entry['size'] // 2}-"]
+    assert (dest / granule.name).read_bytes() == granule.read_bytes()
+    assert record["verified"] and not part.exists()
+
+
+def test_authorization_dropped_on_cross_host_redirect(tmp_path):
+    seen = {}
+
+    class Target(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            seen[self.path] = self.headers.get("Authorization")
+            super().do_GET()
+
+    (tmp_path / "granule.nc").write_bytes(b"data" * 100)
+    target = http.server.ThreadingHTTPServer(("127.0.0.1", 0), partial(Target, directory=str(tmp_path)))
+
+    class Redirect(http.server.BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            seen["origin"] = self.headers.get("Authorization")
+            self.send_response(302)
+            # "localhost" is a different host from 127.0.0.1, as S3 is from the DAAC
+            self.send_header("Location", f"http://localhost:{target.server_address[1]}/granule.nc")
+            self.end_headers()
+
+    origin = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Redirect)
+    for server in (target, origin):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        entry = _entry(tmp_path / "granule.nc", f"http://127.0.0.1:{origin.server_address[1]}/granule.nc")
+        (tmp_path / "dest").mkdir()
+        download_file(entry, tmp_path / "dest", token="secret")
+    finally:
+        target.shutdown()
+        origin.shutdown()
+    assert seen["origin"] == "Bearer secret"
+    assert seen["/granule.nc"] is None
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from mosaic import Mosaic, build_mosaic, read_mosaic_window
+from synthetic_emit import make_scene
+
+BOX = (63.0, 39.2, 63.3, 39.5)
+
+
+@pytest.fixture
+def scene(tmp_path):
+    return make_scene(tmp_path / "granules", 2, downtrack=240, crosstrack=200)
+
+
+def _window(mosaic_dir):
+    return read_mosaic_window(mosaic_dir, *BOX)
+
+
+@pytest.mark.parametrize("fail_in", ["commit", "_install_staged"])
+def test_interrupted_add_recovers(tmp_path, scene, monkeypatch, fail_in):
+    store_dir = tmp_path / "arrays"
+    expected = _window(build_mosaic(scene, tmp_path / "reference", store_dir=store_dir).dir)
+
+    mosaic_dir = tmp_path / "mosaic"
+    build_mosaic(scene[:1], mosaic_dir, store_dir=store_dir)
+    original = getattr(Mosaic, fail_in)
+
+    def interrupted(self):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(Mosaic, fail_in, interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        Mosaic(mosaic_dir).add_granule(scene[1], store_dir)
+    monkeypatch.setattr(Mosaic, fail_in, original)
+
+    # Rerunning finishes (or redoes) the interrupted add exactly once
+    mosaic = build_mosaic(scene, mosaic_dir, store_dir=store_dir)
+    assert [g["filename"] for g in mosaic.meta["granules"]] == [g["filename"] for g in Mosaic(tmp_path / "reference").meta["granules"]]
+    assert not mosaic.meta["staged"]
+    window = _window(mosaic_dir)
+    for key in ("band_depth", "mineral_id", "source"):
+        np.testing.assert_array_equal(window[key], expected[key])
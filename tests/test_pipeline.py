@@ -0,0 +1,40 @@
+import json
+
+from pipeline import ThrottledHandler, local_umms, run_pipeline, serve_local
+from processing_cache import ProcessingCache
+from synthetic_emit import make_scene
+
+
+class CountingHandler(ThrottledHandler):
+    requests = []
+
+    def copyfile(self, source, outputfile):
+        self.requests.append(self.path)
+        super().copyfile(source, outputfile)
+
+
+def test_cached_granules_are_not_downloaded_again(tmp_path):
+    scene = make_scene(tmp_path / "granules", 3, downtrack=120, crosstrack=100)
+    server, base_url = serve_local(tmp_path / "granules", handler_class=CountingHandler)
+    try:
+        umms = local_umms(tmp_path / "granules", base_url)
+        options = dict(write_tiles=False, sparse="coo", array_store=True)
+
+        def run():
+            cache = ProcessingCache(tmp_path / "cache")
+            return run_pipeline(umms, tmp_path / "dl", tmp_path / "web", workers=2, delete_after=True,
+                                cache=cache, mineral_index=tmp_path / "minerals.sqlite", **options)
+
+        first = run()
+        assert len(CountingHandler.requests) == len(scene)
+        assert not list((tmp_path / "dl").glob("*.nc"))
+        data = json.loads((tmp_path / "web" / "web_data.json").read_text())
+
+        second = run()
+        assert len(CountingHandler.requests) == len(scene)
+        assert [r["outputs"] for r in second] == [r["outputs"] for r in first]
+        rerun = json.loads((tmp_path / "web" / "web_data.json").read_text())
+        assert rerun["datasets"] == data["datasets"]
+        assert rerun["mineral_mapping"] == data["mineral_mapping"]
+    finally:
+        server.shutdown()
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+import data_processor
+from data_processor import process_granules
+from processing_cache import ProcessingCache
+from synthetic_emit import make_scene
+
+OPTIONS = dict(write_tiles=False, write_rasters=False)
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Paths of the granules actually processed (not restored from the cache) by process_granules"""
+    calls = []
+    original = data_processor._process_and_write
+
+    def counting(file_path, *args, **kwargs):
+        calls.append(file_path)
+        return original(file_path, *args, **kwargs)
+    monkeypatch.setattr(data_processor, "_process_and_write", counting)
+    return calls
+
+
+def _outputs(out_dir, records):
+    return {rel: (out_dir / rel).read_bytes() for record in records for rel in record["outputs"]}
+
+
+def test_hit_miss_and_invalidation(tmp_path, processed, monkeypatch):
+    files = make_scene(tmp_path / "granules", 2, downtrack=80, crosstrack=60)
+    cache_dir = tmp_path / "cache"
+
+    first = process_granules(files, tmp_path / "a", 1, ProcessingCache(cache_dir), **OPTIONS)
+    assert len(processed) == 2
+
+    # Hit: outputs are restored into a fresh web root byte for byte, with no processing
+    second = process_granules(files, tmp_path / "b", 1, ProcessingCache(cache_dir), **OPTIONS)
+    assert len(processed) == 2
+    assert _outputs(tmp_path / "b", second) == _outputs(tmp_path / "a", first)
+
+    # A restored dataset takes the file index of its position in this run
+    process_granules(files[::-1], tmp_path / "c", 1, ProcessingCache(cache_dir), **OPTIONS)
+    assert len(processed) == 2
+    dataset = json.loads((tmp_path / "c" / first[0]["outputs"][0]).read_text())
+    assert dataset["summary"]["file_index"] == 1
+
+    # Same content with a new mtime is still a hit; other options or a new CACHE_VERSION are misses
+    os.utime(files[0], ns=(1, 1))
+    process_granules(files, tmp_path / "d", 1, ProcessingCache(cache_dir), **OPTIONS)
+    assert len(processed) == 2
+    process_granules(files, tmp_path / "e", 1, ProcessingCache(cache_dir), downsample_factor=4, **OPTIONS)
+    assert len(processed) == 4
+    monkeypatch.setattr(data_processor, "CACHE_VERSION", data_processor.CACHE_VERSION + 1)
+    process_granules(files, tmp_path / "f", 1, ProcessingCache(cache_dir), **OPTIONS)
+    assert len(processed) == 6
+
+
+def test_evicts_least_recently_used(tmp_path, processed):
+    files = make_scene(tmp_path / "granules", 2, downtrack=80, crosstrack=60)
+    cache = ProcessingCache(tmp_path / "cache")
+    process_granules(files, tmp_path / "a", 1, cache, **OPTIONS)
+    entries = cache.index["entries"]
+    assert len(entries) == 2
+
+    newest = max(entries, key=lambda key: entries[key]["last_used"])
+    cache.max_bytes = entries[newest]["bytes"]
+    cache.save()
+    assert list(ProcessingCache(tmp_path / "cache").index["entries"]) == [newest]
+    assert len(list((tmp_path / "cache" / "objects").iterdir())) == 1
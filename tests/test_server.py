@@ -0,0 +1,88 @@
+import gzip
+import http.client
+import os
+import threading
+from functools import partial
+
+import pytest
+
+from server import MyHTTPRequestHandler, ThreadingServer, precompress
+
+BODY = bytes(range(256)) * 40
+
+
+class QuietHandler(MyHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def web_root(tmp_path):
+    (tmp_path / "data.bin").write_bytes(BODY)
+    (tmp_path / "web_data.json").write_text('{"datasets": []}' * 200)
+    return tmp_path
+
+
+@pytest.fixture
+def get(web_root):
+    server = ThreadingServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(web_root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(path, **headers):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+    yield request
+    server.shutdown()
+    server.server_close()
+
+
+def test_etag_revalidation(get):
+    status, headers, body = get("/data.bin")
+    assert status == 200 and body == BODY
+    etag = headers["ETag"]
+    assert get("/data.bin")[1]["ETag"] == etag
+
+    status, headers, body = get("/data.bin", **{"If-None-Match": etag})
+    assert status == 304 and body == b"" and headers["ETag"] == etag
+    assert get("/data.bin", **{"If-None-Match": '"other"'})[0] == 200
+    assert get("/data.bin", **{"If-Modified-Since": headers["Last-Modified"]})[0] == 304
+
+
+def test_byte_ranges(get):
+    status, headers, body = get("/data.bin", Range="bytes=100-199")
+    assert status == 206 and body == BODY[100:200]
+    assert headers["Content-Range"] == f"bytes 100-199/{len(BODY)}"
+
+    assert get("/data.bin", Range="bytes=-50")[2] == BODY[-50:]
+    assert get("/data.bin", Range="bytes=10000-")[2] == BODY[10000:]
+    status, headers, _ = get("/data.bin", Range=f"bytes={len(BODY)}-")
+    assert status == 416 and headers["Content-Range"] == f"bytes */{len(BODY)}"
+
+    etag = get("/data.bin")[1]["ETag"]
+    assert get("/data.bin", Range="bytes=0-9", **{"If-Range": etag})[0] == 206
+    status, _, body = get("/data.bin", Range="bytes=0-9", **{"If-Range": '"stale"'})
+    assert status == 200 and body == BODY
+
+
+def test_precompressed_sidecars(web_root, get):
+    assert precompress(web_root) >= 2
+    original = (web_root / "web_data.json").read_bytes()
+
+    status, headers, body = get("/web_data.json", **{"Accept-Encoding": "br;q=0, gzip"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip" and headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(body) == original
+    assert int(headers["Content-Length"]) == len(body) < len(original)
+
+    # no sidecar without Accept-Encoding, for ranges, or when the sidecar is older than the file
+    assert get("/web_data.json")[2] == original
+    status, headers, body = get("/web_data.json", Range="bytes=0-9", **{"Accept-Encoding": "gzip"})
+    assert status == 206 and "Content-Encoding" not in headers and body == original[:10]
+    sidecar = web_root / "web_data.json.gz"
+    os.utime(sidecar, (0, 0))
+    status, headers, body = get("/web_data.json", **{"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in headers and body == original
@@ -0,0 +1,133 @@
+import json
+import math
+import numpy as np
+from pathlib import Path
+
+from binary_format import encode_band_depth, pack_arrays
+from downsample import block_mean, block_mode
+from rasterize import mineral_colors, write_group_rasters
+
+TILE_SIZE = 256
+BAND_DEPTH_DECIMALS = 4
+
+
+def pyramid_levels(shape, tile_size=TILE_SIZE):
+    """
+    Describe the zoom levels for a scene of the given (downtrack, crosstrack) shape.
+    Level 0 fits in a single tile; the last level is native resolution.
+    """
+    max_zoom = max(0, math.ceil(math.log2(max(shape) / tile_size)))
+    levels = []
+    for z in range(max_zoom + 1):
+        factor = 2 ** (max_zoom - z)
+        levels.append({
+            "z": z,
+            "factor": factor,
+            "shape": [math.ceil(shape[0] / factor), math.ceil(shape[1] / factor)]
+        })
+    return levels
+
+
+def _band_depth_list(arr):
+    """Round band depth for JSON and turn NaN (no detection) into null"""
+    rounded = np.round(arr.astype(np.float64), BAND_DEPTH_DECIMALS)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+def _binary_tile(reduced, window, tile_size, id_dtypes, band_depth_encoding):
+    """Encode one tile as a binary buffer, padded to tile_size so every tile shares one layout"""
+    arrays = {}
+    for key, arr in reduced.items():
+        part = arr[window]
+        pad = ((0, tile_size - part.shape[0]), (0, tile_size - part.shape[1]))
+        if key.endswith("band_depth"):
+            arrays[key] = encode_band_depth(np.pad(part, pad, constant_values=np.nan), band_depth_encoding)
+        else:
+            arrays[key] = (np.pad(part, pad).astype(id_dtypes[key]), {})
+    return pack_arrays(arrays)
+
+
+def write_tile_pyramid(out_dir, groups, tile_size=TILE_SIZE, tile_format="json", band_depth_encoding="uint8",
+                       rasters=True):
+    """
+    Write a tile pyramid for one granule and return its manifest.
+
+    groups maps a group name ("group1", "group2") to a (band_depth, mineral_id) pair of
+    full-resolution arrays, with mineral IDs already cleaned (0 = no detection).
+    Every level is aggregated from native resolution: mean band depth over detected pixels
+    and majority mineral ID per block. Tiles with no detection in any group are not written.
+
+    tile_format "json" writes <z>/<x>_<y>.json; "binary" writes <z>/<x>_<y>.bin buffers whose
+    layout (shared by all tiles, edge tiles are padded) is stored in the manifest.
+
+    With rasters, every tile also gets pre-rendered <z>/<x>_<y>_<group>_band_depth.png and
+    _mineral_id.png images (unpadded); the tile data then only serves as the hit-test buffer.
+    Mineral colors are assigned per group over the whole granule and listed in the manifest.
+    """
+    out_dir = Path(out_dir)
+    shape = next(iter(groups.values()))[0].shape
+    levels = pyramid_levels(shape, tile_size)
+    id_dtypes = {
+        f"{name}_mineral_id": np.uint8 if gid.size == 0 or gid.max() <= np.iinfo(np.uint8).max else np.uint16
+        for name, (bd, gid) in groups.items()
+    }
+    minerals = {name: np.unique(gid[gid > 0]).tolist() for name, (bd, gid) in groups.items()} if rasters else {}
+    layout = None
+    if tile_format == "binary":
+        blank = {}
+        for name in groups:
+            blank[f"{name}_band_depth"] = np.full((tile_size, tile_size), np.nan, dtype=np.float32)
+            blank[f"{name}_mineral_id"] = np.zeros((tile_size, tile_size), dtype=np.uint16)
+        layout = _binary_tile(blank, (slice(None), slice(None)), tile_size, id_dtypes, band_depth_encoding)[1]
+
+    for level in levels:
+        factor = level["factor"]
+        reduced = {}
+        for name, (bd, gid) in groups.items():
+            reduced[f"{name}_band_depth"] = block_mean(bd, gid, factor)
+            reduced[f"{name}_mineral_id"] = block_mode(gid, factor)
+
+        level_dir = out_dir / str(level["z"])
+        level_dir.mkdir(parents=True, exist_ok=True)
+
+        rows, cols = level["shape"]
+        level["tiles"] = []
+        for y in range(math.ceil(rows / tile_size)):
+            for x in range(math.ceil(cols / tile_size)):
+                window = (slice(y * tile_size, (y + 1) * tile_size), slice(x * tile_size, (x + 1) * tile_size))
+                if not any(np.any(reduced[f"{name}_mineral_id"][window] > 0) for name in groups):
+                    continue
+
+                if tile_format == "binary":
+                    buffer = _binary_tile(reduced, window, tile_size, id_dtypes, band_depth_encoding)[0]
+                    with open(level_dir / f"{x}_{y}.bin", "wb") as f:
+                        f.write(buffer)
+                else:
+                    tile = {"z": level["z"], "x": x, "y": y}
+                    for key, arr in reduced.items():
+                        part = arr[window]
+                        tile["shape"] = [part.shape[0], part.shape[1]]
+                        tile[key] = _band_depth_list(part) if key.endswith("band_depth") else part.astype(int).tolist()
+
+                    with open(level_dir / f"{x}_{y}.json", "w") as f:
+                        json.dump(tile, f, separators=(',', ':'))
+                for name in minerals:
+                    write_group_rasters(level_dir, f"{x}_{y}_{name}", reduced[f"{name}_band_depth"][window],
+                                        reduced[f"{name}_mineral_id"][window], minerals[name])
+                level["tiles"].append([x, y])
+
+    manifest = {
+        "format": tile_format,
+        "tile_size": tile_size,
+        "shape": [int(shape[0]), int(shape[1])],
+        "max_zoom": levels[-1]["z"],
+        "levels": levels
+    }
+    if layout is not None:
+        manifest["tile_arrays"] = layout
+    if rasters:
+        manifest["rasters"] = {name: {"mineral_colors": mineral_colors(ids)} for name, ids in minerals.items()}
+    with open(out_dir / "pyramid.json", "w") as f:
+        json.dump(manifest, f, separators=(',', ':'))
+
+    return manifest
@@ -0,0 +1,103 @@
+import json
+import os
+from pathlib import Path
+
+WEB_DATA = "web_data.json"
+WEB_DATA_SAMPLE = "web_data_sample.json"
+LAYOUTS = ("combined", "split")
+SAMPLE_SIZE = 1
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class WebDataWriter:
+    """
+    Streams web_data.json and web_data_sample.json in one pass as granule datasets arrive.
+
+    Datasets are the per-granule JSON files written by data_processor; add() takes them in any
+    order with their file index and writes each as soon as every earlier index has been written,
+    so output order is stable while only the paths of early arrivals are held. The first
+    sample_size datasets also go to the sample file, from the same read.
+
+    layout "combined" copies each dataset file into web_data.json block by block; "split" writes
+    an index holding only each granule's summary and a data_url pointing at its dataset file,
+    which the viewer fetches when the granule is shown. Memory stays constant in the number of
+    granules either way. Both files are written under temporary names and renamed on close(),
+    so a server never hands out a half-written file.
+    """
+
+    def __init__(self, out_dir=".", layout="combined", sample_size=SAMPLE_SIZE):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout}; expected one of {', '.join(LAYOUTS)}")
+        self.out_dir = Path(out_dir)
+        self.layout = layout
+        self.sample_size = sample_size
+        self.count = 0
+        self.next_index = 0
+        self.pending = {}
+        self.paths = [self.out_dir / WEB_DATA, self.out_dir / WEB_DATA_SAMPLE]
+        self.files = [open(f"{path}.tmp", "w") for path in self.paths]
+        for f in self.files:
+            f.write('{\n"datasets": [\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+    def add(self, file_index, dataset_path):
+        self.pending[file_index] = dataset_path
+        while self.next_index in self.pending:
+            self._write(self.pending.pop(self.next_index))
+            self.next_index += 1
+
+    def _write(self, dataset_path):
+        targets = self.files if self.count < self.sample_size else self.files[:1]
+        if self.count:
+            for f in targets:
+                f.write(',\n')
+
+        if self.layout == "split":
+            with open(dataset_path) as src:
+                summary = json.load(src)["summary"]
+            entry = json.dumps({
+                "summary": summary,
+                "data_url": Path(os.path.relpath(dataset_path, self.out_dir)).as_posix()
+            }, indent=2)
+            for f in targets:
+                f.write(entry)
+        else:
+            with open(dataset_path) as src:
+                for block in iter(lambda: src.read(COPY_BUFFER_SIZE), ""):
+                    for f in targets:
+                        f.write(block)
+        self.count += 1
+
+    def close(self, metadata, mineral_mapping):
+        """Write any datasets still waiting on a missing index, then the metadata, and publish the files"""
+        for file_index in sorted(self.pending):
+            self._write(self.pending.pop(file_index))
+        totals = [self.count, min(self.count, self.sample_size)]
+        for f, path, total in zip(self.files, self.paths, totals):
+            f.write('\n],\n"metadata": ')
+            json.dump(dict(metadata, total_files=total, layout=self.layout), f, indent=2)
+            f.write(',\n"mineral_mapping": ')
+            json.dump(mineral_mapping, f, indent=2)
+            f.write('\n}')
+            f.close()
+            os.replace(f"{path}.tmp", path)
+
+    def abort(self):
+        for f, path in zip(self.files, self.paths):
+            f.close()
+            Path(f"{path}.tmp").unlink(missing_ok=True)
+
+
+def write_web_data(out_dir, metadata, mineral_mapping, dataset_paths, layout="combined", sample_size=SAMPLE_SIZE):
+    """Write web_data.json and web_data_sample.json from dataset files already on disk, in order"""
+    with WebDataWriter(out_dir, layout, sample_size) as writer:
+        for i, dataset_path in enumerate(dataset_paths):
+            writer.add(i, dataset_path)
+        writer.close(metadata, mineral_mapping)
+    return writer.count